@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+
+"""
+module that trains the Q-network of LearnModel.ipynb with several actor processes and one learner
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python ActorLearner.py --actors 4 --steps 200000 --save curve_tracking_model.npz
+
+Every actor process runs episodes of an Environment.CarEnvironment with an epsilon-greedy
+NumpyModel.NumpyModel and pushes its transitions into its own SharedRing. The learner
+(the calling process) drains the rings into a ReplayBuffer.ReplayBuffer, runs one DQNLearner
+update per NUM_STEPS_FOR_UPDATE transitions like the notebook does and publishes the weights
+to a WeightBoard every broadcastInterval updates. The actors copy the weights when they
+changed, checked every syncInterval steps.
+
+A full ring blocks its actor (backpressure), so the actors can not run away from the learner.
+All transfers are copies between NumPy arrays in shared memory, nothing is pickled. The rings and the
+board are only pickled once when an actor is started with the start method spawn, they attach to
+the same shared memory by name in the actor.
+
+The actors only run in parallel on separate cores: with one learner update per NUM_STEPS_FOR_UPDATE
+steps the learner limits the throughput to about 4 steps per update time (roughly 13k steps/s),
+on a single core more actors just share it.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import NumpyModel
+from Environment import CarEnvironment
+from ReplayBuffer import ReplayBuffer
+from TrackLibrary import TrackLibrary, parseSeeds
+
+# hyper parameters of LearnModel.ipynb
+GAMMA = 0.995
+ALPHA = 1e-2
+TAU = 1e-2
+NUM_STEPS_FOR_UPDATE = 4
+STEPS_SENSOR_HISTORY = 2
+MEMORY_SIZE = 10_000
+MINIBATCH_SIZE = 64
+E_DECAY = 0.995
+E_MIN = 0.01
+MAX_NUM_TIMESTEPS = 200
+HIDDEN_UNITS = (64, 64)
+TRAINING_SEEDS = (2, 5, 9, 11, 13, 15, 17, 19, 21)
+
+DEFAULT_RING_CAPACITY = 4096
+DEFAULT_SYNC_INTERVAL = 200
+DEFAULT_BROADCAST_INTERVAL = 25
+BACKPRESSURE_SLEEP = 0.0005
+
+# slots of the int64 header of a SharedRing
+WRITTEN, READ, STEPS, EPISODES, STALLS, HEADER_SIZE = 0, 1, 2, 3, 4, 8
+# slots of the int64 header of a WeightBoard
+VERSION, STOP = 0, 1
+
+
+def _sharedArrays(block, specs):
+    """ NumPy arrays of specs [(shape, dtype), ...] placed one after the other in block """
+    arrays = []
+    offset = 0
+    for shape, dtype in specs:
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        arrays.append(array)
+        offset += array.nbytes
+    return arrays
+
+
+def _sharedSize(specs):
+    return sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in specs)
+
+
+class SharedRing():
+
+    def __init__(self, capacity, stateSize) -> None:
+        """ Ring of transitions in shared memory with one writer (an actor) and one reader (the learner).
+        The writer fills the slot first and then advances WRITTEN, the reader copies the slots
+        and then advances READ, so neither needs a lock.
+        The header also holds the STEPS, EPISODES and STALLS counters of the actor.
+        Create it before starting the actor process and pass it to the process,
+        a pickled ring attaches to the same shared memory.
+        """
+        self._capacity = capacity
+        self._specs = [((HEADER_SIZE,), np.int64), ((capacity, stateSize), np.float32), ((capacity,), np.int32),
+                       ((capacity,), np.float32), ((capacity, stateSize), np.float32), ((capacity,), np.float32)]
+        self._block = shared_memory.SharedMemory(
+            create=True, size=_sharedSize(self._specs))
+        self._owner = True
+        self._attach()
+        self.header[:] = 0
+        return
+
+    def __getstate__(self):
+        return {'capacity': self._capacity, 'specs': self._specs, 'name': self._block.name}
+
+    def __setstate__(self, state):
+        self._capacity = state['capacity']
+        self._specs = state['specs']
+        self._block = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self._attach()
+        return
+
+    def _attach(self):
+        (self.header, self._states, self._actions, self._rewards,
+         self._nextStates, self._dones) = _sharedArrays(self._block, self._specs)
+        return
+
+    def getCapacity(self):
+        return self._capacity
+
+    def __len__(self):
+        """ number of transitions written but not read yet """
+        return int(self.header[WRITTEN] - self.header[READ])
+
+    def push(self, state, action, reward, nextState, done, stopped=None):
+        """ write one transition, waits while the ring is full.
+        stopped: optional function, the wait ends without writing when it returns True
+        returns True when the transition was written
+        """
+        header = self.header
+        written = int(header[WRITTEN])
+        if written - header[READ] >= self._capacity:
+            header[STALLS] += 1
+            while written - header[READ] >= self._capacity:
+                if stopped is not None and stopped():
+                    return False
+                time.sleep(BACKPRESSURE_SLEEP)
+        i = written % self._capacity
+        self._states[i] = state
+        self._actions[i] = action
+        self._rewards[i] = reward
+        self._nextStates[i] = nextState
+        self._dones[i] = done
+        header[WRITTEN] = written + 1
+        return True
+
+    def drain(self, memory, maxCount=None):
+        """ move the transitions written so far into memory (ReplayBuffer), returns their number """
+        header = self.header
+        read = int(header[READ])
+        count = int(header[WRITTEN]) - read
+        if maxCount is not None:
+            count = min(count, maxCount)
+        done = 0
+        while done < count:
+            # at most two contiguous pieces, before and after the wrap around
+            start = (read + done) % self._capacity
+            end = min(start + count - done, self._capacity)
+            memory.addBatch(self._states[start:end], self._actions[start:end], self._rewards[start:end],
+                            self._nextStates[start:end], self._dones[start:end])
+            done += end - start
+        header[READ] = read + count
+        return count
+
+    def close(self):
+        """ release the shared memory, the ring that created it also removes it """
+        self.header = self._states = self._actions = self._rewards = self._nextStates = self._dones = None
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+        return
+
+
+class WeightBoard():
+
+    def __init__(self, shapes) -> None:
+        """ The weights of a NumpyModel in shared memory, written by the learner and read by the actors.
+        shapes: the kernel and bias shapes [(kernelShape, biasShape), ...] of the layers
+        The VERSION counter is odd while the learner writes, a reader retries when it changed
+        during the copy (seqlock). The STOP flag tells the actors to finish.
+        Like a SharedRing a pickled board attaches to the same shared memory.
+        """
+        self._specs = [((2,), np.int64)] + [(shape, np.float32)
+                                            for layer in shapes for shape in layer]
+        self._block = shared_memory.SharedMemory(
+            create=True, size=_sharedSize(self._specs))
+        self._owner = True
+        self._attach()
+        self.header[:] = 0
+        return
+
+    def __getstate__(self):
+        return {'specs': self._specs, 'name': self._block.name}
+
+    def __setstate__(self, state):
+        self._specs = state['specs']
+        self._block = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self._attach()
+        return
+
+    def _attach(self):
+        arrays = _sharedArrays(self._block, self._specs)
+        self.header = arrays[0]
+        self._weights = list(zip(arrays[1::2], arrays[2::2]))
+        return
+
+    def getVersion(self):
+        return int(self.header[VERSION])
+
+    def publish(self, weights):
+        """ copy [(kernel, bias), ...] into shared memory """
+        header = self.header
+        header[VERSION] += 1
+        for (kernel, bias), (newKernel, newBias) in zip(self._weights, weights):
+            kernel[:] = newKernel
+            bias[:] = newBias
+        header[VERSION] += 1
+        return
+
+    def readInto(self, model):
+        """ copy the weights into model (NumpyModel), returns the version read """
+        header = self.header
+        while True:
+            version = int(header[VERSION])
+            if version % 2 == 0:
+                model.setWeights(self._weights)
+                if int(header[VERSION]) == version:
+                    return version
+            time.sleep(BACKPRESSURE_SLEEP)
+
+    def stop(self):
+        self.header[STOP] = 1
+        return
+
+    def isStopped(self):
+        return bool(self.header[STOP])
+
+    def close(self):
+        self.header = self._weights = None
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+        return
+
+
+class DQNLearner():
+
+    def __init__(self, stateSize, actionCount, hidden=HIDDEN_UNITS, weights=None, gamma=GAMMA,
+                 learningRate=ALPHA, tau=TAU, seed=None) -> None:
+        """ agent_learn of LearnModel.ipynb with NumPy: a dense network with relu hidden layers and a
+        linear output, mean squared error on r + gamma * max Q_target(s') * (1 - done), Adam and a
+        soft update of the target network with tau.
+
+        weights: optional [(kernel, bias), ...] to start from, e.g. NumpyModel.loadModel(path).getWeights(),
+        otherwise glorot uniform kernels and zero biases like Keras
+        """
+        sizes = (stateSize,) + tuple(hidden) + (actionCount,)
+        if weights is None:
+            rng = np.random.default_rng(seed)
+            weights = []
+            for inputs, units in zip(sizes[:-1], sizes[1:]):
+                limit = np.sqrt(6.0 / (inputs + units))
+                weights.append((rng.uniform(-limit, limit, (inputs, units)), np.zeros(units)))
+        self._weights = [[np.array(kernel, dtype=np.float32), np.array(bias, dtype=np.float32)]
+                         for kernel, bias in weights]
+        self._target = [[kernel.copy(), bias.copy()]
+                        for kernel, bias in self._weights]
+        self._moments = [[np.zeros_like(kernel), np.zeros_like(bias)]
+                         for kernel, bias in self._weights]
+        self._velocities = [[np.zeros_like(kernel), np.zeros_like(bias)]
+                            for kernel, bias in self._weights]
+        self._gamma = gamma
+        self._learningRate = learningRate
+        self._tau = tau
+        self._updates = 0
+        return
+
+    def getWeights(self):
+        return [(kernel, bias) for kernel, bias in self._weights]
+
+    def getModel(self):
+        """ a NumpyModel with a copy of the current weights """
+        last = len(self._weights) - 1
+        return NumpyModel.NumpyModel([(kernel.copy(), bias.copy(), 'linear' if i == last else 'relu')
+                                      for i, (kernel, bias) in enumerate(self._weights)])
+
+    def getUpdates(self):
+        return self._updates
+
+    def learn(self, batch):
+        """ one gradient step on batch (states, actions, rewards, nextStates, dones), returns the loss """
+        states, actions, rewards, nextStates, dones = batch
+        x = nextStates
+        for kernel, bias in self._target[:-1]:
+            x = np.maximum(x @ kernel + bias, 0.0)
+        maxQ = (x @ self._target[-1][0] + self._target[-1][1]).max(axis=1)
+        targets = rewards + self._gamma * maxQ * (1.0 - dones)
+        # forward pass keeping the inputs of every layer for the backward pass
+        inputs = []
+        x = states
+        for kernel, bias in self._weights[:-1]:
+            inputs.append(x)
+            x = np.maximum(x @ kernel + bias, 0.0)
+        inputs.append(x)
+        q = x @ self._weights[-1][0] + self._weights[-1][1]
+        rows = np.arange(len(actions))
+        error = q[rows, actions] - targets
+        gradient = np.zeros_like(q)
+        gradient[rows, actions] = 2.0 * error / len(actions)
+        self._updates += 1
+        for i in range(len(self._weights) - 1, -1, -1):
+            kernel, bias = self._weights[i]
+            kernelGradient = inputs[i].T @ gradient
+            biasGradient = gradient.sum(axis=0)
+            if i > 0:
+                gradient = (gradient @ kernel.T) * (inputs[i] > 0.0)
+            self._adam(i, 0, kernelGradient)
+            self._adam(i, 1, biasGradient)
+        for target, weights in zip(self._target, self._weights):
+            for t, w in zip(target, weights):
+                t *= 1.0 - self._tau
+                t += self._tau * w
+        return float(np.mean(error * error))
+
+    def _adam(self, layer, index, gradient, beta1=0.9, beta2=0.999, epsilon=1e-7):
+        # same defaults as tf.keras.optimizers.Adam
+        m = self._moments[layer][index]
+        v = self._velocities[layer][index]
+        m *= beta1
+        m += (1.0 - beta1) * gradient
+        v *= beta2
+        v += (1.0 - beta2) * gradient * gradient
+        rate = self._learningRate * \
+            np.sqrt(1.0 - beta2 ** self._updates) / (1.0 - beta1 ** self._updates)
+        self._weights[layer][index] -= rate * m / (np.sqrt(v) + epsilon)
+        return
+
+
+def _runActor(index, actors, ring, board, model, seeds, libraryPath, syncInterval, seed):
+    """ body of actor process index of actors: epsilon-greedy episodes until the board is stopped """
+    library = TrackLibrary(
+        libraryPath, logLevel=logging.WARNING) if libraryPath is not None else None
+    env = CarEnvironment(library=library, stephistory=STEPS_SENSOR_HISTORY, logLevel=logging.WARNING)
+    rng = np.random.default_rng(seed)
+    version = board.readInto(model)
+    header = ring.header
+    state = np.zeros(env.getStateSize(), dtype=np.float32)
+    epsilon = 1.0
+    # the actors start on different seeds and take turns with the seeds
+    episode = index
+    steps = 0
+    while not board.isStopped():
+        state[:] = env.reset(seeds[episode % len(seeds)])
+        for t in range(MAX_NUM_TIMESTEPS):
+            if rng.random() > epsilon:
+                action = model.getAction(state)
+            else:
+                action = int(rng.integers(env.getActionCount()))
+            nextState, reward, done, duration = env.step(action)
+            if not ring.push(state, action, reward, nextState, done, board.isStopped):
+                return
+            state[:] = nextState
+            steps += 1
+            header[STEPS] = steps
+            if steps % syncInterval == 0 and board.getVersion() != version:
+                version = board.readInto(model)
+            if done:
+                break
+        epsilon = max(E_MIN, E_DECAY*epsilon)
+        episode += actors
+        header[EPISODES] += 1
+    return
+
+
+class ActorLearner():
+
+    def __init__(self, actors=None, learner=None, seeds=TRAINING_SEEDS, libraryPath=None,
+                 memorySize=MEMORY_SIZE, minibatchSize=MINIBATCH_SIZE, ringCapacity=DEFAULT_RING_CAPACITY,
+                 syncInterval=DEFAULT_SYNC_INTERVAL, broadcastInterval=DEFAULT_BROADCAST_INTERVAL,
+                 logLevel=logging.INFO, seed=None, startMethod=None) -> None:
+        """ Training pipeline with actor processes and the learner in the calling process.
+
+        actors: number of actor processes, default one per CPU
+        learner: DQNLearner or any object with learn(batch) and getWeights(), default a new DQNLearner
+        seeds: the curves the actors drive, libraryPath: optional TrackLibrary file with their canvases
+        memorySize, minibatchSize: replay memory and minibatch of the learner
+        ringCapacity: transitions an actor can be ahead of the learner before it has to wait
+        syncInterval: steps between the checks of an actor for new weights
+        broadcastInterval: learner updates between two weight broadcasts
+        startMethod: start method of the actor processes ('fork', 'spawn' or 'forkserver',
+        see multiprocessing.get_context), default the one of the platform
+        """
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logLevel)
+        self._actors = actors if actors is not None else multiprocessing.cpu_count()
+        self._seeds = tuple(seeds)
+        self._libraryPath = libraryPath
+        self._stateSize = 3*(STEPS_SENSOR_HISTORY+1)
+        self._learner = learner if learner is not None else DQNLearner(
+            self._stateSize, 3, seed=seed)
+        self._memory = ReplayBuffer(memorySize, self._stateSize, seed=seed)
+        self._minibatchSize = minibatchSize
+        self._ringCapacity = ringCapacity
+        self._syncInterval = syncInterval
+        self._broadcastInterval = broadcastInterval
+        self._seed = seed
+        self._context = multiprocessing.get_context(startMethod)
+        self._stats = {}
+        return
+
+    def getLearner(self):
+        return self._learner
+
+    def getStats(self):
+        """ counters of the last run: steps, episodes, updates, broadcasts, stalls (times an actor
+        found its ring full), seconds, stepsPerSecond and updatesPerSecond
+        """
+        return self._stats
+
+    def run(self, steps=None, seconds=None, reportInterval=10.0):
+        """ train until the actors made steps transitions or seconds passed, returns getStats() """
+        weights = self._learner.getWeights()
+        board = WeightBoard([(kernel.shape, bias.shape)
+                            for kernel, bias in weights])
+        board.publish(weights)
+        rings = [SharedRing(self._ringCapacity, self._stateSize)
+                 for i in range(self._actors)]
+        seeds = np.random.SeedSequence(self._seed).spawn(self._actors)
+        processes = []
+        try:
+            for i, ring in enumerate(rings):
+                model = NumpyModel.NumpyModel([(np.array(kernel), np.array(bias), 'linear' if j == len(weights) - 1
+                                                else 'relu') for j, (kernel, bias) in enumerate(weights)])
+                process = self._context.Process(target=_runActor, daemon=True,
+                                                args=(i, self._actors, ring, board, model, self._seeds,
+                                                      self._libraryPath, self._syncInterval, seeds[i]))
+                process.start()
+                processes.append(process)
+            self._learn(rings, board, steps, seconds, reportInterval)
+        finally:
+            board.stop()
+            for process in processes:
+                process.join()
+            for ring in rings:
+                ring.close()
+            board.close()
+        return self._stats
+
+    def _learn(self, rings, board, steps, seconds, reportInterval):
+        memory = self._memory
+        learner = self._learner
+        start = time.perf_counter()
+        deadline = start + seconds if seconds is not None else None
+        nextReport = start + reportInterval
+        received = 0
+        scheduled = 0
+        updates = 0
+        broadcasts = 0
+        while True:
+            count = sum(ring.drain(memory) for ring in rings)
+            received += count
+            # one update per NUM_STEPS_FOR_UPDATE transitions once the memory holds a minibatch, like the notebook
+            dueUpdates = received // NUM_STEPS_FOR_UPDATE - scheduled
+            scheduled += dueUpdates
+            if len(memory) <= self._minibatchSize:
+                dueUpdates = 0
+            for i in range(dueUpdates):
+                # the rings can hold many updates worth of transitions, do not run past the deadline
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                learner.learn(memory.sample(self._minibatchSize))
+                updates += 1
+                if updates % self._broadcastInterval == 0:
+                    board.publish(learner.getWeights())
+                    broadcasts += 1
+            now = time.perf_counter()
+            self._stats = self._collectStats(rings, received, updates, broadcasts, now - start)
+            if now >= nextReport:
+                self._logger.info('%(steps)d steps %(stepsPerSecond).0f steps/s %(updatesPerSecond).0f updates/s '
+                                  '%(episodes)d episodes %(stalls)d stalls', self._stats)
+                nextReport = now + reportInterval
+            if (steps is not None and received >= steps) or (deadline is not None and now >= deadline):
+                return
+            if count == 0:
+                time.sleep(BACKPRESSURE_SLEEP)
+
+    def _collectStats(self, rings, received, updates, broadcasts, elapsed):
+        elapsed = max(elapsed, 1e-9)
+        return {'actors': len(rings), 'steps': received,
+                'episodes': int(sum(ring.header[EPISODES] for ring in rings)),
+                'updates': updates, 'broadcasts': broadcasts,
+                'stalls': int(sum(ring.header[STALLS] for ring in rings)),
+                'seconds': elapsed, 'stepsPerSecond': received / elapsed, 'updatesPerSecond': updates / elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='train the Q-network with actor processes and a learner')
+    parser.add_argument('--actors', type=int, default=None,
+                        help='number of actor processes (default: number of CPUs)')
+    parser.add_argument('--steps', type=int, default=None,
+                        help='stop after this many environment steps')
+    parser.add_argument('--seconds', type=float, default=None,
+                        help='stop after this many seconds')
+    parser.add_argument('--seeds', default=','.join(str(seed) for seed in TRAINING_SEEDS),
+                        help='training curves, e.g. 2,5,9 or 1-100 (default: the seeds of LearnModel.ipynb)')
+    parser.add_argument('--library', default=None,
+                        help='TrackLibrary file with the canvases of the seeds')
+    parser.add_argument('--model', default=None,
+                        help='.h5 or .npz model to continue training from')
+    parser.add_argument('--sync-interval', type=int, default=DEFAULT_SYNC_INTERVAL,
+                        help='actor steps between checks for new weights (default %(default)s)')
+    parser.add_argument('--broadcast-interval', type=int, default=DEFAULT_BROADCAST_INTERVAL,
+                        help='learner updates between weight broadcasts (default %(default)s)')
+    parser.add_argument('--ring-capacity', type=int, default=DEFAULT_RING_CAPACITY,
+                        help='transitions an actor may be ahead of the learner (default %(default)s)')
+    parser.add_argument('--save', default=None,
+                        help='write the trained model to this .npz file')
+    parser.add_argument('--start-method', default=None, choices=multiprocessing.get_all_start_methods(),
+                        help='start method of the actor processes (default: the one of the platform)')
+    args = parser.parse_args()
+    if args.steps is None and args.seconds is None:
+        parser.error('give --steps or --seconds')
+    logging.basicConfig(format='%(asctime)s %(message)s')
+    weights = NumpyModel.loadModel(args.model).getWeights() if args.model is not None else None
+    pipeline = ActorLearner(args.actors, DQNLearner(3*(STEPS_SENSOR_HISTORY+1), 3, weights=weights),
+                            parseSeeds(args.seeds), args.library, ringCapacity=args.ring_capacity,
+                            syncInterval=args.sync_interval, broadcastInterval=args.broadcast_interval,
+                            startMethod=args.start_method)
+    stats = pipeline.run(args.steps, args.seconds)
+    print(' '.join('{}={}'.format(name, round(value, 1) if isinstance(value, float) else value)
+                   for name, value in stats.items()))
+    if args.save is not None:
+        pipeline.getLearner().getModel().save(args.save)
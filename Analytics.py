@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+"""
+module that computes quality metrics of many recorded trajectories at once
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python Analytics.py data/*.traj --table data/analytics.csv
+       python Analytics.py data/heuristic_seed_*.txt data/model_seed_*.txt --table data/analytics.arrays
+
+All steps of all runs are concatenated (grouped by seed) into flat arrays. The cross-track error
+and the progress of every step are projections onto the centre line of the seed's canvas
+(DistanceField.exactTrackPositions), all other metrics are reductions of the flat arrays per run
+(numpy reduceat and bincount), so the cost per step does not depend on the number of runs.
+"""
+
+import argparse
+import csv
+import functools
+import logging
+import os
+import re
+import time
+import numpy as np
+import ArrayStore
+import Canvas
+import Car
+import Trajectory
+from TrackLibrary import TrackLibrary
+
+# the track metrics use the centre of the middle sensor (mm in front of the car position),
+# the point the line trackers keep on the line
+MIDDLE_SENSOR_DISTANCE = float(np.mean(Car.CarModel.sensors[1][:-1], axis=0)[0])
+# a run has finished the curve when the progress of its middle sensor is this close (mm) to the end
+FINISH_DISTANCE = 20
+# same distance as CarModel.followsLine
+FOLLOWS_LINE_DISTANCE = 20
+CANVAS_CACHE_SIZE = 256
+COLUMNS = ('run', 'seed', 'steps', 'duration', 'completion', 'timeToFinish', 'crossTrackMean', 'crossTrackRms',
+           'crossTrackMax', 'oscillations', 'lineLosses', 'followsLine', 'terminated', 'totalReward')
+
+_SEED_PATTERN = re.compile(r'seed_(\d+)')
+
+
+def loadRun(path):
+    """ (name, arrays, metadata) of a trajectory file or a text log of older versions (*.txt).
+    The metadata contains the seed, for text logs it is taken from the file name (e.g. model_seed_5.txt).
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if path.endswith('.txt'):
+        arrays, metadata = Trajectory.parseTextLog(path)
+    else:
+        arrays, metadata = Trajectory.loadTrajectory(path)
+    if 'seed' not in metadata:
+        match = _SEED_PATTERN.search(name)
+        if match is None:
+            raise ValueError(f'{path} has no seed in its metadata or name')
+        metadata = dict(metadata, seed=int(match.group(1)))
+    return name, arrays, metadata
+
+
+def analyzeRuns(runs, canvasForSeed=None):
+    """ the metrics of the runs as columnar table: dict column name (see COLUMNS) -> array with one row per run.
+    runs: list of (name, arrays, metadata) like loadRun returns, metadata must contain the seed
+    canvasForSeed: function seed -> CanvasModel (default: a new CanvasModel per seed)
+
+    completion: largest progress of the middle sensor along the centre line in percent of its length
+    timeToFinish: simulated time (s) when this progress first came FINISH_DISTANCE close to the end, NaN if never
+    crossTrackMean, crossTrackRms, crossTrackMax: of the absolute distance (mm) of the middle sensor
+    to the centre line
+    oscillations: number of turns in the opposite direction of the turn before (drives in between are ignored)
+    lineLosses: number of steps after which followsLine became False
+    followsLine: fraction of the steps with followsLine
+    Runs without flags (text logs) get followsLine from the canvas' coverage map and
+    terminated from their last pose, their totalReward is NaN.
+    """
+    if canvasForSeed is None:
+        def canvasForSeed(seed):
+            return Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING)
+    if not runs:
+        raise ValueError('no runs to analyze')
+    count = len(runs)
+    seeds = np.array([metadata['seed'] for name, arrays, metadata in runs], dtype=np.int64)
+    # the runs of a seed are contiguous in the flat arrays
+    order = np.argsort(seeds, kind='stable')
+    sortedRuns = [runs[i] for i in order.tolist()]
+    seeds = seeds[order]
+    lengths = np.array([len(arrays['actions']) for name, arrays, metadata in sortedRuns], dtype=np.int64)
+    if lengths.min() == 0:
+        raise ValueError('every run needs at least the initial step')
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    runIds = np.repeat(np.arange(count), lengths)
+
+    def column(key):
+        return np.concatenate([arrays[key] for name, arrays, metadata in sortedRuns])
+    x = column('x')
+    y = column('y')
+    angles = column('angles')
+    actions = column('actions')
+    durations = column('durations').astype(np.int64)
+    flags = column('flags')
+    rewards = column('rewards')
+    radians = np.radians(angles)
+    sensorX = x + MIDDLE_SENSOR_DISTANCE * np.cos(radians)
+    sensorY = y + MIDDLE_SENSOR_DISTANCE * np.sin(radians)
+    hasFlags = np.array([metadata.get('hasSensorValues', True) for name, arrays, metadata in sortedRuns], dtype=bool)
+
+    crossTrack = np.empty(len(x))
+    progress = np.empty(len(x))
+    curveLengths = np.empty(count)
+    followsLine = (flags & Trajectory.FOLLOWS_LINE) != 0
+    terminated = np.zeros(count, dtype=bool)
+    terminated[hasFlags] = (flags[ends[hasFlags] - 1] & Trajectory.TERMINATED) != 0
+    car = Car.CarModel(logLevel=logging.WARNING)
+    groupStarts = np.flatnonzero(np.diff(seeds, prepend=seeds[0] - 1))
+    for first, last in zip(groupStarts.tolist(), np.append(groupStarts[1:], count).tolist()):
+        canvas = canvasForSeed(int(seeds[first]))
+        field = canvas.getDistanceField()
+        steps = slice(starts[first], ends[last - 1])
+        crossTrack[steps], progress[steps] = field.exactTrackPositions(sensorX[steps], sensorY[steps])
+        curveLengths[first:last] = field.getLength()
+        for run in np.flatnonzero(~hasFlags[first:last]) + first:
+            steps = slice(starts[run], ends[run])
+            d = FOLLOWS_LINE_DISTANCE
+            followsLine[steps] = canvas.getCoverageMap().rectangleAreas(
+                x[steps]-d, y[steps]-d, x[steps]+d, y[steps]+d) > 0.0
+            car.setPosition((x[ends[run] - 1], y[ends[run] - 1]))
+            car.setOrientation(angles[ends[run] - 1])
+            terminated[run] = not car.isAtLeastOneCarSensorWithinBounds(canvas.getCanvasRectangle())
+
+    distance = np.abs(crossTrack)
+    # the time (s) of every step since the start of its run, accumulated in integer milli-seconds
+    elapsed = np.cumsum(durations)
+    elapsed -= (elapsed[starts] - durations[starts])[runIds]
+    times = elapsed / 1000
+    finished = np.where(progress >= curveLengths[runIds] - FINISH_DISTANCE, np.arange(len(x)), len(x))
+    firstFinished = np.minimum.reduceat(finished, starts)
+    turns = np.flatnonzero((actions == Trajectory.TURN_LEFT) | (actions == Trajectory.TURN_RIGHT))
+    flips = (actions[turns[1:]] != actions[turns[:-1]]) & (runIds[turns[1:]] == runIds[turns[:-1]])
+    losses = followsLine[:-1] & ~followsLine[1:] & (runIds[1:] == runIds[:-1])
+    table = {
+        'run': np.array([name for name, arrays, metadata in sortedRuns], dtype=str),
+        'seed': seeds,
+        'steps': lengths - 1,
+        'duration': times[ends - 1],
+        'completion': 100 * np.maximum.reduceat(progress, starts) / curveLengths,
+        'timeToFinish': np.where(firstFinished < len(x), times[np.minimum(firstFinished, len(x) - 1)], np.nan),
+        'crossTrackMean': np.add.reduceat(distance, starts) / lengths,
+        'crossTrackRms': np.sqrt(np.add.reduceat(distance * distance, starts) / lengths),
+        'crossTrackMax': np.maximum.reduceat(distance, starts),
+        'oscillations': np.bincount(runIds[turns[1:]][flips], minlength=count),
+        'lineLosses': np.bincount(runIds[1:][losses], minlength=count),
+        'followsLine': np.add.reduceat(followsLine, starts, dtype=np.float64) / lengths,
+        'terminated': terminated,
+        'totalReward': np.add.reduceat(rewards, starts),
+    }
+    # rows in the order of the runs
+    rows = np.empty(count, dtype=np.intp)
+    rows[order] = np.arange(count)
+    return {name: table[name][rows] for name in COLUMNS}
+
+
+def analyzeFiles(paths, libraryPath=None):
+    """ analyzeRuns of the trajectory files or text logs,
+    libraryPath: optional TrackLibrary file with pre-generated curves
+    """
+    library = TrackLibrary(libraryPath, logLevel=logging.WARNING) if libraryPath is not None else None
+
+    @functools.lru_cache(maxsize=CANVAS_CACHE_SIZE)
+    def canvasForSeed(seed):
+        if library is not None:
+            return library.getCanvas(seed)
+        return Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING)
+    return analyzeRuns([loadRun(path) for path in paths], canvasForSeed)
+
+
+def saveTable(path, table):
+    """ write the table as csv file (*.csv) or as ArrayStore file with one array per column """
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(table)
+            writer.writerows(zip(*(values.tolist() for values in table.values())))
+    else:
+        ArrayStore.saveArrays(path, table, {'columns': list(table)})
+    return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compute quality metrics of recorded trajectories')
+    parser.add_argument('paths', nargs='+',
+                        help='trajectory files (see Runner.py --artifacts) or text logs of older versions')
+    parser.add_argument('--table', default='data/analytics.csv',
+                        help='csv file or (any other extension) ArrayStore file with one row per run')
+    parser.add_argument('--library', default=None,
+                        help='track library file with pre-generated curves (see TrackLibrary.py)')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    table = analyzeFiles(args.paths, args.library)
+    seconds = time.perf_counter() - start
+    saveTable(args.table, table)
+    steps = int((table['steps'] + 1).sum())
+    print('{} runs with {} steps in {:.2f} s ({:.0f} steps/s), table in {}'.format(
+        len(table['run']), steps, seconds, steps / seconds, args.table))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""
+module that stores named NumPy arrays in a single memory-mappable binary file
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+File layout:
+    8 bytes   MAGIC
+    8 bytes   length of the header (little endian uint64)
+    header    JSON: {"metadata": {...}, "arrays": {name: {"dtype", "shape", "offset"}}}
+    data      the raw (C order) array data, each array starts at a multiple of ALIGNMENT
+"""
+
+import json
+import struct
+import numpy as np
+
+MAGIC = b'CARSIMA1'
+ALIGNMENT = 64
+
+
+def saveArrays(path, arrays, metadata=None):
+    """ write the dict of name -> array and a JSON serializable metadata dict to path """
+    arrays = {name: np.ascontiguousarray(array)
+              for name, array in arrays.items()}
+    descriptions = {}
+    offset = 0
+    for name, array in arrays.items():
+        descriptions[name] = {'dtype': array.dtype.str,
+                              'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'metadata': metadata or {},
+                         'arrays': descriptions}).encode('utf-8')
+    start = _align(len(MAGIC) + 8 + len(header))
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(start + descriptions[name]['offset'])
+            f.write(array.tobytes())
+        # make sure the file covers the padding of the last array
+        f.truncate(start + offset)
+    return
+
+
+def loadArrays(path, mmap=True):
+    """ returns (arrays, metadata) for a file written by saveArrays.
+    With mmap=True the arrays are read-only views into a memory map of the file
+    (no copy, the pages are shared between all processes that map the same file).
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an array store file')
+        (length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(length).decode('utf-8'))
+    start = _align(len(MAGIC) + 8 + length)
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for name, description in header['arrays'].items():
+        dtype = np.dtype(description['dtype'])
+        shape = tuple(description['shape'])
+        offset = start + description['offset']
+        nbytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        arrays[name] = data[offset:offset+nbytes].view(dtype).reshape(shape)
+    return (arrays, header['metadata'])
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+"""
+module that simulates many robot cars in lockstep with NumPy
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import logging
+import numpy as np
+import shapely
+import Car
+from rewardFunctions import simpleReward, acceptsTrackPosition
+from CoverageMap import SENSOR_MODE_EXACT, SENSOR_MODE_RASTER, SENSOR_MODE_TILED, SENSOR_MODES, DEFAULT_RESOLUTION
+import VisitedIndex
+
+# action ids as used by the DQN in LearnModel.ipynb
+DRIVE_FORWARD = 0
+TURN_LEFT = 1
+TURN_RIGHT = 2
+# default durations (ms) of the actions in LearnModel.ipynb
+ACTION_DURATIONS = (150, 50, 50)
+
+
+class BatchSimulatorControl():
+
+    def __init__(self, canvases, rewardFunction=simpleReward, logLevel=logging.INFO, stephistory=2,
+                 sensorMode=SENSOR_MODE_EXACT, rasterResolution=DEFAULT_RESOLUTION,
+                 positionCellSize=VisitedIndex.DEFAULT_POSITION_CELL, angleCellSize=VisitedIndex.DEFAULT_ANGLE_CELL,
+                 maxVisited=VisitedIndex.DEFAULT_MAX_ENTRIES) -> None:
+        """ Simulate one car per canvas in lockstep.
+
+        canvases: a list of Canvas.CanvasModel, car i drives on canvases[i]
+        (the same canvas may be used for several cars)
+        rewardFunction: same signature as for RobotCarSimulator.SimulatorControl
+        stephistory: keeps sensorvalues for stephistory generations in the state
+        sensorMode, rasterResolution, positionCellSize, angleCellSize, maxVisited:
+        see RobotCarSimulator.SimulatorControl
+
+        All cars use scale 1.0 (1 mm = 1 pixel) and the semantics of
+        SimulatorControl.driveForward/turnLeft/turnRight, computeSensorValues,
+        followsLine and isTerminated.
+        """
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logLevel)
+        if sensorMode not in SENSOR_MODES:
+            raise ValueError(
+                f'sensorMode must be one of {SENSOR_MODES}, not {sensorMode!r}')
+        self._canvases = list(canvases)
+        self._count = len(self._canvases)
+        self._rewardFunction = rewardFunction
+        self._rewardWithTrackPosition = acceptsTrackPosition(rewardFunction)
+        self._stephistory = stephistory
+        # one shared curve polygon and coverage map or track tiles per distinct canvas
+        groups = {}
+        curves = []
+        self._coverageMaps = []
+        self._trackTiles = []
+        for canvas in self._canvases:
+            if id(canvas) not in groups:
+                groups[id(canvas)] = len(curves)
+                curves.append(canvas.getCurvePolygon())
+                if sensorMode == SENSOR_MODE_RASTER:
+                    self._coverageMaps.append(
+                        canvas.getCoverageMap(rasterResolution))
+                elif sensorMode == SENSOR_MODE_TILED:
+                    self._trackTiles.append(canvas.getTrackTiles())
+        self._canvasGroups = np.array([groups[id(canvas)]
+                                       for canvas in self._canvases], dtype=np.intp)
+        self._curves = np.array(curves, dtype=object)[self._canvasGroups]
+        self._canvasBounds = np.array(
+            [canvas.getCanvasRectangle() for canvas in self._canvases], dtype=np.float64)
+        self._sensorShapes = np.array(Car.CarModel.sensors, dtype=np.float64)
+        n = self._count
+        self._x = np.zeros(n)
+        self._y = np.zeros(n)
+        self._rotation = np.zeros(n)
+        self._time = np.zeros(n)
+        self._xmax = np.zeros(n)
+        self._reward = np.zeros(n)
+        self._sensorValues = np.zeros((n, 3))
+        self._states = np.zeros((n, 3*(stephistory+1)))
+        self._followsLine = np.ones(n, dtype=bool)
+        self._isTerminated = np.zeros(n, dtype=bool)
+        self._previousRewardPositions = [VisitedIndex.VisitedIndex(
+            positionCellSize, angleCellSize, maxVisited) for i in range(n)]
+        self.reset()
+        return
+
+    def reset(self, indices=None):
+        """ put the cars given by indices (default: all cars) back to the start of their curve
+        and clear their time, reward and sensor history
+        """
+        if indices is None:
+            indices = np.arange(self._count)
+        indices = np.asarray(indices, dtype=np.intp)
+        for i in indices:
+            canvas = self._canvases[i]
+            self._x[i], self._y[i] = canvas.getCurveStartingPoint()
+            self._rotation[i] = canvas.getCurveStartingOrientation()
+            self._previousRewardPositions[i].clear()
+        self._time[indices] = 0.0
+        self._xmax[indices] = 0.0
+        self._log(indices, np.full(len(indices), 100))
+        # the sensor history starts with copies of the initial sensor values
+        self._states[indices] = np.tile(
+            self._sensorValues[indices], self._stephistory+1)
+        return self._states
+
+    def step(self, actions, durations=None, active=None):
+        """ Apply one action per car.
+
+        actions: sequence of DRIVE_FORWARD, TURN_LEFT or TURN_RIGHT, one per car
+        durations: optional durations in milli-seconds, one per car
+        (default: ACTION_DURATIONS of the action)
+        active: optional bool array, only the cars with True move, the other cars
+        (e.g. finished episodes) keep their state, the actions given for them are ignored
+
+        returns (states, rewards, dones) where states has shape (N, 3*(stephistory+1))
+        and contains the previous and current sensor values of each car like
+        list(sim.getPreviousLineTrackingSensorValues()) + sim.getLineTrackingSensorValues().
+        The returned arrays are overwritten by the next step.
+        """
+        actions = np.asarray(actions)
+        if durations is None:
+            durations = np.take(ACTION_DURATIONS, actions)
+        else:
+            durations = np.asarray(durations, dtype=np.float64)
+        forward = actions == DRIVE_FORWARD
+        left = actions == TURN_LEFT
+        right = actions == TURN_RIGHT
+        if active is not None:
+            forward &= active
+            left &= active
+            right &= active
+        distance = 0.29 * durations[forward] - 10.59
+        angle = np.radians(self._rotation[forward])
+        self._x[forward] += distance * np.cos(angle)
+        self._y[forward] += distance * np.sin(angle)
+        self._rotation[left] += -1.0*(0.14 * durations[left] - 2.75)
+        self._rotation[right] += 0.14 * durations[right] - 2.75
+        if active is None:
+            self._log(np.arange(self._count), durations)
+            self._states[:, :-3] = self._states[:, 3:]
+            self._states[:, -3:] = self._sensorValues
+        else:
+            indices = np.flatnonzero(active)
+            self._log(indices, durations[indices])
+            self._states[indices, :-3] = self._states[indices, 3:]
+            self._states[indices, -3:] = self._sensorValues[indices]
+        return (self._states, self._reward, self._isTerminated)
+
+    def _log(self, indices, durations):
+        """ update sensor values, flags, time and reward of the cars given by indices """
+        x = self._x[indices]
+        y = self._y[indices]
+        angle = np.radians(self._rotation[indices])
+        cos_theta = np.cos(angle)[:, np.newaxis, np.newaxis]
+        sin_theta = np.sin(angle)[:, np.newaxis, np.newaxis]
+        px = self._sensorShapes[np.newaxis, :, :, 0]
+        py = self._sensorShapes[np.newaxis, :, :, 1]
+        # shape (len(indices), 3 sensors, 5 points, 2)
+        sensors = np.stack((px * cos_theta - py * sin_theta + x[:, np.newaxis, np.newaxis],
+                            px * sin_theta + py * cos_theta + y[:, np.newaxis, np.newaxis]), axis=-1)
+        groups = self._canvasGroups[indices]
+        if self._trackTiles:
+            # the part of the curve in the tile under each car
+            curves = np.empty(len(indices), dtype=object)
+            for group in np.unique(groups):
+                cars = groups == group
+                curves[cars] = self._trackTiles[group].polygonsAt(x[cars], y[cars])
+        else:
+            curves = self._curves[indices]
+        if self._coverageMaps:
+            areas = np.empty((len(indices), 3))
+            for group in np.unique(groups):
+                cars = groups == group
+                areas[cars] = self._coverageMaps[group].polygonAreas(
+                    sensors[cars].reshape(-1, 5, 2)).reshape(-1, 3)
+        else:
+            areas = _intersectionAreas(
+                np.repeat(curves, 3), sensors.reshape(-1, 5, 2)).reshape(-1, 3)
+        self._sensorValues[indices] = 30 + 870 * areas / 25.0
+        d = 20  # same distance as CarModel.followsLine
+        if self._coverageMaps:
+            for group in np.unique(groups):
+                cars = groups == group
+                self._followsLine[indices[cars]] = self._coverageMaps[group].rectangleAreas(
+                    x[cars]-d, y[cars]-d, x[cars]+d, y[cars]+d) > 0.0
+        else:
+            boxes = shapely.box(x-d, y-d, x+d, y+d)
+            self._followsLine[indices] = _intersectionAreas(
+                curves, boxes) > 0.0
+        self._isTerminated[indices] = ~Car.polygonsOverlapRectangles(
+            sensors, self._canvasBounds[indices][:, np.newaxis, :]).any(axis=1)
+        self._time[indices] += durations/1000
+        self._xmax[indices] = np.maximum(self._xmax[indices], x)
+        rotation = self._rotation[indices]
+        followsLine = self._followsLine[indices]
+        isTerminated = self._isTerminated[indices]
+        keys = self._previousRewardPositions[0].keys(
+            x, y, rotation, followsLine, isTerminated)
+        # no reward for going to the left (all curves go the right) or for reaching same position as before
+        rewarded = VisitedIndex.addNew([self._previousRewardPositions[i] for i in indices.tolist()], keys,
+                                       x >= self._xmax[indices])
+        self._reward[indices] = 0.0
+        if self._rewardWithTrackPosition:
+            self._rewardWithTrack(indices[rewarded], x[rewarded], y[rewarded], rotation[rewarded],
+                                  followsLine[rewarded], isTerminated[rewarded])
+        else:
+            # the reward functions work on python floats - convert once per step
+            for i, newx, newy, angle, sensors, follows, terminated in zip(
+                    indices[rewarded].tolist(), x[rewarded].tolist(), y[rewarded].tolist(), rotation[rewarded].tolist(),
+                    self._sensorValues[indices[rewarded]].tolist(), followsLine[rewarded].tolist(),
+                    isTerminated[rewarded].tolist()):
+                self._reward[i] = self._rewardFunction(
+                    sensors, (newx, newy), angle, follows, terminated)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug('BatchSim: positions %s, angles %s, rewards %s',
+                               list(zip(x, y)), self._rotation[indices], self._reward[indices])
+        return
+
+    def _rewardWithTrack(self, indices, x, y, rotation, followsLine, isTerminated):
+        """ call the reward function with the trackPosition keyword for the cars given by indices """
+        crossTrack, progress = self.getTrackPositions(indices, x, y)
+        for i, newx, newy, angle, sensors, follows, terminated, track in zip(
+                indices.tolist(), x.tolist(), y.tolist(), rotation.tolist(), self._sensorValues[indices].tolist(),
+                followsLine.tolist(), isTerminated.tolist(), zip(crossTrack.tolist(), progress.tolist())):
+            self._reward[i] = self._rewardFunction(
+                sensors, (newx, newy), angle, follows, terminated, trackPosition=track)
+        return
+
+    def getTrackPositions(self, indices=None, x=None, y=None):
+        """ arrays crossTrack and progress (mm) of the cars given by indices (default all),
+        see SimulatorControl.getTrackPosition
+        """
+        if indices is None:
+            indices = np.arange(self._count)
+        if x is None:
+            x = self._x[indices]
+            y = self._y[indices]
+        crossTrack = np.zeros(len(indices))
+        progress = np.zeros(len(indices))
+        groups = self._canvasGroups[indices]
+        for group in np.unique(groups):
+            cars = groups == group
+            field = self._canvases[indices[cars][0]].getDistanceField()
+            crossTrack[cars], progress[cars] = field.trackPositions(x[cars], y[cars])
+        return crossTrack, progress
+
+    def __len__(self):
+        return self._count
+
+    def getStates(self):
+        return self._states
+
+    def getLineTrackingSensorValues(self):
+        """ array of shape (N, 3) with [leftValue, middleValue, rightValue] per car """
+        return self._sensorValues
+
+    def getDurations(self):
+        return self._time
+
+    def getPositions(self):
+        return np.stack((self._x, self._y), axis=-1)
+
+    def getOrientations(self):
+        return self._rotation
+
+    def isTerminated(self):
+        return self._isTerminated
+
+    def carFollowsLine(self):
+        return self._followsLine
+
+    def getRewards(self):
+        return self._reward
+
+    def getMaxX(self):
+        """ array with the largest x position every car has reached """
+        return self._xmax
+
+
+def _intersectionAreas(curves, polygons):
+    """ area of the intersection of each curve with the polygon at the same index.
+    polygons are shapely geometries or an array of shape (M, points, 2)
+    Only polygons that intersect the (prepared) curve are intersected,
+    all others have area 0.0 exactly like the full intersection.
+    """
+    if not isinstance(polygons, np.ndarray) or polygons.dtype != object:
+        polygons = shapely.polygons(polygons)
+    areas = np.zeros(len(polygons))
+    hits = shapely.intersects(curves, polygons)
+    if hits.any():
+        areas[hits] = shapely.area(shapely.intersection(
+            curves[hits], polygons[hits]))
+    return areas
+
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+"""
+module that benchmarks the hot paths of the simulator and compares the results with a baseline
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage:
+    python Benchmark.py --save data/benchmark_baseline.json
+    python Benchmark.py --compare data/benchmark_baseline.json --threshold 0.25
+
+Every benchmark runs over the curves of SEEDS. The car and simulator benchmarks replay the
+poses and actions of the heuristic line tracker on the curve, recorded once before timing.
+Reported per benchmark: operations, operations per second, mean/p50/p90/p99/max latency (us)
+and the peak memory (bytes) allocated by Python during one extra untimed run on the first seed.
+--compare exits with status 1 when the operations per second of a benchmark dropped by more
+than its threshold.
+
+Baselines depend on the machine, so none is committed: save one with --save on the machine
+that runs --compare, before the change to be checked.
+"""
+
+import argparse
+import gc
+import io
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+import Car
+import Canvas
+import Heuristic
+import RobotCarSimulator
+from Instrumentation import PhaseTimer
+from Trajectory import ACTION_NAMES, INIT
+
+SEEDS = (2, 5, 9, 11, 13)
+DEFAULT_THRESHOLD = 0.2
+# steps per episode of the gif benchmarks, saveImage grows with the number of frames
+GIF_STEPS = 60
+LOG_LEVEL = logging.WARNING
+
+
+def recordEpisode(seed, maxDuration=20.0):
+    """ trajectory arrays of the heuristic line tracker on the curve of seed """
+    sim = RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(seed=seed, logLevel=LOG_LEVEL),
+                                             Car.CarModel(logLevel=LOG_LEVEL), createGif=False,
+                                             logLevel=LOG_LEVEL)
+    Heuristic.HeuristicLineTracker(sim, maxDuration, LOG_LEVEL).run()
+    return sim.getTrajectory().getArrays()
+
+
+def _poses(arrays):
+    return list(zip(arrays['x'].tolist(), arrays['y'].tolist(), arrays['angles'].tolist()))
+
+
+def _carAtPoses(seed, arrays, timer, method, argument):
+    """ time method(argument(canvas)) of a CarModel placed at every pose of the episode """
+    canvas = Canvas.CanvasModel(seed=seed, logLevel=LOG_LEVEL)
+    car = Car.CarModel(logLevel=LOG_LEVEL)
+    bound = getattr(car, method)
+    value = argument(canvas)
+    clock = time.perf_counter_ns
+    for x, y, angle in _poses(arrays):
+        car.setPosition((x, y))
+        car.setOrientation(angle)
+        start = clock()
+        bound(value)
+        timer.add(clock() - start)
+    return
+
+
+def benchSensorValues(seed, arrays, timer):
+    _carAtPoses(seed, arrays, timer, 'computeSensorValues',
+                Canvas.CanvasModel.getCurvePolygon)
+    return
+
+
+def benchFollowsLine(seed, arrays, timer):
+    _carAtPoses(seed, arrays, timer, 'followsLine',
+                Canvas.CanvasModel.getCurvePolygon)
+    return
+
+
+def benchWithinBounds(seed, arrays, timer):
+    _carAtPoses(seed, arrays, timer, 'isAtLeastOneCarSensorWithinBounds',
+                Canvas.CanvasModel.getCanvasRectangle)
+    return
+
+
+def benchCanvas(seed, arrays, timer):
+    start = time.perf_counter_ns()
+    Canvas.CanvasModel(seed=seed, logLevel=LOG_LEVEL)
+    timer.add(time.perf_counter_ns() - start)
+    return
+
+
+def _replay(seed, arrays, timer, createGif, maxSteps=None):
+    """ replay the actions of the episode in a new SimulatorControl, timing every step """
+    sim = RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(seed=seed, logLevel=LOG_LEVEL),
+                                             Car.CarModel(logLevel=LOG_LEVEL), createGif=createGif,
+                                             logLevel=LOG_LEVEL)
+    steps = [(getattr(sim, ACTION_NAMES[action]), speed, duration) for action, speed, duration
+             in zip(arrays['actions'].tolist(), arrays['speeds'].tolist(), arrays['durations'].tolist())
+             if action != INIT][:maxSteps]
+    clock = time.perf_counter_ns
+    for action, speed, duration in steps:
+        start = clock()
+        action(speed, duration)
+        timer.add(clock() - start)
+    return sim
+
+
+def benchStep(seed, arrays, timer):
+    _replay(seed, arrays, timer, False)
+    return
+
+
+def benchStepGif(seed, arrays, timer):
+    _replay(seed, arrays, timer, True, GIF_STEPS)
+    return
+
+
+def benchSaveImage(seed, arrays, timer):
+    sim = _replay(seed, arrays, PhaseTimer(), True, GIF_STEPS)
+    start = time.perf_counter_ns()
+    sim.saveImage(io.BytesIO())
+    timer.add(time.perf_counter_ns() - start)
+    return
+
+
+BENCHMARKS = {
+    'computeSensorValues': benchSensorValues,
+    'followsLine': benchFollowsLine,
+    'isAtLeastOneCarSensorWithinBounds': benchWithinBounds,
+    'CanvasModel': benchCanvas,
+    'step': benchStep,
+    'stepGif': benchStepGif,
+    'saveImage': benchSaveImage,
+}
+
+
+def run(names=None, seeds=SEEDS, memory=True):
+    """ run the benchmarks names (default all) and return the results as dict that can be saved as JSON """
+    episodes = {seed: recordEpisode(seed) for seed in seeds}
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        benchmark = BENCHMARKS[name]
+        timer = PhaseTimer(samples=1 << 20)
+        # like timeit without garbage collection, a collection pause would land in a random operation
+        gc.collect()
+        gc.disable()
+        try:
+            for seed in seeds:
+                benchmark(seed, episodes[seed], timer)
+        finally:
+            gc.enable()
+        stats = timer.getStats()
+        result = {'operations': stats['count'],
+                  'operationsPerSecond': stats['count'] / stats['total'] if stats['total'] else 0.0}
+        for key in ('mean', 'p50', 'p90', 'p99', 'max'):
+            result[key] = stats[key]
+        if memory:
+            tracemalloc.start()
+            benchmark(seeds[0], episodes[seeds[0]], PhaseTimer())
+            result['peakMemory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[name] = result
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'seeds': list(seeds),
+            'benchmarks': results}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, thresholds=None):
+    """ list of (name, baseline ops/s, current ops/s, relative change) of the benchmarks in both
+    results and baseline whose operations per second dropped by more than their threshold.
+    thresholds: optional dict name -> threshold overriding threshold
+    """
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        before = baseline['benchmarks'][name]['operationsPerSecond']
+        after = result['operationsPerSecond']
+        change = after / before - 1.0 if before else 0.0
+        if change < -(thresholds or {}).get(name, threshold):
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def formatResults(results, baseline=None):
+    lines = ['{:<34} {:>8} {:>12} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'benchmark', 'ops', 'ops/s', 'p50 us', 'p90 us', 'p99 us', 'peak KiB', 'change')]
+    for name, result in results['benchmarks'].items():
+        change = ''
+        if baseline is not None and name in baseline['benchmarks']:
+            before = baseline['benchmarks'][name]['operationsPerSecond']
+            change = '{:+.1%}'.format(result['operationsPerSecond'] / before - 1.0) if before else ''
+        lines.append('{:<34} {:>8} {:>12.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10} {:>10}'.format(
+            name, result['operations'], result['operationsPerSecond'], result['p50'], result['p90'],
+            result['p99'], result['peakMemory'] // 1024 if 'peakMemory' in result else '-', change))
+    return '\n'.join(lines)
+
+
+def _parseThresholds(values):
+    thresholds = {}
+    for value in values:
+        name, threshold = value.split('=')
+        thresholds[name] = float(threshold)
+    return thresholds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='benchmark the simulator hot paths and compare with a baseline')
+    parser.add_argument('--only', nargs='+', choices=tuple(BENCHMARKS), default=None,
+                        help='run only these benchmarks')
+    parser.add_argument('--seeds', type=int, nargs='+', default=SEEDS,
+                        help='curves to run the benchmarks on (default %(default)s)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the peak memory measurement')
+    parser.add_argument('--save', default=None,
+                        help='write the results as JSON baseline to this file')
+    parser.add_argument('--compare', default=None,
+                        help='JSON baseline to compare with, exit status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative drop of operations per second (default %(default)s)')
+    parser.add_argument('--threshold-for', nargs='+', default=[], metavar='NAME=THRESHOLD',
+                        help='threshold of single benchmarks, e.g. saveImage=0.5')
+    args = parser.parse_args()
+    results = run(args.only, tuple(args.seeds), not args.no_memory)
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(formatResults(results, baseline))
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold,
+                              _parseThresholds(args.threshold_for))
+        for name, before, after, change in regressions:
+            print('regression: {} {:.1f} -> {:.1f} ops/s ({:+.1%})'.format(name, before, after, change),
+                  file=sys.stderr)
+        sys.exit(1 if regressions else 0)
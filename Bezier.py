@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+module that evaluates Bezier curves with NumPy and looks up points by arc length
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import numpy as np
+
+# samples of the curve polygon of CanvasModel, t = 0, 0.05, ..., 1
+DEFAULT_SAMPLES = 21
+# samples of the arc-length table of CanvasModel.getArcLengthTable()
+ARC_LENGTH_SAMPLES = 1024
+
+
+def binomials(n):
+    """ the binomial coefficients n over k for k = 0..n (row n of Pascal's triangle) as float array """
+    row = [1]
+    for k in range(n):
+        row.append(row[-1] * (n - k) // (k + 1))
+    return np.array(row, dtype=np.float64)
+
+
+def bernsteinMatrix(degree, ts):
+    """ matrix of shape (len(ts), degree+1) with the Bernstein basis polynomials of degree at ts """
+    ts = np.asarray(ts, dtype=np.float64)[:, np.newaxis]
+    i = np.arange(degree + 1)
+    return binomials(degree) * ts ** i * (1.0 - ts) ** (degree - i)
+
+
+def evaluate(xys, ts):
+    """ points of shape (len(ts), 2) of the Bezier curve with control points xys at the parameters ts in [0, 1] """
+    xys = np.asarray(xys, dtype=np.float64)
+    return bernsteinMatrix(len(xys) - 1, ts) @ xys
+
+
+def derivative(xys, ts):
+    """ derivatives d/dt of shape (len(ts), 2) of the Bezier curve with control points xys at ts """
+    xys = np.asarray(xys, dtype=np.float64)
+    degree = len(xys) - 1
+    if degree == 0:
+        return np.zeros((len(ts), xys.shape[1]))
+    return degree * (bernsteinMatrix(degree - 1, ts) @ np.diff(xys, axis=0))
+
+
+def parameters(samples):
+    """ samples equidistant parameters from 0 to 1, the same values as t/(samples-1) in Python """
+    return np.arange(samples) / float(samples - 1)
+
+
+class ArcLengthTable():
+
+    def __init__(self, xys, samples=ARC_LENGTH_SAMPLES) -> None:
+        """ Cumulative arc length of the polyline through the curve at samples equidistant parameters.
+        pointAt interpolates on that polyline, so with the same samples it is the center line of the
+        curve polygon of CanvasModel. tangentAt is the direction of the curve itself.
+
+        xys: the control points of one curve or of a chain of curves of the same degree, array of shape
+        (curves, degree+1, 2) like TrackCanvas.getBezierSegments(). The polyline of a chain runs through
+        samples points of every curve, the parameter of curve i goes from i to i+1.
+        """
+        xys = np.asarray(xys, dtype=np.float64)
+        self._xys = xys[np.newaxis] if xys.ndim == 2 else xys
+        # the derivative of a Bezier curve is a Bezier curve of one degree less
+        self._hodographs = (self._xys.shape[1] - 1) * np.diff(self._xys, axis=1)
+        ts = parameters(samples)
+        # the curves of a chain share their end points
+        self._ts = np.concatenate([ts] + [i + ts[1:] for i in range(1, len(self._xys))])
+        self._points = np.concatenate([evaluate(self._xys[0], ts)] +
+                                      [evaluate(curve, ts)[1:] for curve in self._xys[1:]])
+        deltas = np.diff(self._points, axis=0)
+        self._segments = np.sqrt(deltas[:, 0] * deltas[:, 0] + deltas[:, 1] * deltas[:, 1])
+        self._lengths = np.concatenate(([0.0], np.cumsum(self._segments)))
+        return
+
+    def getLength(self):
+        return float(self._lengths[-1])
+
+    def getPoints(self):
+        """ the points of the polyline, array of shape (samples, 2) """
+        return self._points
+
+    def parameterAt(self, s):
+        """ the curve parameter t at the distances s (scalar or array) from the start """
+        return self._parameter(*self._locate(s))
+
+    def pointAt(self, s):
+        """ the point at the distances s from the start, shape (2,) for a scalar s, otherwise (len(s), 2) """
+        return self._point(*self._locate(s))
+
+    def tangentAt(self, s):
+        """ the unit tangent of the curve at the distances s from the start, shapes like pointAt """
+        return self._tangent(*self._locate(s))
+
+    def pointAndTangentAt(self, s):
+        located = self._locate(s)
+        return self._point(*located), self._tangent(*located)
+
+    def _parameter(self, segment, fraction):
+        return self._ts[segment] + fraction * (self._ts[segment + 1] - self._ts[segment])
+
+    def _point(self, segment, fraction):
+        start = self._points[segment]
+        return start + fraction[..., np.newaxis] * (self._points[segment + 1] - start)
+
+    def _tangent(self, segment, fraction):
+        ts = self._parameter(segment, fraction)
+        flat = np.atleast_1d(ts)
+        curves = np.minimum(flat.astype(np.intp), len(self._hodographs) - 1)
+        basis = bernsteinMatrix(self._hodographs.shape[1] - 1, flat - curves)
+        tangents = np.einsum('nk,nkd->nd', basis, self._hodographs[curves])
+        tangents /= np.sqrt((tangents * tangents).sum(axis=1))[:, np.newaxis]
+        return tangents.reshape(np.shape(ts) + (2,))
+
+    def _locate(self, s):
+        """ index of the segment and the fraction of the segment at the distances s (clipped to the curve) """
+        s = np.minimum(np.maximum(np.asarray(s, dtype=np.float64), 0.0), self._lengths[-1])
+        segment = np.minimum(np.searchsorted(self._lengths, s, side='right') - 1, len(self._segments) - 1)
+        length = self._segments[segment]
+        fraction = np.divide(s - self._lengths[segment], length, out=np.zeros_like(s),
+                             where=length > 0.0)
+        return segment, fraction
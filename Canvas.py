@@ -3,10 +3,14 @@
 import logging
 import random
 import time
-from PIL import Image, ImageDraw
 import math
-from shapely.geometry import LineString
+import shapely
+from shapely.geometry import LineString, Polygon
 from itertools import chain
+import Bezier
+from CoverageMap import CoverageMap, DEFAULT_RESOLUTION
+from DistanceField import DistanceField, DEFAULT_DISTANCE_RESOLUTION
+from TrackTiles import TrackTiles, DEFAULT_TILE_SIZE
 
 
 class CanvasModel():
@@ -15,10 +19,12 @@ class CanvasModel():
     CANVAS_BORDER = 100
     CURVE_WIDTH = 15
 
-    def __init__(self, size=CANVAS_SIZE, border=CANVAS_BORDER, curveWidth=CURVE_WIDTH, seed=time.time(), logLevel=logging.INFO) -> None:
+    def __init__(self, size=CANVAS_SIZE, border=CANVAS_BORDER, curveWidth=CURVE_WIDTH, seed=time.time(), logLevel=logging.INFO,
+                 curveSamples=Bezier.DEFAULT_SAMPLES) -> None:
         """
         Create a new canvas with a random curve.
         If you want a reproducible canvas provide a seed (e.g. 5 or 9)
+        curveSamples: number of points of the bezier curve the curve polygon is built from
         """
         self.__configLogger(logLevel)
         self._size = size
@@ -26,9 +32,43 @@ class CanvasModel():
         self._border = border
         self._curveWidth = curveWidth
         self._seed = seed
+        self._curveSamples = curveSamples
+        self._coverageMaps = {}
+        self._arcLengthTables = {}
+        self._distanceFields = {}
+        self._trackTiles = {}
+        self._curvePolygon = None
+        self._backgroundImages = {}
         self.initCurve()
         return
 
+    @classmethod
+    def fromCurve(cls, size, border, curveWidth, seed, bezierPoints, curvePoints, angle, coverageMaps=None):
+        """
+        Create a canvas for a curve computed before (e.g. loaded from a TrackLibrary)
+        without recomputing the bezier curve and its polygon.
+        coverageMaps: optional dict resolution -> CoverageMap of the curve
+        """
+        canvas = cls.__new__(cls)
+        canvas._logger = logging.getLogger(__name__)
+        canvas._size = tuple(size)
+        canvas._imgsize = (size[0]+border*2, size[1]+border*2)
+        canvas._border = border
+        canvas._curveWidth = curveWidth
+        canvas._seed = seed
+        canvas._coverageMaps = dict(coverageMaps or {})
+        canvas._arcLengthTables = {}
+        canvas._distanceFields = {}
+        canvas._trackTiles = {}
+        canvas._curveSamples = Bezier.DEFAULT_SAMPLES
+        canvas._centerLine = None
+        canvas._curvePolygon = None
+        canvas._backgroundImages = {}
+        canvas._bezierPoints = [tuple(point) for point in bezierPoints]
+        canvas._curvePoints = [tuple(point) for point in curvePoints]
+        canvas._angle = angle
+        return canvas
+
     def initCurve(self):
         """
         initialize a line from left to right that follows bezier curves - 
@@ -43,13 +83,14 @@ class CanvasModel():
         x.append(self._size[0]+self._border)
         y = random.sample(range(self._border, self._size[1]+self._border), i+2)
         xys = list(zip(x, y))
-        ts = [t/20.0 for t in range(21)]
 
-        bezier = make_bezier(xys)
-        points = bezier(ts)
+        # the center line through curveSamples points of the bezier curve
+        table = Bezier.ArcLengthTable(xys, self._curveSamples)
+
+        self._centerLine = table.getPoints()
 
         # now extend line into 15 width polygon with shapely
-        line = LineString([list(point) for point in points])
+        line = LineString(self._centerLine)
         # the buffer() invocation is the essential one extending the line
         newpoints = line.buffer(7.5, cap_style=3, join_style=1)
         self._curvePoints = list(newpoints.exterior.coords)
@@ -59,13 +100,29 @@ class CanvasModel():
         # should be on top of the curve.
 
         # First we compute a point on the line with a distance of 100 mm from the start of the line
-        sensorpos = line.interpolate(100)
+        sensorpos = table.pointAt(100)
         # then we compute the orientation angle (degrees) of that point relative to the start point
-        self._delta_y = (sensorpos.y-xys[0][1])/(sensorpos.x-xys[0][0])
+        self._delta_y = (sensorpos[1]-xys[0][1])/(sensorpos[0]-xys[0][0])
         self._angle = math.degrees(math.atan(self._delta_y))
         self._bezierPoints = xys
         self._logger.debug(
-            f'Canvas: new Curve: {i} bezier control points, orientation {self._angle}, startpoint {xys[0]}, size {self._size}, border {self._border}')
+            'Canvas: new Curve: %s bezier control points, orientation %s, startpoint %s, size %s, border %s',
+            i, self._angle, xys[0], self._size, self._border)
+
+    def getSeed(self):
+        return self._seed
+
+    def getSize(self):
+        return self._size
+
+    def getBorder(self):
+        return self._border
+
+    def getCurveWidth(self):
+        return self._curveWidth
+
+    def getBezierPoints(self):
+        return self._bezierPoints
 
     def getCurveStartingPoint(self):
         return self._bezierPoints[0]
@@ -76,21 +133,102 @@ class CanvasModel():
     def getCurveBoundingPoints(self):
         return self._curvePoints
 
+    def getCurvePolygon(self):
+        """ the curve as prepared shapely Polygon, built once per canvas """
+        if self._curvePolygon is None:
+            self._curvePolygon = Polygon(self._curvePoints)
+            shapely.prepare(self._curvePolygon)
+        return self._curvePolygon
+
+    def getCoverageMap(self, resolution=DEFAULT_RESOLUTION):
+        """ the curve rasterized with the given resolution (mm per cell),
+        computed once per resolution and canvas
+        """
+        if resolution not in self._coverageMaps:
+            self._coverageMaps[resolution] = CoverageMap(
+                self._curvePoints, resolution)
+        return self._coverageMaps[resolution]
+
+    def getTrackTiles(self, tileSize=DEFAULT_TILE_SIZE):
+        """ the curve polygon split into tiles of tileSize mm (see TrackTiles.TrackTiles),
+        computed once per tile size and canvas
+        """
+        if tileSize not in self._trackTiles:
+            self._trackTiles[tileSize] = TrackTiles(
+                self.getCurvePolygon(), tileSize)
+        return self._trackTiles[tileSize]
+
+    def getCenterLine(self):
+        """ the points of the bezier curve the curve polygon is built from, array of shape (curveSamples, 2) """
+        if self._centerLine is None:
+            self._centerLine = Bezier.evaluate(
+                self._bezierPoints, Bezier.parameters(self._curveSamples))
+        return self._centerLine
+
+    def getDistanceField(self, resolution=DEFAULT_DISTANCE_RESOLUTION):
+        """ the DistanceField.DistanceField of the centre line covering the whole image
+        for cross-track distance and progress lookups, computed once per resolution and canvas
+        """
+        if resolution not in self._distanceFields:
+            self._distanceFields[resolution] = DistanceField(
+                self.getCenterLine(), (0, 0) + self._imgsize, resolution)
+        return self._distanceFields[resolution]
+
+    def getArcLengthTable(self, samples=Bezier.ARC_LENGTH_SAMPLES):
+        """ the Bezier.ArcLengthTable of the curve for point and tangent at distance queries,
+        computed once per number of samples and canvas
+        """
+        if samples not in self._arcLengthTables:
+            self._arcLengthTables[samples] = Bezier.ArcLengthTable(
+                self._bezierPoints, samples)
+        return self._arcLengthTables[samples]
+
     def getCanvasBoundingPoints(self):
         return ((self._border, self._border), (self._size[0]+self._border, self._border), (self._size[0]+self._border, self._size[1]+self._border), (self._border, self._size[1]+self._border), (self._border, self._border))
 
+    def getCanvasRectangle(self):
+        """ the canvas as axis aligned rectangle (xmin, ymin, xmax, ymax) """
+        return (self._border, self._border, self._size[0]+self._border, self._size[1]+self._border)
+
+    def getBackgroundImage(self, palette=False):
+        """ the static image of the canvas with the curve, rendered once per canvas.
+        palette: a mode 'P' image with FrameRecorder.PALETTE instead of RGB
+        Do not draw on the returned image, use createImageAndDraw for a copy.
+        """
+        if palette not in self._backgroundImages:
+            # PIL is only imported when images are drawn
+            from PIL import Image, ImageDraw
+            from FrameRecorder import PALETTE
+            if palette:
+                im = Image.new('P', self._imgsize, 0)
+                im.putpalette([value for color in PALETTE for value in color])
+            else:
+                im = Image.new('RGB', self._imgsize, (128, 128, 128))
+            imageDraw = ImageDraw.Draw(im)
+            imageDraw.rectangle((self._border, self._border, self._size[0]+self._border, self._size[1]+self._border), fill=(
+                255, 255, 255), width=1, outline=(255, 255, 255))
+            self._drawCurve(imageDraw)
+            self._backgroundImages[palette] = im
+        return self._backgroundImages[palette]
+
+    def _drawCurve(self, imageDraw):
+        imageDraw.polygon(self._curvePoints, outline='black', fill='black')
+        return
+
     def createImageAndDraw(self):
-        im = Image.new('RGB', self._imgsize, (128, 128, 128))
+        from PIL import ImageDraw
+        im = self.getBackgroundImage().copy()
         imageDraw = ImageDraw.Draw(im)
-        imageDraw.rectangle((self._border, self._border, self._size[0]+self._border, self._size[1]+self._border), fill=(
-            255, 255, 255), width=1, outline=(255, 255, 255))
-        imageDraw.polygon(self._curvePoints, outline='black', fill='black')
         return (im, imageDraw)
 
     def __configLogger(self, logLevel):
         """ by default log all INFO level and above messages to stderr with timestamp, module and threadname, level and message
             """
         self._logger = logging.getLogger(__name__)
+        handlers = self._logger.handlers
+        if self._logger.level == logLevel and len(handlers) == 1 and handlers[0].level == logLevel:
+            # already configured by a previous instance
+            return
         self._logger.setLevel(logLevel)
         self._logger.handlers.clear()
         console_handler = logging.StreamHandler()
@@ -102,46 +240,10 @@ class CanvasModel():
         return
 
 
-# The following functions are copied from
-# https://stackoverflow.com/questions/246525/how-can-i-draw-a-bezier-curve-using-pythons-pil
-# Copyright https://stackoverflow.com/users/190597/unutbu
-
-
 def make_bezier(xys):
-    # xys should be a sequence of 2-tuples (Bezier control points)
-    n = len(xys)
-    combinations = pascal_row(n-1)
-
+    """ the function ts -> list of points of the bezier curve with the control points xys,
+    see Bezier.evaluate for the array version
+    """
     def bezier(ts):
-        # This uses the generalized formula for bezier curves
-        # http://en.wikipedia.org/wiki/B%C3%A9zier_curve#Generalization
-        result = []
-        for t in ts:
-            tpowers = (t**i for i in range(n))
-            upowers = reversed([(1-t)**i for i in range(n)])
-            coefs = [c*a*b for c, a, b in zip(combinations, tpowers, upowers)]
-            result.append(
-                tuple(sum([coef*p for coef, p in zip(coefs, ps)]) for ps in zip(*xys)))
-        return result
+        return [tuple(point) for point in Bezier.evaluate(xys, ts).tolist()]
     return bezier
-
-
-def pascal_row(n, memo={}):
-    # This returns the nth row of Pascal's Triangle
-    if n in memo:
-        return memo[n]
-    result = [1]
-    x, numerator = 1, n
-    for denominator in range(1, n//2+1):
-        # print(numerator,denominator,x)
-        x *= numerator
-        x /= denominator
-        result.append(x)
-        numerator -= 1
-    if n & 1 == 0:
-        # n is even
-        result.extend(reversed(result[:-1]))
-    else:
-        result.extend(reversed(result))
-    memo[n] = result
-    return result
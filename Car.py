@@ -1,5 +1,6 @@
 import logging, math
-from PIL import Image, ImageDraw
+import numpy as np
+import shapely
 from shapely.geometry import Polygon
 
 
@@ -21,12 +22,18 @@ class CarModel():
                ((8,50),(8,75),(72,75),(72,50),(8,50)) # front-right
     )
 
+    # the pose, the cosine and sine of the rotation and the transformed vertices cached for the pose
+    __slots__ = ('_logger', '_position', '_rotation', '_scale', '_trig', '_vertices', '_shapes')
+
     def __init__(self, logLevel=logging.INFO) -> None:
         self.__configLogger(logLevel)
         self._position = (0.0,0.0)
         self._rotation = 0.0 # pointing from top to bottom (south)
         self._scale = 1.0
-        self._logger.debug(f'Car: new Car with position {self._position}, orientation {self._rotation}, scale {self._scale}')
+        self._trig = None
+        self._vertices = None
+        self._shapes = None
+        self._logger.debug('Car: new Car with position %s, orientation %s, scale %s', self._position, self._rotation, self._scale)
        
         return
 
@@ -35,7 +42,8 @@ class CarModel():
         pos: tuple of x, y coordinates (top left corner is (0,0) x coordinates go to the right, y to the bottom)
         """
         self._position=pos
-        self._logger.debug(f'Car: setPosition {pos}: new position is {self._position}, orientation is {self._rotation}')
+        self._vertices = None
+        self._logger.debug('Car: setPosition %s: new position is %s, orientation is %s', pos, self._position, self._rotation)
        
 
     def setOrientation(self, angle) -> None:
@@ -45,7 +53,9 @@ class CarModel():
         negative value counter-clockwise
         """
         self._rotation = angle
-        self._logger.debug(f'Car: setOrientation {angle}: new position is {self._position}, orientation is {self._rotation}')
+        self._trig = None
+        self._vertices = None
+        self._logger.debug('Car: setOrientation %s: new position is %s, orientation is %s', angle, self._position, self._rotation)
        
 
     def setScale(self, scale) -> None:
@@ -54,12 +64,27 @@ class CarModel():
         A scale of 2.0 means two pixels per mm (car is drawn bigger), a scale of 0.5 means 0.5 pixels per mm (car is drawn smaller)
         """
         self._scale = scale
+        self._vertices = None
         return
 
+    def copy(self):
+        """ a new car with the same pose and scale, without configuring the logger again.
+        The cached vertices are shared, a car replaces them when its pose changes.
+        """
+        car = CarModel.__new__(CarModel)
+        for name in CarModel.__slots__:
+            setattr(car, name, getattr(self, name))
+        return car
+
+    def _rotationTrig(self):
+        """ (cos, sin) of the rotation, computed once per orientation """
+        if self._trig is None:
+            angle = math.radians(self._rotation)
+            self._trig = (math.cos(angle), math.sin(angle))
+        return self._trig
+
     def rotatePoint (self, p):
-        angle = math.radians(self._rotation)
-        cos_theta = math.cos(angle)
-        sin_theta = math.sin(angle)
+        cos_theta, sin_theta = self._rotationTrig()
         return (p[0] * cos_theta - p[1] * sin_theta, p[0] * sin_theta + p[1] * cos_theta)
 
     def translatePoint(self, p):
@@ -72,17 +97,67 @@ class CarModel():
         return tuple(self.translatePoint(self.rotatePoint(x)) for x in tuples)
        
     def rotateAndTranslateAndScalePoints(self, tuples):
-        return tuple(self.scalePoint(self.translatePoint(self.rotatePoint(x))) for x in tuples)   
+        """ the points transformed to the current pose and scale,
+        bodybox, the wheels and the sensors are taken from the vertices cached for the pose
+        """
+        index = SHAPE_INDEX.get(id(tuples))
+        if index is not None:
+            if self._vertices is None:
+                self.getVertices()
+            shape = self._shapes[index]
+            if shape is None:
+                start, end = SHAPE_ROWS[index]
+                shape = self._shapes[index] = tuple(map(tuple, self._vertices[start:end].tolist()))
+            return shape
+        return self._transformPoints(tuples)
+
+    def _transformPoints(self, tuples):
+        # same operations in the same order as rotatePoint, translatePoint and scalePoint
+        cos_theta, sin_theta = self._rotationTrig()
+        px, py = self._position
+        scale = self._scale
+        return tuple(((x * cos_theta - y * sin_theta + px) * scale, (x * sin_theta + y * cos_theta + py) * scale)
+                     for x, y in tuples)
+
+    def getVertices(self):
+        """ the vertices of bodybox, the wheels and the sensors (see SHAPES) at the current pose and scale
+        as array of shape (len(VERTICES), 2), transformed once per pose in one NumPy operation
+        """
+        if self._vertices is None:
+            cos_theta, sin_theta = self._rotationTrig()
+            # same operations in the same order as rotatePoint, translatePoint and scalePoint
+            vertices = np.empty_like(VERTICES)
+            x = vertices[:, 0]
+            y = vertices[:, 1]
+            np.multiply(VERTICES_X, cos_theta, out=x)
+            x -= VERTICES_Y * sin_theta
+            x += self._position[0]
+            x *= self._scale
+            np.multiply(VERTICES_X, sin_theta, out=y)
+            y += VERTICES_Y * cos_theta
+            y += self._position[1]
+            y *= self._scale
+            self._vertices = vertices
+            # the tuples of a shape are built when they are used first
+            self._shapes = [None] * len(SHAPES)
+        return self._vertices
+
+    def getSensorVertices(self):
+        """ the sensor polygons at the current pose and scale, array of shape (3, 5, 2) """
+        return self.getVertices()[SENSOR_ROWS].reshape(len(self.sensors), -1, 2)
 
     def moveForward(self,x) -> None:
         delta = self.rotatePoint((x,0.0))
         self._position = (self._position[0]+delta[0], self._position[1]+delta[1])
-        self._logger.debug(f'Car: moveForward {x}: new position is {self._position}, orientation is {self._rotation}')
+        self._vertices = None
+        self._logger.debug('Car: moveForward %s: new position is %s, orientation is %s', x, self._position, self._rotation)
         return
     
     def rotate(self, x) -> None:
         self._rotation = self._rotation + x
-        self._logger.debug(f'Car: rotate {x}: new position is {self._position}, orientation is {self._rotation}')
+        self._trig = None
+        self._vertices = None
+        self._logger.debug('Car: rotate %s: new position is %s, orientation is %s', x, self._position, self._rotation)
         return
 
     def computeSensorValues(self, curve):
@@ -90,22 +165,38 @@ class CarModel():
         and compute the sensor values
         
         curve: be a list of points that form a polygon e.g. [(0,0),(5,5),(0,0)]
+        or a shapely Polygon (preferably prepared) like CanvasModel.getCurvePolygon()
         
         return sensor values between 30 (not on line) and 900 (fully on line)
         (in real life the sensor value depends on lighting conditions and varies between 0 and 1024)
         """
-        result = []
-        curve = Polygon([list(point) for point in curve])
-        for i in range(3):
-            currentsensorbounds = self.rotateAndTranslateAndScalePoints(self.sensors[i])
-            sensorpoly = Polygon([list(point) for point in currentsensorbounds])
-            x = curve.intersection(sensorpoly)
-            areasize = x.area
-            sensorvalue = 30 + 870 * areasize / 25.0
-            result.append(sensorvalue)
-        return result
+        curve = asPolygon(curve)
+        sensorpolys = shapely.polygons(self.getSensorVertices())
+        areas = np.zeros(len(sensorpolys))
+        # a sensor that does not touch the curve has an empty intersection (area 0.0)
+        hits = shapely.intersects(curve, sensorpolys)
+        if hits.any():
+            areas[hits] = shapely.area(shapely.intersection(curve, sensorpolys[hits]))
+        return (30 + 870 * areas / 25.0).tolist()
+
+    def computeSensorValuesRaster(self, coverageMap):
+        """ same as computeSensorValues but looks up the intersection areas in the
+        CoverageMap of the curve (see CoverageMap.CoverageMap for the error bound)
+        """
+        return (30 + 870 * coverageMap.polygonAreas(self.getSensorVertices()) / 25.0).tolist()
 
     def isAtLeastOneCarSensorWithinBounds(self, bounds):
+        """ bounds: a list of points that form a polygon or an axis aligned rectangle
+        (xmin, ymin, xmax, ymax) like CanvasModel.getCanvasRectangle() which is tested analytically
+        """
+        if isinstance(bounds[0], (int, float)):
+            # without cached vertices transforming the 15 sensor points in Python is cheaper than all vertices
+            # with NumPy, the points are the same (see getVertices)
+            transform = self.rotateAndTranslateAndScalePoints if self._vertices is not None else self._transformPoints
+            for i in range(3):
+                if polygonOverlapsRectangle(transform(self.sensors[i]), bounds):
+                    return True
+            return False
         canvas = Polygon([list(point) for point in bounds])
         for i in range(3):
             currentsensorbounds = self.rotateAndTranslateAndScalePoints(self.sensors[i])
@@ -117,16 +208,26 @@ class CarModel():
         return False
 
     def followsLine(self, bounds):
-        curve = Polygon([list(point) for point in bounds])
+        """ bounds: the curve as list of points or as shapely Polygon like CanvasModel.getCurvePolygon() """
+        curve = asPolygon(bounds)
         x = self._position[0]
         y = self._position[1]
         d = 20  # we say we are following the line if our center is at max 2 cm next to the line
         center = Polygon([[x-d, y-d],[x+d, y-d],[x+d, y+d],[x-d, y+d],[x-d, y-d]])
+        if not shapely.intersects(curve, center):
+            return False
         intersect = curve.intersection(center)
         if (intersect.area > 0.0):
              return True
         return False
 
+    def followsLineRaster(self, coverageMap):
+        """ same as followsLine but looks up the covered area of the box in the CoverageMap of the curve """
+        x = self._position[0]
+        y = self._position[1]
+        d = 20  # same distance as followsLine
+        return coverageMap.rectangleArea(x-d, y-d, x+d, y+d) > 0.0
+
     def draw(self, imageDraw) -> None:
         imageDraw.polygon(self.rotateAndTranslateAndScalePoints(self.bodybox), fill=None, outline=(0,0,0), width=2)
         for w in self.wheels:
@@ -140,6 +241,10 @@ class CarModel():
         """ by default log all INFO level and above messages to stderr with timestamp, module and threadname, level and message
         """
         self._logger = logging.getLogger(__name__)
+        handlers = self._logger.handlers
+        if self._logger.level == logLevel and len(handlers) == 1 and handlers[0].level == logLevel:
+            # already configured by a previous instance
+            return
         self._logger.setLevel(logLevel)
         self._logger.handlers.clear()
         console_handler = logging.StreamHandler()
@@ -149,11 +254,63 @@ class CarModel():
         self._logger.addHandler(console_handler)
         return
 
-    
 
-    
-    
+# all vertices of the car in one array: bodybox, the wheels and the sensors (SHAPES) one after the other
+SHAPES = (CarModel.bodybox,) + CarModel.wheels + CarModel.sensors
+VERTICES = np.array([point for shape in SHAPES for point in shape], dtype=np.float64)
+VERTICES_X = np.ascontiguousarray(VERTICES[:, 0])
+VERTICES_Y = np.ascontiguousarray(VERTICES[:, 1])
+SHAPE_ROWS = tuple(zip(np.cumsum([0] + [len(shape) for shape in SHAPES[:-1]]).tolist(),
+                       np.cumsum([len(shape) for shape in SHAPES]).tolist()))
+SHAPE_INDEX = {id(shape): i for i, shape in enumerate(SHAPES)}
+SENSOR_ROWS = slice(SHAPE_ROWS[-len(CarModel.sensors)][0], SHAPE_ROWS[-1][1])
+
 
+def asPolygon(curve):
+    """ curve as shapely geometry, a list of points is converted to a Polygon """
+    if isinstance(curve, shapely.Geometry):
+        return curve
+    return Polygon([list(point) for point in curve])
+
+
+def polygonOverlapsRectangle(points, rectangle):
+    """ True if the convex polygon (list of points, closed) and the axis aligned rectangle
+    (xmin, ymin, xmax, ymax) have an intersection with area > 0 (separating axis theorem)
+    """
+    xmin, ymin, xmax, ymax = rectangle
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    if max(xs) <= xmin or min(xs) >= xmax or max(ys) <= ymin or min(ys) >= ymax:
+        return False
+    for x, y in points:
+        if xmin < x < xmax and ymin < y < ymax:
+            return True
+    corners = ((xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax))
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        nx, ny = y0 - y1, x1 - x0
+        projection = [nx * x + ny * y for x, y in points]
+        rectangleProjection = [nx * x + ny * y for x, y in corners]
+        if max(projection) <= min(rectangleProjection) or min(projection) >= max(rectangleProjection):
+            return False
+    return True
 
 
-    
\ No newline at end of file
+def polygonsOverlapRectangles(polygons, rectangles):
+    """ vectorized polygonOverlapsRectangle for arrays of convex polygons (..., points, 2)
+    and rectangles (..., 4) that broadcast against each other
+    """
+    px = polygons[..., 0]
+    py = polygons[..., 1]
+    xmin, ymin, xmax, ymax = (rectangles[..., i] for i in range(4))
+    overlap = (px.min(axis=-1) < xmax) & (px.max(axis=-1) > xmin) & \
+        (py.min(axis=-1) < ymax) & (py.max(axis=-1) > ymin)
+    # the edge normals of the polygon are the remaining separating axes
+    corners = np.stack((np.stack((xmin, ymin), axis=-1), np.stack((xmax, ymin), axis=-1),
+                        np.stack((xmax, ymax), axis=-1), np.stack((xmin, ymax), axis=-1)), axis=-2)
+    edges = np.diff(polygons, axis=-2)
+    normals = np.stack((-edges[..., 1], edges[..., 0]), axis=-1)
+    polygonProjection = np.einsum('...ek,...pk->...ep', normals, polygons)
+    rectangleProjection = np.einsum('...ek,...pk->...ep', normals, corners)
+    overlap &= ((polygonProjection.min(axis=-1) < rectangleProjection.max(axis=-1)) &
+                (polygonProjection.max(axis=-1) > rectangleProjection.min(axis=-1))).all(axis=-1)
+    return overlap
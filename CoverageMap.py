@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+module that rasterizes a curve polygon into a coverage grid with a summed-area table
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import math
+import numpy as np
+
+# sensor modes of the simulators
+SENSOR_MODE_EXACT = 'exact'
+SENSOR_MODE_RASTER = 'raster'
+SENSOR_MODE_TILED = 'tiled'
+SENSOR_MODES = (SENSOR_MODE_EXACT, SENSOR_MODE_RASTER, SENSOR_MODE_TILED)
+
+DEFAULT_RESOLUTION = 0.5  # mm per grid cell
+# number of sub-rows per grid row sampled when rasterizing
+SUBROWS = 4
+# coverage of a cell is stored in 1/COVERAGE_SCALE units
+COVERAGE_SCALE = 255
+# number of strips per grid row used for the sensor polygons
+STRIPS = 2
+
+
+class CoverageMap():
+    """ Coverage of a polygon on a regular grid together with its integral image.
+
+    Each grid cell stores the fraction of the cell covered by the polygon.
+    Along x the covered length is computed exactly, along y it is sampled
+    with SUBROWS scanlines per cell. The summed-area table integrates this
+    piecewise constant coverage, so the covered area of any axis aligned
+    rectangle is a bilinear lookup of its four corners.
+
+    Convex polygons (the car sensors) are cut into STRIPS horizontal strips per
+    grid row and each strip is replaced by the rectangle spanning the polygon's
+    width at the middle of the strip.
+
+    Error bound against the exact shapely intersection area: the raster result can
+    only differ inside the grid cells crossed by the curve border, so the error grows
+    linearly with the resolution h (mm). For the 5x5 mm car sensors the sensor value
+    (30 + 870 * area / 25) differs by at most
+
+        |raster - exact| <= 40 * h sensor units
+
+    (20 units = 2.3 % of the sensor range at the default h = 0.5 mm). This is checked
+    in TestCoverageMap for sensors straddling the curve border of the training seeds
+    (measured maximum 19.4 at h = 0.5, 6.7 at h = 0.25, 36.6 at h = 1.0; mean 0.9 at h = 0.5).
+    Sensors away from the curve border read exactly 30 (off the curve) and up
+    to the strip approximation of their outline 900 (on the curve).
+    """
+
+    def __init__(self, polygon, resolution=DEFAULT_RESOLUTION) -> None:
+        """
+        polygon: a list of points that form a closed polygon e.g. [(0,0),(5,5),(5,0),(0,0)]
+        resolution: edge length of a grid cell in mm
+        """
+        points = np.asarray(polygon, dtype=np.float64)
+        self._resolution = resolution
+        # the grid covers the bounding box of the polygon plus one empty cell on each side
+        self._origin = points.min(axis=0) - resolution
+        self._cols = int(math.ceil((points[:, 0].max() -
+                         self._origin[0]) / resolution)) + 1
+        self._rows = int(math.ceil((points[:, 1].max() -
+                         self._origin[1]) / resolution)) + 1
+        coverage = self._rasterize((points - self._origin) / resolution)
+        # int32 is enough unless the polygon covers more than 8 million cells
+        dtype = np.int32 if coverage.sum(dtype=np.int64) < np.iinfo(
+            np.int32).max else np.int64
+        self._sat = np.zeros((self._rows+1, self._cols+1), dtype=dtype)
+        np.cumsum(coverage, axis=0, out=self._sat[1:, 1:])
+        np.cumsum(self._sat[1:, 1:], axis=1, out=self._sat[1:, 1:])
+        return
+
+    @classmethod
+    def fromArrays(cls, origin, resolution, sat):
+        """ CoverageMap for a summed-area table computed before (e.g. stored in a track library),
+        sat may be a read-only memory mapped array
+        """
+        coverageMap = cls.__new__(cls)
+        coverageMap._resolution = resolution
+        coverageMap._origin = np.asarray(origin, dtype=np.float64)
+        coverageMap._rows = sat.shape[0] - 1
+        coverageMap._cols = sat.shape[1] - 1
+        coverageMap._sat = sat
+        return coverageMap
+
+    def getOrigin(self):
+        return self._origin
+
+    def getSummedAreaTable(self):
+        return self._sat
+
+    def _rasterize(self, points):
+        """ coverage in 1/COVERAGE_SCALE units per cell of the polygon given in cell coordinates """
+        rows, cols = self._rows, self._cols
+        # y coordinates of all scanlines
+        scan = (np.arange(rows*SUBROWS) + 0.5) / SUBROWS
+        y0 = points[:-1, 1]
+        y1 = points[1:, 1]
+        x0 = points[:-1, 0]
+        x1 = points[1:, 0]
+        # half open rule so that a vertex exactly on a scanline is counted once
+        crosses = (np.minimum(y0, y1)[np.newaxis, :] <= scan[:, np.newaxis]) & (
+            scan[:, np.newaxis] < np.maximum(y0, y1)[np.newaxis, :])
+        line, edge = np.nonzero(crosses)
+        x = x0[edge] + (scan[line] - y0[edge]) * \
+            (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+        # even-odd rule: sorted crossings of a scanline pair up to covered spans
+        order = np.lexsort((x, line))
+        line = line[order][::2]
+        start = x[order][::2]
+        end = x[order][1::2]
+        # spans add 1 to every cell they cover completely (accumulated as a difference array)
+        # and the covered fraction to the cells that contain their ends
+        row = line // SUBROWS
+        first = np.floor(start).astype(np.intp)
+        last = np.floor(end).astype(np.intp)
+        covered = np.zeros((rows, cols+1), dtype=np.float32)
+        inner = last > first
+        np.add.at(covered, (row[inner], first[inner]+1), 1.0)
+        np.add.at(covered, (row[inner], last[inner]), -1.0)
+        np.cumsum(covered, axis=1, out=covered)
+        np.add.at(covered, (row[inner], first[inner]),
+                  (first[inner] + 1 - start[inner]))
+        np.add.at(covered, (row[inner], last[inner]),
+                  (end[inner] - last[inner]))
+        np.add.at(covered, (row[~inner], first[~inner]),
+                  (end[~inner] - start[~inner]))
+        return np.rint(covered[:, :cols] * (COVERAGE_SCALE / SUBROWS)).astype(np.int32)
+
+    def getResolution(self):
+        return self._resolution
+
+    def nbytes(self):
+        """ memory used by the summed-area table """
+        return self._sat.nbytes
+
+    def _integral(self, u, v):
+        """ covered cells in [0,u]x[0,v] (grid coordinates, arrays of the same shape) """
+        u = np.minimum(np.maximum(u, 0.0), self._cols)
+        v = np.minimum(np.maximum(v, 0.0), self._rows)
+        i = np.minimum(u.astype(np.intp), self._cols-1)
+        j = np.minimum(v.astype(np.intp), self._rows-1)
+        fu = u - i
+        fv = v - j
+        sat = self._sat
+        return ((sat[j, i] * (1.0-fu) + sat[j, i+1] * fu) * (1.0-fv) +
+                (sat[j+1, i] * (1.0-fu) + sat[j+1, i+1] * fu) * fv)
+
+    def _rowIntegral(self, u, j):
+        """ covered cells in [0,u] of grid rows j (integer array of the same shape as u) """
+        u = np.minimum(np.maximum(u, 0.0), self._cols)
+        i = np.minimum(u.astype(np.intp), self._cols-1)
+        fu = u - i
+        sat = self._sat
+        return ((sat[j+1, i] - sat[j, i]) * (1.0-fu) + (sat[j+1, i+1] - sat[j, i+1]) * fu)
+
+    def rectangleAreas(self, xmin, ymin, xmax, ymax):
+        """ covered area (mm²) of the axis aligned rectangles, all arguments are arrays of the same shape """
+        ox, oy = self._origin
+        h = self._resolution
+        u = (np.stack((xmax, xmin, xmax, xmin)) - ox) / h
+        v = (np.stack((ymax, ymax, ymin, ymin)) - oy) / h
+        corners = self._integral(u, v)
+        cells = corners[0] - corners[1] - corners[2] + corners[3]
+        return cells * (h * h / COVERAGE_SCALE)
+
+    def rectangleArea(self, xmin, ymin, xmax, ymax):
+        """ rectangleAreas for a single rectangle given as python floats, without the NumPy overhead """
+        ox, oy = self._origin
+        h = self._resolution
+        cols, rows = self._cols, self._rows
+        sat = self._sat
+        corners = []
+        for x, y in ((xmax, ymax), (xmin, ymax), (xmax, ymin), (xmin, ymin)):
+            u = min(max((x - ox) / h, 0.0), cols)
+            v = min(max((y - oy) / h, 0.0), rows)
+            i = min(int(u), cols-1)
+            j = min(int(v), rows-1)
+            fu = u - i
+            fv = v - j
+            corners.append((int(sat[j, i]) * (1.0-fu) + int(sat[j, i+1]) * fu) * (1.0-fv) +
+                           (int(sat[j+1, i]) * (1.0-fu) + int(sat[j+1, i+1]) * fu) * fv)
+        cells = corners[0] - corners[1] - corners[2] + corners[3]
+        return cells * (h * h / COVERAGE_SCALE)
+
+    def polygonAreas(self, polygons):
+        """ covered area (mm²) of convex closed polygons given as an array of shape (M, points, 2) """
+        polygons = np.asarray(polygons, dtype=np.float64)
+        areas = np.zeros(len(polygons))
+        # polygons whose bounding box is not covered at all have area 0 - no need to cut them into strips
+        lower = polygons.min(axis=1)
+        upper = polygons.max(axis=1)
+        hits = self.rectangleAreas(
+            lower[:, 0], lower[:, 1], upper[:, 0], upper[:, 1]) > 0.0
+        if hits.any():
+            areas[hits] = self._stripAreas(polygons[hits])
+        return areas
+
+    def _stripAreas(self, polygons):
+        """ covered area (mm²) of convex closed polygons summed over horizontal strips """
+        polygons = (polygons - self._origin) / self._resolution
+        v = polygons[..., 1]
+        vmin = v.min(axis=-1)
+        vmax = v.max(axis=-1)
+        # STRIPS strips per grid row, from the row of vmin to the row of vmax
+        first = np.floor(vmin)
+        rows = int((np.floor(vmax) - first).max()) + 1
+        bounds = first[:, np.newaxis] + \
+            np.arange(rows*STRIPS+1)[np.newaxis, :] / STRIPS
+        bounds = np.minimum(np.maximum(
+            bounds, vmin[:, np.newaxis]), vmax[:, np.newaxis])
+        height = bounds[:, 1:] - bounds[:, :-1]
+        middle = (bounds[:, :-1] + bounds[:, 1:]) / 2.0
+        # the first and last grid row are empty, strips outside of the grid use them
+        row = np.minimum(np.maximum(np.floor(middle), 0),
+                         self._rows-1).astype(np.intp)
+        # u coordinates where the middle of each strip crosses each edge
+        u0 = polygons[:, np.newaxis, :-1, 0]
+        v0 = polygons[:, np.newaxis, :-1, 1]
+        u1 = polygons[:, np.newaxis, 1:, 0]
+        v1 = polygons[:, np.newaxis, 1:, 1]
+        vm = middle[:, :, np.newaxis]
+        crosses = (np.minimum(v0, v1) <= vm) & (
+            vm <= np.maximum(v0, v1)) & (v0 != v1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = u0 + (vm - v0) * (u1 - u0) / (v1 - v0)
+        # strips outside of the polygon have height 0 and no crossings (ul = inf, ur = -inf)
+        span = np.stack((np.where(crosses, u, -np.inf).max(axis=-1),
+                         np.where(crosses, u, np.inf).min(axis=-1)))
+        covered = self._rowIntegral(span, row[np.newaxis])
+        cells = (height * (covered[0] - covered[1])).sum(axis=-1)
+        h = self._resolution
+        return cells * (h * h / COVERAGE_SCALE)
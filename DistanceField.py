@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+module that looks up the distance to the centre line of a curve and the progress along it
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import math
+import numpy as np
+import shapely
+
+DEFAULT_DISTANCE_RESOLUTION = 5.0  # mm per grid cell
+# cells of the grid (or point-segment pairs of exactTrackPositions) computed at once, bounds the memory used
+CHUNK_CELLS = 1 << 14
+# larger grids (e.g. of the long tracks of TrackCanvas) are not built, the nearest segment
+# of a point is found in a shapely STRtree of the segments instead
+MAX_GRID_CELLS = 1 << 22
+
+
+class DistanceField():
+    """ Nearest segment of the centre line per grid cell.
+
+    A query projects the point onto the nearest segment of its cell and the two segments
+    next to it and keeps the closest projection, so the result is exact whenever the
+    nearest segment of the point is one of them. Otherwise (only possible near the
+    medial axis between two distant parts of the curve, far away from the line) the
+    distance is at most resolution * sqrt(2) too large.
+    A field whose grid would have more than MAX_GRID_CELLS cells looks the nearest
+    segment up in a search tree, its results are exact everywhere.
+
+    crossTrack: signed distance (mm) to the centre line, positive left of the line in
+    driving direction as seen on the image (y pointing down), like a turnLeft of the car
+    progress: distance (mm) along the centre line from its start to the closest point
+    """
+
+    def __init__(self, centerLine, bounds, resolution=DEFAULT_DISTANCE_RESOLUTION) -> None:
+        """
+        centerLine: the points of the centre line, e.g. CanvasModel.getCenterLine()
+        bounds: (xmin, ymin, xmax, ymax) of the area covered by the grid,
+        points outside use the nearest cell at the border of the grid
+        resolution: edge length of a grid cell in mm
+        """
+        points = np.asarray(centerLine, dtype=np.float64)
+        self._resolution = resolution
+        self._origin = np.array(bounds[:2], dtype=np.float64)
+        self._cols = max(int(math.ceil((bounds[2] - bounds[0]) / resolution)), 1)
+        self._rows = max(int(math.ceil((bounds[3] - bounds[1]) / resolution)), 1)
+        self._starts = points[:-1]
+        self._deltas = np.diff(points, axis=0)
+        self._squaredLengths = (self._deltas * self._deltas).sum(axis=1)
+        lengths = np.sqrt(self._squaredLengths)
+        self._progress = np.concatenate(([0.0], np.cumsum(lengths)))
+        # python floats for the scalar lookups of the simulator
+        self._segments = list(zip(self._starts[:, 0].tolist(), self._starts[:, 1].tolist(),
+                                  self._deltas[:, 0].tolist(), self._deltas[:, 1].tolist(),
+                                  self._squaredLengths.tolist(), self._progress[:-1].tolist(), lengths.tolist()))
+        # the grid or the search tree is built by the first lookup that needs it (see _grid and _tree)
+        self._nearest = None
+        self._segmentTree = None
+        return
+
+    def usesGrid(self):
+        """ False if the lookups use a search tree of the segments instead of the grid (see MAX_GRID_CELLS) """
+        return self._cols * self._rows <= MAX_GRID_CELLS
+
+    def _grid(self):
+        if self._nearest is None:
+            self._nearest = self._nearestSegments()
+        return self._nearest
+
+    def _tree(self):
+        if self._segmentTree is None:
+            self._segmentTree = shapely.STRtree(shapely.linestrings(
+                np.stack((self._starts, self._starts + self._deltas), axis=1)))
+        return self._segmentTree
+
+    def _nearestSegments(self):
+        """ index of the segment nearest to the centre of every grid cell """
+        h = self._resolution
+        xs = self._origin[0] + (np.arange(self._cols) + 0.5) * h
+        ys = self._origin[1] + (np.arange(self._rows) + 0.5) * h
+        cx, cy = np.meshgrid(xs, ys)
+        cx = cx.ravel()
+        cy = cy.ravel()
+        nearest = np.empty(len(cx), dtype=np.int32)
+        dtype = np.int16 if len(self._segments) <= np.iinfo(np.int16).max else np.int32
+        for start in range(0, len(cx), CHUNK_CELLS):
+            px = cx[start:start+CHUNK_CELLS, np.newaxis]
+            py = cy[start:start+CHUNK_CELLS, np.newaxis]
+            distances = self._squaredDistances(px, py, np.arange(len(self._segments)))[0]
+            nearest[start:start+CHUNK_CELLS] = distances.argmin(axis=1)
+        return nearest.reshape(self._rows, self._cols).astype(dtype)
+
+    def _squaredDistances(self, px, py, segments):
+        """ squared distances and segment fractions of the projections of the points onto the segments """
+        ax = self._starts[segments, 0]
+        ay = self._starts[segments, 1]
+        dx = self._deltas[segments, 0]
+        dy = self._deltas[segments, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = ((px - ax) * dx + (py - ay) * dy) / self._squaredLengths[segments]
+        t = np.minimum(np.maximum(np.nan_to_num(t), 0.0), 1.0)
+        ex = px - (ax + t * dx)
+        ey = py - (ay + t * dy)
+        return ex * ex + ey * ey, t
+
+    def getResolution(self):
+        return self._resolution
+
+    def getLength(self):
+        """ length of the centre line """
+        return float(self._progress[-1])
+
+    def nbytes(self):
+        """ memory used by the grid, 0 without grid """
+        return self._grid().nbytes if self.usesGrid() else 0
+
+    def trackPosition(self, x, y):
+        """ (crossTrack, progress) of the point (x, y), see the class documentation """
+        if self.usesGrid():
+            h = self._resolution
+            col = min(max(int((x - self._origin[0]) / h), 0), self._cols - 1)
+            row = min(max(int((y - self._origin[1]) / h), 0), self._rows - 1)
+            nearest = int(self._grid()[row, col])
+        else:
+            nearest = int(self._tree().query_nearest(shapely.Point(x, y), all_matches=False)[0])
+        best = None
+        for segment in self._segments[max(nearest - 1, 0):nearest + 2]:
+            ax, ay, dx, dy, squaredLength, progress, length = segment
+            t = ((x - ax) * dx + (y - ay) * dy) / squaredLength if squaredLength > 0.0 else 0.0
+            t = min(max(t, 0.0), 1.0)
+            ex = x - (ax + t * dx)
+            ey = y - (ay + t * dy)
+            distance = ex * ex + ey * ey
+            if best is None or distance < best[0]:
+                best = (distance, (x - ax) * dy - (y - ay) * dx, progress + t * length)
+        distance, side, progress = best
+        distance = math.sqrt(distance)
+        return (distance if side >= 0.0 else -distance, progress)
+
+    def trackPositions(self, x, y):
+        """ arrays crossTrack and progress of the points given by the arrays x and y """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if self.usesGrid():
+            h = self._resolution
+            col = np.clip(((x - self._origin[0]) / h).astype(np.intp), 0, self._cols - 1)
+            row = np.clip(((y - self._origin[1]) / h).astype(np.intp), 0, self._rows - 1)
+            nearest = self._grid()[row, col].astype(np.intp)
+        else:
+            points, segments = self._tree().query_nearest(shapely.points(x.ravel(), y.ravel()), all_matches=False)
+            nearest = np.empty(x.size, dtype=np.intp)
+            nearest[points] = segments
+            nearest = nearest.reshape(x.shape)
+        candidates = np.clip(nearest[..., np.newaxis] + np.arange(-1, 2), 0, len(self._segments) - 1)
+        distances, t = self._squaredDistances(x[..., np.newaxis], y[..., np.newaxis], candidates)
+        best = distances.argmin(axis=-1)[..., np.newaxis]
+        segment = np.take_along_axis(candidates, best, axis=-1)[..., 0]
+        t = np.take_along_axis(t, best, axis=-1)[..., 0]
+        distances = np.take_along_axis(distances, best, axis=-1)[..., 0]
+        return self._signedPositions(x, y, segment, t, distances)
+
+    def exactTrackPositions(self, x, y):
+        """ same as trackPositions for 1-D arrays, but every point is projected onto all segments,
+        so the result is exact everywhere. It does not need the grid and is the faster choice
+        for a centre line of few segments like the one of CanvasModel.
+        Without grid trackPositions is exact and is used instead.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if not self.usesGrid():
+            return self.trackPositions(x, y)
+        crossTrack = np.empty(len(x))
+        progress = np.empty(len(x))
+        segments = np.arange(len(self._segments))
+        chunk = max(CHUNK_CELLS // len(segments), 1)
+        for start in range(0, len(x), chunk):
+            px = x[start:start+chunk]
+            py = y[start:start+chunk]
+            distances, t = self._squaredDistances(px[:, np.newaxis], py[:, np.newaxis], segments)
+            best = distances.argmin(axis=1)
+            points = np.arange(len(best))
+            crossTrack[start:start+chunk], progress[start:start+chunk] = self._signedPositions(
+                px, py, best, t[points, best], distances[points, best])
+        return crossTrack, progress
+
+    def _signedPositions(self, x, y, segment, t, squaredDistances):
+        """ crossTrack and progress of the points projected at the fractions t of their nearest segments """
+        distance = np.sqrt(squaredDistances)
+        side = (x - self._starts[segment, 0]) * self._deltas[segment, 1] - \
+            (y - self._starts[segment, 1]) * self._deltas[segment, 0]
+        progress = self._progress[segment] + t * np.sqrt(self._squaredLengths[segment])
+        return np.where(side >= 0.0, distance, -distance), progress
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+module that provides a reusable gym-style environment for training on many curves
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import functools
+import logging
+import Car
+import Canvas
+import RobotCarSimulator
+from BatchSimulator import DRIVE_FORWARD, TURN_LEFT, TURN_RIGHT, ACTION_DURATIONS
+from rewardFunctions import simpleReward
+from CoverageMap import SENSOR_MODE_EXACT, DEFAULT_RESOLUTION
+
+ACTIONS = (DRIVE_FORWARD, TURN_LEFT, TURN_RIGHT)
+
+
+class CarEnvironment():
+
+    def __init__(self, library=None, rewardFunction=simpleReward, stephistory=2, sensorMode=SENSOR_MODE_EXACT,
+                 rasterResolution=DEFAULT_RESOLUTION, createGif=False, logLevel=logging.INFO) -> None:
+        """ Environment that keeps one car and one simulator for all episodes.
+
+        library: optional TrackLibrary.TrackLibrary the canvases are taken from,
+        otherwise every seed's canvas is generated once and kept
+        rewardFunction, stephistory, sensorMode, rasterResolution, createGif:
+        see RobotCarSimulator.SimulatorControl
+
+        usage:
+            env = CarEnvironment()
+            state = env.reset(seed)
+            while not done:
+                state, reward, done, duration = env.step(action)
+        """
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logLevel)
+        self._library = library
+        self._canvases = {}
+        self._logLevel = logLevel
+        self._car = Car.CarModel(logLevel=logLevel)
+        self._sim = None
+        self._actions = None
+        self._simParameters = {'createGif': createGif, 'rewardFunction': rewardFunction, 'logLevel': logLevel,
+                               'stephistory': stephistory, 'sensorMode': sensorMode,
+                               'rasterResolution': rasterResolution}
+        self._stateSize = 3*(stephistory+1)
+        self._seed = None
+        return
+
+    def getStateSize(self):
+        """ length of the observation, 3 sensors for stephistory+1 steps """
+        return self._stateSize
+
+    def getActionCount(self):
+        return len(ACTIONS)
+
+    def getSimulator(self):
+        """ the RobotCarSimulator.SimulatorControl of the current episode """
+        return self._sim
+
+    def getSeed(self):
+        return self._seed
+
+    def getCanvas(self, seed):
+        if self._library is not None:
+            return self._library.getCanvas(seed)
+        if seed not in self._canvases:
+            self._canvases[seed] = Canvas.CanvasModel(
+                seed=seed, logLevel=self._logLevel)
+        return self._canvases[seed]
+
+    def reset(self, seed):
+        """ start a new episode on the curve of seed and return the initial observation.
+        The observation is a NumPy array of shape (3*(stephistory+1),) that is overwritten
+        in place by the next step or reset, copy it to keep it.
+        """
+        canvas = self.getCanvas(seed)
+        self._seed = seed
+        if self._sim is None:
+            self._sim = RobotCarSimulator.SimulatorControl(
+                canvas, self._car, **self._simParameters)
+            sim = self._sim
+            self._actions = (functools.partial(sim.driveForward, 100, ACTION_DURATIONS[DRIVE_FORWARD]),
+                             functools.partial(
+                                 sim.turnLeft, 100, ACTION_DURATIONS[TURN_LEFT]),
+                             functools.partial(sim.turnRight, 100, ACTION_DURATIONS[TURN_RIGHT]))
+            return sim.getObservation()
+        return self._sim.reset(canvas)
+
+    def step(self, action):
+        """ apply DRIVE_FORWARD, TURN_LEFT or TURN_RIGHT with the durations of LearnModel.ipynb.
+        returns (observation, reward, done, duration), the observation is the array returned by reset
+        """
+        sim = self._sim
+        self._actions[action]()
+        return (sim.getObservation(), sim.getReward(), sim.isTerminated(), sim.getDuration())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+module that records the frames of an animated gif as small patches on a cached background
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+from PIL import ImageDraw
+from GifWriter import GifWriter, unionBox
+
+# palette of the compact frames: canvas border, canvas, curve, sensors
+PALETTE = ((128, 128, 128), (255, 255, 255), (0, 0, 0), (255, 0, 0))
+TEXT_POSITION = (400, 50)
+TEXT_COLOR = (255, 255, 255)
+# pixels added around the car for the outline width
+CAR_MARGIN = 3
+# region written for a frame that does not change anything (a gif frame can not be empty)
+EMPTY_REGION = (0, 0, 1, 1)
+
+
+class FrameRecorder():
+
+    def __init__(self, canvas, palette=False) -> None:
+        """ Record frames of a car driving on the canvas.
+
+        The static canvas image is rendered once. Each frame only redraws the
+        car's bounding box and the text region and stores just these patches,
+        so a frame takes about 100 KB instead of a full 1700x1400 RGB image.
+        palette: store the frames as palette (mode 'P') images with PALETTE colors
+        (1 byte per pixel, text is not antialiased) instead of RGB
+        """
+        self._background = canvas.getBackgroundImage(palette)
+        self._image = self._background.copy()
+        self._draw = ImageDraw.Draw(self._image)
+        self._frames = []
+        self._durations = []
+        self._dirtyBoxes = []
+        return
+
+    def __len__(self):
+        return len(self._frames)
+
+    def addFrame(self, car, text, font, duration):
+        """ draw the car and the status text on the background and record the changed regions
+        duration: how long the frame is shown in milli-seconds
+        """
+        self.drawFrame(car, text, font)
+        self._frames.append([(box, self._image.crop(box))
+                            for box in self._dirtyBoxes])
+        self._durations.append(duration)
+        return
+
+    def drawFrame(self, car, text, font):
+        """ draw the car and the status text on the background without recording the frame,
+        returns the boxes of the regions that differ from the background (see getImage())
+        """
+        # restore the regions changed by the previous frame
+        for box in self._dirtyBoxes:
+            self._image.paste(self._background.crop(box), box)
+        car.draw(self._draw)
+        self._draw.text(TEXT_POSITION, text, font=font, fill=TEXT_COLOR)
+        self._dirtyBoxes = [self._clip(self._carBox(car)),
+                            self._clip(self._draw.textbbox(TEXT_POSITION, text, font=font))]
+        return self._dirtyBoxes
+
+    def getImage(self):
+        """ the image of the last frame drawn, changed by the next drawFrame """
+        return self._image
+
+    def truncate(self, length):
+        """ forget the frames after the first length frames, e.g. when a simulator is restored """
+        del self._frames[length:]
+        del self._durations[length:]
+        return
+
+    def getDurations(self):
+        return self._durations
+
+    def getFrame(self, i):
+        """ the complete image of frame i """
+        image = self._background.copy()
+        for box, patch in self._frames[i]:
+            image.paste(patch, box)
+        return image
+
+    def frames(self):
+        """ generator of the complete frame images, only one is kept in memory at a time """
+        for i in range(len(self._frames)):
+            yield self.getFrame(i)
+
+    def nbytes(self):
+        """ memory used by the recorded patches """
+        return sum(len(patch.getbands()) * patch.width * patch.height
+                   for frame in self._frames for box, patch in frame)
+
+    def save(self, file):
+        """ save all frames as animated gif, every frame after the first only stores
+        the regions changed since the previous frame (see GifWriter)
+        """
+        if not self._frames:
+            return
+        with GifWriter(file, self._background.size) as writer:
+            writer.addFrame(self.getFrame(0), self._durations[0])
+            for i in range(1, len(self._frames)):
+                region = unionBox([box for box, patch in self._frames[i-1] + self._frames[i]]) or EMPTY_REGION
+                image = self._background.crop(region)
+                for box, patch in self._frames[i]:
+                    image.paste(patch, (box[0] - region[0], box[1] - region[1]))
+                writer.addFrame(image, self._durations[i], region[:2])
+        return
+
+    def _carBox(self, car):
+        points = [point for shape in (car.bodybox,) + car.wheels
+                  for point in car.rotateAndTranslateAndScalePoints(shape)]
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        return (int(min(xs)) - CAR_MARGIN, int(min(ys)) - CAR_MARGIN,
+                int(max(xs)) + CAR_MARGIN + 1, int(max(ys)) + CAR_MARGIN + 1)
+
+    def _clip(self, box):
+        width, height = self._image.size
+        left, top, right, bottom = box
+        left = min(max(left, 0), width)
+        top = min(max(top, 0), height)
+        return (left, top, max(min(right, width), left), max(min(bottom, height), top))
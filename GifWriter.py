@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+module that writes animated gifs frame by frame with bounded memory
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+PIL encodes every frame (usually only the region that changed) as a single gif.
+Its image data and color table are copied into the animation as one frame
+with its own color table and position. Only the current frame is kept in memory.
+"""
+
+import io
+import struct
+
+# a frame is drawn over the previous frame (disposal method 1: do not dispose)
+DISPOSAL_KEEP = 1
+TRAILER = b'\x3b'
+
+
+def encodeFrame(image, duration, position=(0, 0)):
+    """ the gif blocks of one frame as bytes: graphic control extension, image descriptor,
+    local color table and the LZW compressed image data.
+    image: PIL image of the frame or of the region that changed, position: its top left corner
+    duration: how long the frame is shown in milli-seconds (stored in 1/100 s like PIL does)
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format='GIF')
+    data = buffer.getvalue()
+    offset = 13
+    colorTable = b''
+    packed = data[10]
+    if packed & 0x80:
+        end = offset + 3 * (2 << (packed & 0x07))
+        colorTable = data[offset:end]
+        offset = end
+    # skip the extensions in front of the image descriptor
+    while data[offset] == 0x21:
+        offset += 2
+        while data[offset]:
+            offset += data[offset] + 1
+        offset += 1
+    if data[offset] != 0x2c:
+        raise ValueError('PIL did not write an image descriptor')
+    descriptorPacked = data[offset + 9]
+    if not descriptorPacked & 0x80:
+        # the global color table of the single gif becomes the local color table of the frame
+        descriptorPacked |= 0x80 | (packed & 0x07)
+    else:
+        colorTable = b''
+    width, height = image.size
+    return (struct.pack('<BBBBHBB', 0x21, 0xf9, 4, DISPOSAL_KEEP << 2, int(duration / 10), 0, 0) +
+            struct.pack('<BHHHHB', 0x2c, position[0], position[1], width, height, descriptorPacked) +
+            colorTable + data[offset + 10:-1])
+
+
+class GifWriter():
+
+    def __init__(self, file, size, loop=0) -> None:
+        """ Animated gif of size (width, height) written to file (path or binary file object).
+        loop: number of repetitions, 0 repeats forever
+        Add frames with addFrame() or blocks from encodeFrame() with write(), then close().
+        """
+        self._ownsFile = isinstance(file, str)
+        self._file = open(file, 'wb') if self._ownsFile else file
+        self._frames = 0
+        width, height = size
+        # header, logical screen without global color table and the NETSCAPE2.0 loop extension
+        self._file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0) +
+                         b'\x21\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+        return
+
+    def __len__(self):
+        return self._frames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+    def addFrame(self, image, duration, position=(0, 0)):
+        """ image: PIL image drawn at position over the previous frame, duration in milli-seconds """
+        self.write(encodeFrame(image, duration, position))
+        return
+
+    def write(self, blocks, frames=1):
+        """ write the bytes of frames frames returned by encodeFrame, e.g. encoded by another process """
+        self._file.write(blocks)
+        self._frames += frames
+        return
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.write(TRAILER)
+        if self._ownsFile:
+            self._file.close()
+        self._file = None
+        return
+
+
+def unionBox(boxes):
+    """ the smallest box (left, top, right, bottom) containing all non empty boxes, None if there are none """
+    boxes = [box for box in boxes if box[2] > box[0] and box[3] > box[1]]
+    if not boxes:
+        return None
+    return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes))
@@ -1,89 +1,134 @@
-import RobotCarSimulator
 import statistics
 import logging
-import sys
+
+# the tuning of HeuristicLineTracker, see HeuristicSweep.py to search for better values
+PARAMETERS = {
+    'thresholdFactor': 0.75,  # line threshold = max calibration value - thresholdFactor * stdev
+    'turnDuration': 50,  # ms of a turn while following and searching the line
+    'forwardDuration': 150,  # ms of a step forward
+    'calibrationLeftTurns': 5,
+    'calibrationRightTurns': 10,
+    'calibrationReturnDuration': 200,  # ms of the left turn back after calibration
+    'searchLeftLimit': 5,  # findLine gives up turning left after searchLeftLimit+1 turns
+    'searchRightLimit': 10,
+}
 
 
 class HeuristicLineTracker():
-    def __init__(self, robot) -> None:
+    def __init__(self, robot, maxDuration=None, logLevel=logging.INFO, **parameters) -> None:
+        """ maxDuration: stop after this many seconds of simulated time (default: run until terminated)
+        parameters: values for the keys of PARAMETERS, the others keep their default
+        Every decision is logged with level DEBUG.
+        """
+        unknown = set(parameters) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(f'unknown parameters {sorted(unknown)}, expected some of {sorted(PARAMETERS)}')
+        self.__configLogger(logLevel)
         self._rc = robot
+        self._maxDuration = maxDuration
+        self._parameters = dict(PARAMETERS, **parameters)
         self._currentSensorValues = []
         self._lineThreshold = 1000
         self._collectedSensorValues = []
         return
 
+    def getParameters(self):
+        return self._parameters
+
     def calibrateAndFindLine(self):
+        parameters = self._parameters
         self._collectedSensorValues = []
-        for i in range(5):
+        for i in range(parameters['calibrationLeftTurns']):
             self._currentSensorValues = self._rc.getLineTrackingSensorValues()
             self._collectedSensorValues.extend(self._currentSensorValues)
-            self._rc.turnLeft(100, 50)
-        for i in range(10):
+            self._rc.turnLeft(100, parameters['turnDuration'])
+        for i in range(parameters['calibrationRightTurns']):
             self._currentSensorValues = self._rc.getLineTrackingSensorValues()
             self._collectedSensorValues.extend(self._currentSensorValues)
-            self._rc.turnRight(100, 50)
-        self._rc.turnLeft(100, 200)
+            self._rc.turnRight(100, parameters['turnDuration'])
+        self._rc.turnLeft(100, parameters['calibrationReturnDuration'])
         maxValue = max(self._collectedSensorValues)
         standardDeviation = statistics.stdev(self._collectedSensorValues)
-        self._lineThreshold = maxValue - (0.75 * standardDeviation)
+        self._lineThreshold = maxValue - (parameters['thresholdFactor'] * standardDeviation)
+        self._logger.debug('Heuristic: line threshold %s', self._lineThreshold)
         self.findLine()
 
     def findLine(self):
+        turnDuration = self._parameters['turnDuration']
         i = 0
-        while (self._currentSensorValues[0] < self._lineThreshold and self._currentSensorValues[1] < self._lineThreshold and self._currentSensorValues[2] < self._lineThreshold):
-            self._rc.turnLeft(100, 50)
+        while (self._currentSensorValues[0] <= self._lineThreshold and self._currentSensorValues[1] <= self._lineThreshold and self._currentSensorValues[2] <= self._lineThreshold):
+            self._rc.turnLeft(100, turnDuration)
             self._currentSensorValues = self._rc.getLineTrackingSensorValues()
             i += 1
-            if i > 5:
+            if i > self._parameters['searchLeftLimit']:
                 break
-            if (self._rc.isTerminated()):
+            if (self.isFinished()):
                 return
         i = 0
-        while (self._currentSensorValues[0] < self._lineThreshold and self._currentSensorValues[1] < self._lineThreshold and self._currentSensorValues[2] < self._lineThreshold):
-            self._rc.turnRight(100, 50)
+        while (self._currentSensorValues[0] <= self._lineThreshold and self._currentSensorValues[1] <= self._lineThreshold and self._currentSensorValues[2] <= self._lineThreshold):
+            self._rc.turnRight(100, turnDuration)
             self._currentSensorValues = self._rc.getLineTrackingSensorValues()
             i += 1
-            if i > 10:
+            if i > self._parameters['searchRightLimit']:
                 break
-            if (self._rc.isTerminated()):
+            if (self.isFinished()):
                 return
-        if self._currentSensorValues[0] < self._lineThreshold and self._currentSensorValues[1] < self._lineThreshold and self._currentSensorValues[2] < self._lineThreshold:
+        if self._currentSensorValues[0] <= self._lineThreshold and self._currentSensorValues[1] <= self._lineThreshold and self._currentSensorValues[2] <= self._lineThreshold:
             raise RuntimeError("Can not find the line")
 
     def followLine(self):
+        turnDuration = self._parameters['turnDuration']
+        forwardDuration = self._parameters['forwardDuration']
         while ((self._currentSensorValues[0] > self._lineThreshold) or (self._currentSensorValues[1] > self._lineThreshold) or (self._currentSensorValues[2] > self._lineThreshold)):
-            if (self._rc.isTerminated()):
+            if (self.isFinished()):
                 break
             # line is on the left - turn left
             if self._currentSensorValues[0] > self._lineThreshold:
-                print('Turning left with sensor values (L/M/R):' +
-                      str(self._currentSensorValues))
-                self._rc.turnLeft(100, 50)
+                self._logger.debug('Heuristic: turning left with sensor values (L/M/R): %s', self._currentSensorValues)
+                self._rc.turnLeft(100, turnDuration)
                 self._currentSensorValues = self._rc.getLineTrackingSensorValues()
                 continue
             # line is on the right - turn right
             if self._currentSensorValues[2] > self._lineThreshold:
-                print('Turning right with sensor values (L/M/R):' +
-                      str(self._currentSensorValues))
-                self._rc.turnRight(100, 50)
+                self._logger.debug('Heuristic: turning right with sensor values (L/M/R): %s', self._currentSensorValues)
+                self._rc.turnRight(100, turnDuration)
                 self._currentSensorValues = self._rc.getLineTrackingSensorValues()
                 continue
             #  straight ahead - line is in middle
-            print('Straight ahead with sensor values (L/M/R):' +
-                  str(self._currentSensorValues))
-            self._rc.driveForward(100, 150)
+            self._logger.debug('Heuristic: straight ahead with sensor values (L/M/R): %s', self._currentSensorValues)
+            self._rc.driveForward(100, forwardDuration)
             self._currentSensorValues = self._rc.getLineTrackingSensorValues()
-        print('Leaving follow mode with sensor values:' +
-              str(self._currentSensorValues))
+        self._logger.debug('Heuristic: leaving follow mode with sensor values: %s', self._currentSensorValues)
+
+    def isFinished(self):
+        return self._rc.isTerminated() or (self._maxDuration is not None and self._rc.getDuration() >= self._maxDuration)
 
     def run(self):
         try:
             self.calibrateAndFindLine()
-            while not self._rc.isTerminated():
+            while not self.isFinished():
                 self.followLine()
-                if (self._rc.isTerminated()):
+                if (self.isFinished()):
                     break
                 self.findLine()
         except Exception as e:
-            print(e, file=sys.stderr)
+            self._logger.info('Heuristic: %s', e)
+        return
+
+    def __configLogger(self, logLevel):
+        """ by default log all INFO level and above messages to stderr with timestamp, module and threadname, level and message
+        """
+        self._logger = logging.getLogger(__name__)
+        handlers = self._logger.handlers
+        if self._logger.level == logLevel and len(handlers) == 1 and handlers[0].level == logLevel:
+            # already configured by a previous instance
+            return
+        self._logger.setLevel(logLevel)
+        self._logger.handlers.clear()
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logLevel)
+        console_formatter = logging.Formatter(
+            '%(asctime)s - (%(name)s %(threadName)-9s) - %(levelname)s: %(message)s')
+        console_handler.setFormatter(console_formatter)
+        self._logger.addHandler(console_handler)
         return
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""
+module that searches the tuning parameters of the heuristic line tracker with successive halving
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python HeuristicSweep.py --grid thresholdFactor=0.5,0.75,1.0 turnDuration=30,50,70 --seeds 0-80
+       python HeuristicSweep.py --random 60 --seeds 0-242 --eta 3 --cache data/sweep.jsonl
+
+All configurations are run on the first minSeeds seeds, the best 1/eta of them on eta times
+as many seeds and so on until one configuration is left or all seeds are used.
+Every episode result is appended to the cache file (one JSON object per line) and
+never simulated again, delete the file after changing the simulator.
+"""
+
+import argparse
+import functools
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import time
+import Canvas
+import Heuristic
+import Runner
+from TrackLibrary import TrackLibrary, parseSeeds
+
+DEFAULT_ETA = 3
+DEFAULT_MIN_SEEDS = 9
+# columns of the Runner summary to maximize
+METRICS = ('totalReward', 'maxX', 'followsLine')
+DEFAULT_METRIC = 'totalReward'
+# ranges of the random search: (low, high) of ints or floats or a list of choices
+SPACE = {
+    'thresholdFactor': (0.25, 1.5),
+    'turnDuration': (30, 100),
+    'forwardDuration': (80, 250),
+    'calibrationLeftTurns': (2, 8),
+    'calibrationRightTurns': (4, 16),
+    'calibrationReturnDuration': (100, 300),
+    'searchLeftLimit': (2, 10),
+    'searchRightLimit': (4, 20),
+}
+CANVAS_CACHE_SIZE = 16
+
+# state of a worker process, set by _initWorker
+_library = None
+
+
+def gridConfigurations(grid):
+    """ all combinations of the values of grid (dict parameter -> list of values) as list of dicts """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def randomConfigurations(count, space=SPACE, seed=None):
+    """ count configurations drawn uniformly from space (see SPACE), floats are rounded to 3 decimals """
+    rng = random.Random(seed)
+    configurations = []
+    for i in range(count):
+        configuration = {}
+        for name, values in space.items():
+            if isinstance(values, list):
+                configuration[name] = rng.choice(values)
+            elif all(isinstance(value, int) for value in values):
+                configuration[name] = rng.randint(*values)
+            else:
+                configuration[name] = round(rng.uniform(*values), 3)
+        configurations.append(configuration)
+    return configurations
+
+
+class ResultCache():
+
+    def __init__(self, path=None) -> None:
+        """ Episode results by (parameters, seed, maxDuration), loaded from and appended to
+        the JSON lines file path (in memory only if path is None).
+        Missing parameters are completed with the defaults of Heuristic.PARAMETERS.
+        """
+        self._path = path
+        self._results = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._results[self.key(entry['parameters'], entry['seed'], entry['maxDuration'])] = entry['result']
+        return
+
+    def __len__(self):
+        return len(self._results)
+
+    @staticmethod
+    def key(parameters, seed, maxDuration):
+        return json.dumps([dict(Heuristic.PARAMETERS, **parameters), seed, maxDuration], sort_keys=True)
+
+    def get(self, parameters, seed, maxDuration):
+        """ the result dict of Runner.runEpisode or None """
+        return self._results.get(self.key(parameters, seed, maxDuration))
+
+    def add(self, parameters, seed, maxDuration, result):
+        self._results[self.key(parameters, seed, maxDuration)] = result
+        if self._path is not None:
+            with open(self._path, 'a') as f:
+                f.write(json.dumps({'parameters': dict(Heuristic.PARAMETERS, **parameters), 'seed': seed,
+                                    'maxDuration': maxDuration, 'result': result}, sort_keys=True) + '\n')
+        return
+
+
+def _initWorker(libraryPath):
+    global _library
+    if libraryPath is not None:
+        _library = TrackLibrary(libraryPath, logLevel=logging.WARNING)
+    return
+
+
+@functools.lru_cache(maxsize=CANVAS_CACHE_SIZE)
+def _canvas(seed):
+    """ the canvas of seed, reused by the configurations run on it in this process """
+    if _library is not None:
+        return _library.getCanvas(seed)
+    return Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING)
+
+
+def _runWorkerEpisode(task):
+    index, parameters, seed, maxDuration = task
+    return index, seed, Runner.runEpisode(seed, maxDuration=maxDuration, canvas=_canvas(seed),
+                                          heuristicParameters=parameters)
+
+
+def sweep(configurations, seeds, cachePath=None, workers=None, eta=DEFAULT_ETA, minSeeds=DEFAULT_MIN_SEEDS,
+          metric=DEFAULT_METRIC, maxDuration=Runner.DEFAULT_MAX_DURATION, libraryPath=None,
+          logLevel=logging.INFO):
+    """ successive halving over configurations (list of parameter dicts, see Heuristic.PARAMETERS).
+    Rung r runs the remaining configurations on seeds[:minSeeds * eta**r] in a pool of worker
+    processes (default: one per cpu), the best len/eta (at least one) by the mean metric go on.
+    Results found in the cache file cachePath are not simulated again.
+    libraryPath: optional TrackLibrary file with pre-generated curves
+    returns a list of dicts with parameters, score (mean metric), seeds (number of seeds evaluated)
+    and rung for every distinct configuration, the best first
+    """
+    if metric not in METRICS:
+        raise ValueError(f'metric must be one of {METRICS}, not {metric!r}')
+    seeds = list(seeds)
+    if not seeds:
+        raise ValueError('sweep needs at least one seed')
+    if minSeeds < 1:
+        raise ValueError(f'minSeeds must be at least 1, not {minSeeds}')
+    if eta < 2:
+        raise ValueError(f'eta must be at least 2 to prune configurations, not {eta}')
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logLevel)
+    # configurations with the same parameters (e.g. drawn twice by randomConfigurations) are evaluated once
+    distinct = {}
+    for configuration in configurations:
+        distinct.setdefault(json.dumps(dict(Heuristic.PARAMETERS, **configuration), sort_keys=True), configuration)
+    configurations = list(distinct.values())
+    cache = ResultCache(cachePath)
+    survivors = list(range(len(configurations)))
+    ranking = {}
+    budget = min(minSeeds, len(seeds))
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, _initWorker, (libraryPath,)) as pool:
+        for rung in itertools.count():
+            rungSeeds = seeds[:budget]
+            # seed major order: a worker runs the configurations of a seed on the same canvas
+            tasks = [(i, configurations[i], seed, maxDuration) for seed in rungSeeds for i in survivors
+                     if cache.get(configurations[i], seed, maxDuration) is None]
+            for i, seed, result in pool.imap_unordered(_runWorkerEpisode, tasks,
+                                                       max(1, len(tasks) // (workers * 8))):
+                cache.add(configurations[i], seed, maxDuration, result)
+            for i in survivors:
+                score = statistics.mean(cache.get(configurations[i], seed, maxDuration)[metric]
+                                        for seed in rungSeeds)
+                ranking[i] = {'parameters': configurations[i], 'score': score, 'seeds': budget, 'rung': rung}
+            logger.info('HeuristicSweep: rung %d, %d configurations on %d seeds, %d episodes simulated, %.1f s',
+                        rung, len(survivors), budget, len(tasks), time.perf_counter() - start)
+            if len(survivors) <= 1 or budget == len(seeds):
+                break
+            survivors = sorted(survivors, key=lambda i: ranking[i]['score'], reverse=True)[
+                :max(1, len(survivors) // eta)]
+            budget = min(budget * eta, len(seeds))
+    return sorted(ranking.values(), key=lambda entry: (entry['rung'], entry['score']), reverse=True)
+
+
+def _parseGrid(values):
+    """ ['thresholdFactor=0.5,0.75', 'turnDuration=30,50'] -> {'thresholdFactor': [0.5, 0.75], 'turnDuration': [30, 50]} """
+    grid = {}
+    for value in values:
+        name, choices = value.split('=')
+        if name not in Heuristic.PARAMETERS:
+            raise argparse.ArgumentTypeError(f'unknown parameter {name}, expected one of {sorted(Heuristic.PARAMETERS)}')
+        grid[name] = [json.loads(choice) for choice in choices.split(',')]
+    return grid
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='search the parameters of the heuristic line tracker with successive halving')
+    space = parser.add_mutually_exclusive_group(required=True)
+    space.add_argument('--grid', nargs='+', metavar='NAME=V1,V2', default=None,
+                       help='grid of parameter values, e.g. thresholdFactor=0.5,0.75 turnDuration=30,50')
+    space.add_argument('--random', type=int, default=None, metavar='COUNT',
+                       help='number of configurations drawn from SPACE')
+    parser.add_argument('--random-seed', type=int, default=None,
+                        help='seed of the random configurations')
+    parser.add_argument('--seeds', type=parseSeeds, default=parseSeeds('0-80'),
+                        help="curves to evaluate on, e.g. '0-242' (default 0-80)")
+    parser.add_argument('--eta', type=int, default=DEFAULT_ETA,
+                        help='keep 1/eta of the configurations per rung (default %(default)s)')
+    parser.add_argument('--min-seeds', type=int, default=DEFAULT_MIN_SEEDS,
+                        help='seeds of the first rung (default %(default)s)')
+    parser.add_argument('--metric', choices=METRICS, default=DEFAULT_METRIC,
+                        help='summary column to maximize (default %(default)s)')
+    parser.add_argument('--max-duration', type=float, default=Runner.DEFAULT_MAX_DURATION,
+                        help='stop an episode after this many seconds of simulated time (default 20)')
+    parser.add_argument('--cache', default='data/heuristic_sweep.jsonl',
+                        help='JSON lines file of the episode results (default %(default)s)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: number of cpus)')
+    parser.add_argument('--library', default=None,
+                        help='track library file with pre-generated curves (see TrackLibrary.py)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of configurations printed (default %(default)s)')
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(asctime)s - (%(name)s %(threadName)-9s) - %(levelname)s: %(message)s')
+    if args.grid is not None:
+        configurations = gridConfigurations(_parseGrid(args.grid))
+    else:
+        configurations = randomConfigurations(args.random, seed=args.random_seed)
+    ranking = sweep(configurations, args.seeds, args.cache, args.workers, args.eta, args.min_seeds,
+                    args.metric, args.max_duration, args.library)
+    for entry in ranking[:args.top]:
+        print('{:>12.2f} {:>5} seeds  {}'.format(entry['score'], entry['seeds'], json.dumps(entry['parameters'])))
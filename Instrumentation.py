@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""
+module that counts calls and measures latencies of the phases of a simulator step
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import atexit
+import functools
+import json
+import sys
+import time
+import numpy as np
+
+# number of most recent latencies kept per phase for the percentiles
+DEFAULT_SAMPLES = 10000
+PERCENTILES = (50, 90, 99)
+
+
+class PhaseTimer():
+
+    def __init__(self, samples=DEFAULT_SAMPLES) -> None:
+        """ call count, total and maximum time of all calls and the latencies of the last samples calls
+        of one phase for the percentiles
+        """
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._samples = [0] * samples
+        return
+
+    def add(self, nanoseconds):
+        self._samples[self.count % len(self._samples)] = nanoseconds
+        self.count += 1
+        self.total += nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+        return
+
+    def getStats(self):
+        """ dict with count, total (s), mean and max of all calls and the percentiles
+        of the last samples calls (us)
+        """
+        samples = np.array(
+            self._samples[:min(self.count, len(self._samples))], dtype=np.float64) / 1000
+        stats = {'count': self.count, 'total': self.total / 1e9,
+                 'mean': self.total / 1000 / self.count if self.count else 0.0,
+                 'max': self.max / 1000}
+        for percentile, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES) if len(samples)
+                                     else (0.0,) * len(PERCENTILES)):
+            stats[f'p{percentile}'] = float(value)
+        return stats
+
+
+class Instrumentation():
+
+    def __init__(self, samples=DEFAULT_SAMPLES) -> None:
+        """ Timers for named phases.
+        Only objects created with instrumentation call the wrappers returned by wrap(),
+        without it the hot paths run unchanged.
+        samples: number of latencies kept per phase for the percentiles
+        """
+        self._samples = samples
+        self._timers = {}
+        return
+
+    def timer(self, phase):
+        """ the PhaseTimer of phase, created on first use """
+        if phase not in self._timers:
+            self._timers[phase] = PhaseTimer(self._samples)
+        return self._timers[phase]
+
+    def wrap(self, phase, function):
+        """ returns function wrapped to add the latency of every call to the timer of phase """
+        add = self.timer(phase).add
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(clock() - start)
+        return timed
+
+    def getStats(self):
+        """ dict phase -> dict with count, total (s), mean, max, p50, p90 and p99 (us)
+        of all phases that have been called
+        """
+        return {phase: timer.getStats() for phase, timer in self._timers.items() if timer.count}
+
+    def format(self):
+        """ the statistics as table """
+        lines = ['{:<16} {:>9} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'phase', 'count', 'total s', 'mean us', 'p50 us', 'p99 us', 'max us')]
+        for phase, stats in self.getStats().items():
+            lines.append('{:<16} {:>9} {:>10.3f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                phase, stats['count'], stats['total'], stats['mean'], stats['p50'], stats['p99'], stats['max']))
+        return '\n'.join(lines)
+
+    def dumpAtExit(self, path=None):
+        """ when the interpreter exits write the statistics as JSON to path,
+        without path print them as table to stderr
+        """
+        atexit.register(self._dump, path)
+        return
+
+    def _dump(self, path):
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(self.getStats(), f, indent=2)
+        else:
+            print(self.format(), file=sys.stderr)
+        return
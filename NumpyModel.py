@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+module that runs the dense Q-network of LearnModel.ipynb with NumPy instead of TensorFlow
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import json
+import numpy as np
+
+
+# the activations work in place, they are module level functions so that models can be pickled
+def _linear(x):
+    return x
+
+
+def _relu(x):
+    return np.maximum(x, 0.0, out=x)
+
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+
+def _sigmoid(x):
+    return np.divide(1.0, 1.0 + np.exp(-x), out=x)
+
+
+ACTIVATIONS = {
+    'linear': _linear,
+    'relu': _relu,
+    'tanh': _tanh,
+    'sigmoid': _sigmoid,
+}
+
+
+class NumpyModel():
+
+    def __init__(self, layers) -> None:
+        """ A sequential model of dense layers.
+        layers: list of (kernel, bias, activation) with kernel of shape (inputs, units),
+        bias of shape (units,) and activation one of ACTIVATIONS
+        """
+        self._layers = []
+        self.activations = []
+        for kernel, bias, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(
+                    f'activation {activation!r} is not supported, use one of {tuple(ACTIVATIONS)}')
+            # Keras computes in float32, so do we to get the same actions
+            self._layers.append((np.asarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32),
+                                 ACTIVATIONS[activation]))
+            self.activations.append(activation)
+        self.input_shape = (None, self._layers[0][0].shape[0])
+        self.output_shape = (None, self._layers[-1][0].shape[1])
+        return
+
+    def predict(self, states):
+        """ q values for a state of shape (inputs,) or a batch of states of shape (N, inputs) """
+        x = np.asarray(states, dtype=np.float32)
+        for kernel, bias, activation in self._layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+    def getAction(self, state):
+        """ index of the largest q value of a single state """
+        return int(np.argmax(self.predict(state)))
+
+    def getActions(self, states):
+        """ array with the index of the largest q value of every state in the batch """
+        return np.argmax(self.predict(states), axis=-1)
+
+    def getWeights(self):
+        """ list of (kernel, bias) of every layer, the arrays are used by the model, not copies """
+        return [(kernel, bias) for kernel, bias, activation in self._layers]
+
+    def setWeights(self, weights):
+        """ copy the (kernel, bias) of every layer into the model, the shapes must not change """
+        for (kernel, bias, activation), (newKernel, newBias) in zip(self._layers, weights):
+            kernel[:] = newKernel
+            bias[:] = newBias
+        return
+
+    def save(self, path):
+        """ save kernels, biases and activations as .npz file that loadModel reads """
+        arrays = {}
+        for i, (kernel, bias) in enumerate(self.getWeights()):
+            arrays['kernel_{}'.format(i)] = kernel
+            arrays['bias_{}'.format(i)] = bias
+        np.savez(path, activations=np.array(self.activations), **arrays)
+        return
+
+
+def loadModel(path):
+    """ read the Dense layers of a Keras Sequential model saved as .h5 file (model.save('model.h5'))
+    and return them as NumpyModel. Only Dense layers (and the InputLayer) are supported.
+    A .npz file written by NumpyModel.save is loaded as well.
+    """
+    if str(path).endswith('.npz'):
+        with np.load(path) as arrays:
+            return NumpyModel([(arrays['kernel_{}'.format(i)], arrays['bias_{}'.format(i)], str(activation))
+                               for i, activation in enumerate(arrays['activations'])])
+    # h5py is only needed to load a model
+    import h5py
+    with h5py.File(path, 'r') as f:
+        config = json.loads(_text(f.attrs['model_config']))
+        weights = f['model_weights'] if 'model_weights' in f else f
+        layers = []
+        for layer in config['config']['layers']:
+            className = layer['class_name']
+            if className == 'InputLayer':
+                continue
+            if className != 'Dense':
+                raise ValueError(
+                    f'{path}: layer {className} is not supported, only Dense layers')
+            group = weights[layer['config']['name']]
+            names = [_text(name) for name in group.attrs['weight_names']]
+            kernel = next(group[name][()]
+                          for name in names if 'kernel' in name.rsplit('/', 1)[-1])
+            if layer['config'].get('use_bias', True):
+                bias = next(group[name][()]
+                            for name in names if 'bias' in name.rsplit('/', 1)[-1])
+            else:
+                bias = np.zeros(kernel.shape[1], dtype=np.float32)
+            layers.append(
+                (kernel, bias, layer['config'].get('activation', 'linear')))
+    return NumpyModel(layers)
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
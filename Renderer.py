@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+module that renders the animated gif of a recorded trajectory after the simulation
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python Renderer.py data/heuristic_seed_5.traj images/heuristic_seed_5.gif --workers 4
+
+A simulator created with createGif=False only records the trajectory (poses, sensor values,
+rewards). renderTrajectory draws the same frames as SimulatorControl.saveImage from it.
+The frame ranges are drawn and encoded by a pool of worker processes, and the main process
+streams the encoded frames in order into the gif file (see GifWriter), so the memory does
+not grow with the number of frames.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import Canvas
+import Car
+from FrameRecorder import FrameRecorder, EMPTY_REGION
+from GifWriter import GifWriter, encodeFrame, unionBox
+from RobotCarSimulator import frameText, genevaFont
+from Trajectory import loadTrajectory
+
+FRAMES_PER_TASK = 50
+
+# state of a worker process, set by _initWorker
+_arrays = None
+_canvas = None
+_palette = True
+_times = None
+
+
+def frameTimes(durations):
+    """ the simulated time (s) after every step with durations (ms), accumulated like SimulatorControl does """
+    times = []
+    time = 0.0
+    for duration in durations:
+        time += duration/1000
+        times.append(time)
+    return times
+
+
+def renderFrames(arrays, canvas, start, end, palette=True, times=None):
+    """ the gif blocks (see GifWriter.encodeFrame) of the frames start to end-1 of the trajectory arrays.
+    Frame 0 is complete, every other frame contains the region changed since the previous frame.
+    times: frameTimes of the durations (at least up to end), computed if None
+    """
+    if times is None:
+        times = frameTimes(arrays['durations'][:end].tolist())
+    first = max(start - 1, 0)
+    xs = arrays['x'][first:end].tolist()
+    ys = arrays['y'][first:end].tolist()
+    angles = arrays['angles'][first:end].tolist()
+    sensors = arrays['sensors'][first:end].tolist()
+    rewards = arrays['rewards'][first:end].tolist()
+    durations = arrays['durations'][first:end].tolist()
+    recorder = FrameRecorder(canvas, palette)
+    car = Car.CarModel(logLevel=logging.WARNING)
+    font = genevaFont()
+    blocks = []
+    previous = []
+    for i in range(first, end):
+        j = i - first
+        car.setPosition((xs[j], ys[j]))
+        car.setOrientation(angles[j])
+        boxes = recorder.drawFrame(car, frameText(i, times[i], sensors[j], rewards[j]), font)
+        if i == 0:
+            blocks.append(encodeFrame(recorder.getImage(), durations[j]))
+        elif i >= start:
+            # the frame before start is only drawn for the regions it changed
+            region = unionBox(previous + boxes) or EMPTY_REGION
+            blocks.append(encodeFrame(recorder.getImage().crop(region), durations[j], region[:2]))
+        previous = boxes
+    return b''.join(blocks)
+
+
+def _initWorker(arrays, canvas, palette, times):
+    global _arrays, _canvas, _palette, _times
+    _arrays = arrays
+    _canvas = canvas
+    _palette = palette
+    _times = times
+    return
+
+
+def _renderWorkerFrames(frames):
+    start, end = frames
+    return renderFrames(_arrays, _canvas, start, end, _palette, _times)
+
+
+def renderTrajectory(arrays, canvas, file, workers=1, framesPerTask=FRAMES_PER_TASK, palette=True):
+    """ write the animated gif of the trajectory arrays (see Trajectory) on canvas to file (path or binary file).
+    workers: number of processes rendering ranges of framesPerTask frames (1: render in this process)
+    palette: draw the frames as palette images (see FrameRecorder), False for RGB frames
+    returns the number of frames
+    """
+    count = len(arrays['actions'])
+    times = frameTimes(arrays['durations'].tolist())
+    ranges = [(start, min(start + framesPerTask, count)) for start in range(0, count, framesPerTask)]
+    # the background is rendered once before the workers are started
+    size = canvas.getBackgroundImage(palette).size
+    with GifWriter(file, size) as writer:
+        if workers == 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                writer.write(renderFrames(arrays, canvas, start, end, palette, times), end - start)
+        else:
+            with multiprocessing.Pool(workers, _initWorker, (arrays, canvas, palette, times)) as pool:
+                for (start, end), blocks in zip(ranges, pool.imap(_renderWorkerFrames, ranges)):
+                    writer.write(blocks, end - start)
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='render the animated gif of a trajectory file')
+    parser.add_argument('trajectory',
+                        help="trajectory file written by SimulatorControl.saveTrajectory or Runner.py --artifacts")
+    parser.add_argument('gif', help='file name of the animated gif')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='curve of the trajectory (default: the seed in the trajectory file)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: number of cpus)')
+    parser.add_argument('--frames-per-task', type=int, default=FRAMES_PER_TASK,
+                        help='frames rendered by a worker at once (default %(default)s)')
+    parser.add_argument('--rgb', action='store_true',
+                        help='draw RGB frames instead of palette frames')
+    args = parser.parse_args()
+    arrays, metadata = loadTrajectory(args.trajectory)
+    seed = args.seed if args.seed is not None else metadata['seed']
+    canvas = Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING)
+    frames = renderTrajectory(arrays, canvas, args.gif, args.workers or multiprocessing.cpu_count(),
+                              args.frames_per_task, not args.rgb)
+    print('{} frames written to {}'.format(frames, args.gif))
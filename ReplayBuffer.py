@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+module that provides the experience replay memory for DQN training in preallocated arrays
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage in the training loop of LearnModel.ipynb:
+    memory = ReplayBuffer(MEMORY_SIZE, state_size)
+    memory.add(state, action, reward, next_state, done)
+    if len(memory) > MINIBATCH_SIZE:
+        states, actions, rewards, next_states, done_vals = memory.sample(MINIBATCH_SIZE)
+        agent_learn((states, actions, rewards, next_states, done_vals), GAMMA)
+"""
+
+import numpy as np
+
+# prioritized replay (Schaul et al. 2016): priority = (|td error| + PRIORITY_EPSILON) ** alpha
+DEFAULT_ALPHA = 0.6
+DEFAULT_BETA = 0.4
+PRIORITY_EPSILON = 1e-6
+
+
+class SumTree():
+
+    def __init__(self, capacity) -> None:
+        """ Binary tree over capacity leaves in one array, every node holds the sum of its children.
+        The root is node 1, the children of node i are 2i and 2i+1, the leaves start at self._leaves.
+        """
+        self._leaves = 1 << max(int(capacity - 1).bit_length(), 0)
+        self._tree = np.zeros(2 * self._leaves)
+        return
+
+    def total(self):
+        return self._tree[1]
+
+    def get(self, indices):
+        return self._tree[self._leaves + np.asarray(indices)]
+
+    def update(self, indices, values):
+        """ set the leaves at indices to values and recompute the sums above them """
+        nodes = self._leaves + np.asarray(indices, dtype=np.int64)
+        tree = self._tree
+        tree[nodes] = values
+        while nodes[0] > 1:
+            nodes = np.unique(nodes // 2)
+            tree[nodes] = tree[2 * nodes] + tree[2 * nodes + 1]
+        return
+
+    def set(self, index, value):
+        """ update() for a single leaf, without the overhead of the vectorized version """
+        tree = self._tree
+        node = self._leaves + index
+        tree[node] = value
+        while node > 1:
+            node //= 2
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+        return
+
+    def find(self, values):
+        """ for every value in [0, total) the index of the leaf where the running sum of the leaves exceeds it """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self._leaves:
+            left = self._tree[2 * nodes]
+            right = values >= left
+            values -= left * right
+            nodes = 2 * nodes + right
+        return nodes - self._leaves
+
+
+class ReplayBuffer():
+
+    def __init__(self, capacity, stateSize, prioritized=False, alpha=DEFAULT_ALPHA, seed=None) -> None:
+        """ Ring buffer of (state, action, reward, next_state, done) experiences.
+
+        capacity: number of experiences kept, the oldest are overwritten
+        stateSize: length of a state, e.g. 3*(stephistory+1)
+        prioritized: sample proportional to the priorities set with updatePriorities
+        (new experiences get the largest priority so far) instead of uniformly
+        alpha: exponent of the priorities, 0 is uniform
+        seed: seed of the random generator used for sampling
+        """
+        self._capacity = capacity
+        self._states = np.zeros((capacity, stateSize), dtype=np.float32)
+        self._actions = np.zeros(capacity, dtype=np.int32)
+        self._rewards = np.zeros(capacity, dtype=np.float32)
+        self._nextStates = np.zeros((capacity, stateSize), dtype=np.float32)
+        self._dones = np.zeros(capacity, dtype=np.float32)
+        self._next = 0
+        self._size = 0
+        self._rng = np.random.default_rng(seed)
+        self._alpha = alpha
+        self._tree = SumTree(capacity) if prioritized else None
+        self._maxPriority = 1.0
+        self._batchSize = 0
+        return
+
+    def __len__(self):
+        return self._size
+
+    def add(self, state, action, reward, nextState, done):
+        """ store one experience, overwrites the oldest one when the buffer is full """
+        i = self._next
+        self._states[i] = state
+        self._actions[i] = action
+        self._rewards[i] = reward
+        self._nextStates[i] = nextState
+        self._dones[i] = done
+        if self._tree is not None:
+            self._tree.set(i, self._maxPriority)
+        self._next = (i + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+        return
+
+    def addBatch(self, states, actions, rewards, nextStates, dones):
+        """ store one experience per row, e.g. one step of BatchSimulator.BatchSimulatorControl """
+        count = len(actions)
+        indices = (self._next + np.arange(count)) % self._capacity
+        self._states[indices] = states
+        self._actions[indices] = actions
+        self._rewards[indices] = rewards
+        self._nextStates[indices] = nextStates
+        self._dones[indices] = dones
+        if self._tree is not None:
+            self._tree.update(indices, self._maxPriority)
+        self._next = int(indices[-1] + 1) % self._capacity
+        self._size = min(self._size + count, self._capacity)
+        return
+
+    def sample(self, batchSize, beta=DEFAULT_BETA):
+        """ returns (states, actions, rewards, nextStates, dones) of batchSize random experiences.
+        The arrays are views of buffers that are reused and overwritten by the next sample call.
+        With prioritized sampling use getSampleIndices and getSampleWeights
+        for updatePriorities and the importance-sampling weights (exponent beta).
+        """
+        if self._size == 0:
+            raise ValueError('cannot sample from an empty replay buffer')
+        if batchSize != self._batchSize:
+            self._allocateBatch(batchSize)
+        if self._tree is None:
+            indices = self._rng.integers(0, self._size, batchSize)
+        else:
+            # one sample from each of batchSize equal segments of the total priority
+            total = self._tree.total()
+            values = (np.arange(batchSize) +
+                      self._rng.random(batchSize)) * (total / batchSize)
+            indices = np.minimum(self._tree.find(
+                np.minimum(values, np.nextafter(total, 0))), self._size - 1)
+            probabilities = self._tree.get(indices) / total
+            weights = (self._size * probabilities) ** -beta
+            np.divide(weights, weights.max(), out=self._weights)
+        self._indices[:] = indices
+        np.take(self._states, indices, axis=0, out=self._batch[0])
+        np.take(self._actions, indices, out=self._batch[1])
+        np.take(self._rewards, indices, out=self._batch[2])
+        np.take(self._nextStates, indices, axis=0, out=self._batch[3])
+        np.take(self._dones, indices, out=self._batch[4])
+        return self._batch
+
+    def getSampleIndices(self):
+        """ the buffer indices of the experiences returned by the last sample call """
+        return self._indices
+
+    def getSampleWeights(self):
+        """ the importance-sampling weights of the last prioritized sample (max weight is 1) """
+        return self._weights
+
+    def updatePriorities(self, indices, tdErrors):
+        """ set the priorities of the experiences at indices from their absolute td errors,
+        only for a buffer created with prioritized=True
+        """
+        if self._tree is None:
+            raise ValueError('updatePriorities needs a buffer created with prioritized=True')
+        priorities = (np.abs(tdErrors) + PRIORITY_EPSILON) ** self._alpha
+        self._tree.update(indices, priorities)
+        self._maxPriority = max(self._maxPriority, float(priorities.max()))
+        return
+
+    def _allocateBatch(self, batchSize):
+        stateSize = self._states.shape[1]
+        self._batch = (np.zeros((batchSize, stateSize), dtype=np.float32), np.zeros(batchSize, dtype=np.int32),
+                       np.zeros(batchSize, dtype=np.float32), np.zeros(
+                           (batchSize, stateSize), dtype=np.float32),
+                       np.zeros(batchSize, dtype=np.float32))
+        self._indices = np.zeros(batchSize, dtype=np.int64)
+        self._weights = np.ones(batchSize)
+        self._batchSize = batchSize
+        return
@@ -7,96 +7,238 @@ module that provides a simulator API for the smart Robot car
 Copyright 2021 Peter Bendel, see LICENSE file
 """
 
-from inspect import modulesbyfile
+import copy
+import functools
 import logging
+import os
 import Car
 import Canvas
-import RobotCarSimulator
-import Heuristic
-import pprint
 import sys
-from PIL import ImageFont
-from rewardFunctions import simpleReward
+from rewardFunctions import simpleReward, acceptsTrackPosition
+from Trajectory import TrajectoryRecorder
+from Instrumentation import Instrumentation
+import NumpyModel
+from VisitedIndex import VisitedIndex, DEFAULT_POSITION_CELL, DEFAULT_ANGLE_CELL, DEFAULT_MAX_ENTRIES
+from CoverageMap import SENSOR_MODE_EXACT, SENSOR_MODE_RASTER, SENSOR_MODE_TILED, SENSOR_MODES, DEFAULT_RESOLUTION
 from collections import deque
-import tensorflow as tf
 import numpy as np
 
-genevafont = ImageFont.truetype("Geneva.ttf", 30)
+FONT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Geneva.ttf')
+FONT_SIZE = 30
+# methods replaced by timed wrappers on an instrumented instance
+INSTRUMENTED_METHODS = ('logCar', '_updateLineTrackingSensorValues', 'addImageWithDuration', 'saveImage')
+
+
+@functools.lru_cache(maxsize=None)
+def genevaFont():
+    """ the font of the status text in the gif frames, loaded on first use """
+    from PIL import ImageFont
+    return ImageFont.truetype(FONT_FILE, FONT_SIZE)
+
+
+def frameText(step, time, sensorValues, reward):
+    """ the status text of a gif frame """
+    return 'Step: {:3d} Time: {:.2f} s - Sensors: L {:.0f} M {:.0f} R {:.0f} - Reward: {:.0f}'.format(
+        step, time, sensorValues[0], sensorValues[1], sensorValues[2], reward)
 
 
 class SimulatorControl():
 
-    def __init__(self, canvas, car, createGif=True, rewardFunction=simpleReward, logLevel=logging.INFO, stephistory=2) -> None:
+    def __init__(self, canvas, car, createGif=True, rewardFunction=simpleReward, logLevel=logging.INFO, stephistory=2,
+                 sensorMode=SENSOR_MODE_EXACT, rasterResolution=DEFAULT_RESOLUTION, paletteFrames=False,
+                 positionCellSize=DEFAULT_POSITION_CELL, angleCellSize=DEFAULT_ANGLE_CELL, maxVisited=DEFAULT_MAX_ENTRIES,
+                 instrumentation=None) -> None:
         """ By default the simulator will log to stderr with log level INFO.
         The module uses log levels INFO for major events and DEBUG for debugging.
 
         If you want to create an animated gif of this experiment set createGif to True.
-        To save resources if gif is not needed set createGif=False
+        To save resources if gif is not needed set createGif=False, the gif can still be
+        rendered from the trajectory later (see Renderer.renderTrajectory)
+        paletteFrames: keep the gif frames as compact palette images instead of RGB (see FrameRecorder),
+        saves memory on long runs, text is not antialiased
         stephistory: keeps sensorvalues for stephistory generations in memory
+        sensorMode: 'exact' computes the sensor values and followsLine with shapely polygon intersections,
+        'raster' looks them up in the canvas' coverage map with rasterResolution mm per cell
+        (faster, see CoverageMap.CoverageMap for the error bound),
+        'tiled' computes them exactly against the tile of the canvas' TrackTiles under the car,
+        so the cost of a step does not grow with the length of the track (see TrackCanvas)
+        rewardFunction: called with the keyword argument trackPosition=getTrackPosition() in addition
+        if it has a parameter trackPosition (see rewardFunctions.trackReward)
+        positionCellSize, angleCellSize, maxVisited: a pose is only rewarded once per grid cell
+        of this size (mm, degrees), at most maxVisited cells are remembered (see VisitedIndex)
+        instrumentation: True or an Instrumentation.Instrumentation (to share it between simulators)
+        records call counts and latencies of the phases of every step, see getStats()
         """
         self.__configLogger(logLevel)
-        self._canvas = canvas
-        self._car = car
+        if sensorMode not in SENSOR_MODES:
+            raise ValueError(
+                f'sensorMode must be one of {SENSOR_MODES}, not {sensorMode!r}')
+        self._sensorMode = sensorMode
+        self._rasterResolution = rasterResolution
+        self._setCar(car)
+        self._previousRewardPositions = VisitedIndex(
+            positionCellSize, angleCellSize, maxVisited)
+        self._rewardFunction = rewardFunction
+        self._rewardWithTrackPosition = acceptsTrackPosition(rewardFunction)
+        if instrumentation is True:
+            instrumentation = Instrumentation()
+        self._instrumentation = instrumentation or None
+        if self._instrumentation is not None:
+            self.__instrument(self._instrumentation)
+        self._stephistory = stephistory
+        self._createGif = createGif
+        self._paletteFrames = paletteFrames
+        self._trajectory = TrajectoryRecorder()
+        self._previousSensorValues = deque(maxlen=(stephistory*3))
+        # previous and current sensor values as in getPreviousLineTrackingSensorValues() + getLineTrackingSensorValues()
+        self._observation = np.zeros(3*(stephistory+1))
+        self.reset(canvas)
+        return
+
+    def reset(self, canvas=None):
+        """ Start a new episode on canvas (default: the current canvas) with the same car.
+        The car is put to the start of the curve, time, rewards, trajectory, sensor history
+        and recorded frames are cleared.
+        """
+        if canvas is not None:
+            self._setCanvas(canvas)
+        canvas = self._canvas
         self._reward = 0.0
-        self._previousRewardPositions = set()
+        self._totalReward = 0.0
+        self._previousRewardPositions.clear()
         self._xmax = 0
-        self._rewardFunction = rewardFunction
         self._time = 0.0
         self._isTerminated = False
         self._followsLine = True
-        self._canvasPoints = self._canvas.getCanvasBoundingPoints()
-        self._curvePoints = self._canvas.getCurveBoundingPoints()
-        car.setPosition(canvas.getCurveStartingPoint())
-        car.setOrientation(canvas.getCurveStartingOrientation())
-        self._carPositions = []
-        self._carOrientations = []
-        self._actionLog = []
-        self._images = []
-        self._durations = []
-        self._createGif = createGif
+        self._car.setPosition(canvas.getCurveStartingPoint())
+        self._car.setOrientation(canvas.getCurveStartingOrientation())
+        # a caller may still use the trajectory of the previous episode
+        if len(self._trajectory) > 0:
+            self._trajectory = TrajectoryRecorder()
+        self._frames = None
+        if self._createGif:
+            # PIL is only imported when frames are recorded
+            from FrameRecorder import FrameRecorder
+            self._frames = FrameRecorder(canvas, palette=self._paletteFrames)
         self._sensorValues = []
-        self._previousSensorValues = deque(maxlen=(stephistory*3))
+        self._previousSensorValues.clear()
         self.logCar("init", None, 100)
-        for i in range(stephistory):
+        for i in range(self._stephistory):
             self._previousSensorValues.extend(self._sensorValues)
+        # the sensor history starts with copies of the initial sensor values
+        self._observation[:] = self._sensorValues * (self._stephistory+1)
+        return self._observation
+
+    def _setCanvas(self, canvas):
+        self._canvas = canvas
+        self._coverageMap = canvas.getCoverageMap(
+            self._rasterResolution) if self._sensorMode == SENSOR_MODE_RASTER else None
+        self._canvasPoints = canvas.getCanvasBoundingPoints()
+        self._curvePoints = canvas.getCurveBoundingPoints()
+        # geometry cached by the canvas and shared by all simulators on it
+        self._canvasRectangle = canvas.getCanvasRectangle()
+        self._curvePolygon = canvas.getCurvePolygon()
+        self._trackTiles = canvas.getTrackTiles() if self._sensorMode == SENSOR_MODE_TILED else None
+        # the curve the sensor and followsLine queries run against
+        self._lineBounds = self._coverageMap if self._coverageMap is not None else self._curvePolygon
+        return
+
+    def _setCar(self, car):
+        self._car = car
+        self._carFollowsLine = car.followsLineRaster if self._sensorMode == SENSOR_MODE_RASTER else car.followsLine
+        self._carWithinBounds = car.isAtLeastOneCarSensorWithinBounds
         return
 
+    def snapshot(self):
+        """ the state of the episode as SimulatorState, to continue from it later with restore() or fork().
+        Only the pose, time, rewards, flags, sensor history and a reference to the canvas are copied,
+        the index of the rewarded poses is shared until it changes (copy-on-write).
+        """
+        return SimulatorState(self)
+
+    def restore(self, state):
+        """ continue the episode from state (see snapshot()), a state can be restored any number of times.
+        Trajectory and gif frames recorded after the snapshot are dropped.
+        """
+        if state.canvas is not self._canvas:
+            self._setCanvas(state.canvas)
+        self._car.setPosition(state.position)
+        self._car.setOrientation(state.rotation)
+        self._time = state.time
+        self._xmax = state.xmax
+        self._reward = state.reward
+        self._totalReward = state.totalReward
+        self._isTerminated = state.isTerminated
+        self._followsLine = state.followsLine
+        self._sensorValues = state.sensorValues
+        self._previousSensorValues.clear()
+        self._previousSensorValues.extend(state.previousSensorValues)
+        self._observation[:] = state.observation
+        self._previousRewardPositions = state.visited.fork()
+        self._trajectory.truncate(state.steps)
+        if self._frames is not None:
+            self._frames.truncate(state.steps)
+        return self._observation
+
+    def fork(self):
+        """ an independent simulator in the current state for lookahead search, e.g. one per branch.
+        It shares canvas, reward function and instrumentation, drives a copy of the car,
+        records no gif and starts with an empty trajectory.
+        """
+        sim = copy.copy(self)
+        # drop the timed wrappers of the instrumentation, they are bound to this instance
+        for name in INSTRUMENTED_METHODS:
+            sim.__dict__.pop(name, None)
+        sim._setCar(self._car.copy())
+        sim._createGif = False
+        sim._frames = None
+        sim._trajectory = TrajectoryRecorder()
+        sim._previousSensorValues = deque(self._previousSensorValues, maxlen=self._previousSensorValues.maxlen)
+        sim._observation = self._observation.copy()
+        sim._previousRewardPositions = self._previousRewardPositions.fork()
+        if self._instrumentation is not None:
+            sim._rewardFunction = self._rewardFunction.__wrapped__
+            sim.__instrument(self._instrumentation)
+        return sim
+
     def logCar(self, actionname, actionparms, duration):
+        if self._trackTiles is not None:
+            self._lineBounds = self._trackTiles.polygonAt(self._car._position[0], self._car._position[1])
         self._updateLineTrackingSensorValues()
-        self._followsLine = self._car.followsLine(self._curvePoints)
-        self._isTerminated = not self._car.isAtLeastOneCarSensorWithinBounds(
-            self._canvasPoints)
-        self._actionLog.append((actionname, actionparms, duration))
-        self._carPositions.append(self._car._position)
-        self._carOrientations.append(self._car._rotation)
+        self._followsLine = self._carFollowsLine(self._lineBounds)
+        self._isTerminated = not self._carWithinBounds(self._canvasRectangle)
         self._time += duration/1000
-        position = (round(self._car._position[0], 2), round(self._car._position[1], 2), round(self._car._rotation, 2),
-                    self._followsLine, self._isTerminated)
+        position = self._previousRewardPositions.key(self._car._position[0], self._car._position[1], self._car._rotation,
+                                                     self._followsLine, self._isTerminated)
         newx = self._car._position[0]
         if (newx > self._xmax):
             self._xmax = newx
         # no reward for going to the left (all curves go the right) or for reaching same position as before
         if (position in self._previousRewardPositions or newx < self._xmax):
             self._reward = 0.0
+        elif self._rewardWithTrackPosition:
+            self._previousRewardPositions.add(position)
+            self._reward = self._rewardFunction(
+                self._sensorValues, self._car._position, self._car._rotation, self._followsLine, self._isTerminated,
+                trackPosition=self.getTrackPosition())
         else:
             self._previousRewardPositions.add(position)
             self._reward = self._rewardFunction(
                 self._sensorValues, self._car._position, self._car._rotation, self._followsLine, self._isTerminated)
+        self._totalReward += self._reward
+        self._trajectory.append(actionname, actionparms, duration, self._car._position, self._car._rotation,
+                                self._sensorValues, self._reward, self._followsLine, self._isTerminated)
         self.addImageWithDuration(duration)
         self._logger.debug(
-            f'Sim: {actionname}: {actionparms}, duration {duration}, new pos: {self._car._position}, new angle: {self._car._rotation}, reward: {self._reward}')
+            'Sim: %s: %s, duration %s, new pos: %s, new angle: %s, reward: %s',
+            actionname, actionparms, duration, self._car._position, self._car._rotation, self._reward)
         return
 
     def addImageWithDuration(self, duration):
         if (self._createGif):
-            self._durations.append(duration)
-            (img, draw) = self._canvas.createImageAndDraw()
-            self._car.draw(draw)
-            text = 'Step: {:3d} Time: {:.2f} s - Sensors: L {:.0f} M {:.0f} R {:.0f} - Reward: {:.0f}'.format(len(self._images), self._time,
-                                                                                                              self._sensorValues[0], self._sensorValues[1], self._sensorValues[2], self._reward)
-            draw.text((400, 50), text, font=genevafont)
-            self._images.append(img)
-            self._durations.append(duration)
+            text = frameText(len(self._frames), self._time,
+                             self._sensorValues, self._reward)
+            self._frames.addFrame(self._car, text, genevaFont(), duration)
         return
 
     def _updateLineTrackingSensorValues(self):
@@ -106,10 +248,16 @@ class SimulatorControl():
         The values vary approximately between 0 and 1000 where lower value indicates lighter ground and higher values indicates
         darker ground
         """
-        listOfFloats = self._car.computeSensorValues(self._curvePoints)
-        self._logger.debug(f'Infrared sensor values (L/M/R): {listOfFloats}')
+        if self._coverageMap is not None:
+            listOfFloats = self._car.computeSensorValuesRaster(
+                self._coverageMap)
+        else:
+            listOfFloats = self._car.computeSensorValues(self._lineBounds)
+        self._logger.debug('Infrared sensor values (L/M/R): %s', listOfFloats)
         self._previousSensorValues.extend(self._sensorValues)
         self._sensorValues = listOfFloats
+        self._observation[:-3] = self._observation[3:]
+        self._observation[-3:] = listOfFloats
         return listOfFloats
 
     def getLineTrackingSensorValues(self):
@@ -118,6 +266,26 @@ class SimulatorControl():
     def getPreviousLineTrackingSensorValues(self):
         return self._previousSensorValues
 
+    def getObservation(self):
+        """ NumPy array of shape 3*(stephistory+1) with the same values as
+        list(getPreviousLineTrackingSensorValues()) + getLineTrackingSensorValues().
+        The array is updated in place by every action.
+        """
+        return self._observation
+
+    def getStats(self):
+        """ dict phase -> dict with count, total (s), mean, max, p50, p90 and p99 (us)
+        for the phases logCar (complete step), sensors, followsLine, bounds, reward, render and gif.
+        Empty if the simulator has been created without instrumentation.
+        """
+        if self._instrumentation is None:
+            return {}
+        return self._instrumentation.getStats()
+
+    def getInstrumentation(self):
+        """ the Instrumentation.Instrumentation or None, e.g. to call dumpAtExit() """
+        return self._instrumentation
+
     def getDuration(self):
         return self._time
 
@@ -169,22 +337,77 @@ class SimulatorControl():
         """
         return self._followsLine
 
+    def getTrackPosition(self):
+        """ (crossTrack, progress) in mm of the center of the car: the signed distance to the centre line
+        of the curve (positive on the left in driving direction) and the distance along it from its start,
+        looked up in the DistanceField.DistanceField of the canvas
+        """
+        position = self._car._position
+        return self._canvas.getDistanceField().trackPosition(position[0], position[1])
+
     def getReward(self):
         return self._reward
 
+    def getTotalReward(self):
+        """ sum of the rewards of all actions so far """
+        return self._totalReward
+
+    def getMaxX(self):
+        """ the largest x position the car has reached so far """
+        return self._xmax
+
+    def getTrajectory(self):
+        """ the Trajectory.TrajectoryRecorder with one entry per action (including init) """
+        return self._trajectory
+
+    def saveTrajectory(self, file):
+        """ save the trajectory as binary file, load it with Trajectory.loadTrajectory """
+        self._trajectory.save(file, {'seed': self._canvas.getSeed()})
+        return
+
+    # the action log, positions and orientations as lists, used by the text logs in LearnModel.ipynb,
+    # the lists are cached by the TrajectoryRecorder and only extended by new steps
+    @property
+    def _actionLog(self):
+        return self._trajectory.getActionLog()
+
+    @property
+    def _carPositions(self):
+        return self._trajectory.getPositions()
+
+    @property
+    def _carOrientations(self):
+        return self._trajectory.getOrientations()
+
     def saveImage(self, file='carsimulation.gif'):
         """
         file: create an animated gif and save it under path given
         works only if createGif=True
         """
         if (self._createGif):
-            self._images[0].save(file, format='GIF', append_images=self._images[1:],
-                                 save_all=True, duration=self._durations, loop=0, optimize=True)
+            self._frames.save(file)
+
+    def __instrument(self, instrumentation):
+        """ replace the step phases of this instance by timed wrappers """
+        wrap = instrumentation.wrap
+        self.logCar = wrap('logCar', self.logCar)
+        self._updateLineTrackingSensorValues = wrap(
+            'sensors', self._updateLineTrackingSensorValues)
+        self._carFollowsLine = wrap('followsLine', self._carFollowsLine)
+        self._carWithinBounds = wrap('bounds', self._carWithinBounds)
+        self._rewardFunction = wrap('reward', self._rewardFunction)
+        self.addImageWithDuration = wrap('render', self.addImageWithDuration)
+        self.saveImage = wrap('gif', self.saveImage)
+        return
 
     def __configLogger(self, logLevel):
         """ by default log all INFO level and above messages to stderr with timestamp, module and threadname, level and message
         """
         self._logger = logging.getLogger(__name__)
+        handlers = self._logger.handlers
+        if self._logger.level == logLevel and len(handlers) == 1 and handlers[0].level == logLevel:
+            # already configured by a previous instance
+            return
         self._logger.setLevel(logLevel)
         self._logger.handlers.clear()
         console_handler = logging.StreamHandler()
@@ -195,55 +418,84 @@ class SimulatorControl():
         self._logger.addHandler(console_handler)
         return
 
-    if __name__ == '__main__':
-        seed = 5
-        if (len(sys.argv) > 1):
-            seed = int(sys.argv[1])
-        car = Car.CarModel(logLevel=logging.DEBUG)
-        canvas = Canvas.CanvasModel(seed=seed, logLevel=logging.DEBUG)
-        sim = RobotCarSimulator.SimulatorControl(
-            canvas, car, createGif=True, logLevel=logging.DEBUG)
-        heuristic = Heuristic.HeuristicLineTracker(sim)
-        heuristic.run()
-        sim.saveImage('images/heuristic_seed_{}.gif'.format(seed))
-        with open('data/heuristic_seed_{}.txt'.format(seed), 'w') as f:
-            f.write("actions:\n")
-            f.write(pprint.pformat(sim._actionLog))
-            f.write("\n\npositions:\n")
-            f.write(pprint.pformat(sim._carPositions))
-            f.write("\n\norientations:\n")
-            f.write(pprint.pformat(sim._carOrientations))
-        exit(0)
+
+class SimulatorState():
+    """ the state of an episode of a SimulatorControl, see SimulatorControl.snapshot() """
+
+    __slots__ = ('canvas', 'position', 'rotation', 'time', 'xmax', 'reward', 'totalReward', 'isTerminated',
+                 'followsLine', 'sensorValues', 'previousSensorValues', 'observation', 'visited', 'steps')
+
+    def __init__(self, sim) -> None:
+        self.canvas = sim._canvas
+        self.position = sim._car._position
+        self.rotation = sim._car._rotation
+        self.time = sim._time
+        self.xmax = sim._xmax
+        self.reward = sim._reward
+        self.totalReward = sim._totalReward
+        self.isTerminated = sim._isTerminated
+        self.followsLine = sim._followsLine
+        # replaced by every step, never changed in place
+        self.sensorValues = sim._sensorValues
+        self.previousSensorValues = tuple(sim._previousSensorValues)
+        self.observation = sim._observation.copy()
+        self.visited = sim._previousRewardPositions.fork()
+        self.steps = len(sim._trajectory)
+        return
 
 
 def runModelAndSaveVideo(modelfile, videodirectory='./images', logdirectory='./data', seed=5, logLevel=logging.INFO):
     videofilename = videodirectory + '/model_seed_{}.gif'.format(seed)
-    logfilename = logdirectory + '/model_seed_{}.txt'.format(seed)
-    model = tf.keras.models.load_model(modelfile)
+    logfilename = logdirectory + '/model_seed_{}.traj'.format(seed)
+    model = NumpyModel.loadModel(modelfile)
     car = Car.CarModel(logLevel=logLevel)
     canvas = Canvas.CanvasModel(seed=seed, logLevel=logLevel)
-    sim = RobotCarSimulator.SimulatorControl(
-        canvas, car, createGif=True, logLevel=logLevel)
-
-    while not sim.isTerminated() and sim.getDuration() < 20.0:
-        state_qn = np.expand_dims(np.array(list(sim.getPreviousLineTrackingSensorValues(
-        )) + sim.getLineTrackingSensorValues()), axis=0)
-        q_values = model(state_qn)
-        action = np.argmax(q_values.numpy()[0])
+    sim = SimulatorControl(
+        canvas, car, createGif=True, logLevel=logLevel, paletteFrames=True)
+
+    runModel(sim, model)
+
+    sim.saveImage(videofilename)
+    sim.saveTrajectory(logfilename)
+    return
+
+
+def runModel(sim, model, maxDuration=20.0):
+    """ drive the car with the actions of the DQN model until the simulation terminates
+    or maxDuration seconds of simulated time have passed
+    model: NumpyModel.NumpyModel or a Keras model
+    """
+    while not sim.isTerminated() and sim.getDuration() < maxDuration:
+        action = modelAction(model, sim.getObservation())
         if (action == 0):
             sim.driveForward(100, 150)
         elif(action == 1):
             sim.turnLeft(100, 50)
         elif(action == 2):
             sim.turnRight(100, 50)
+    return
 
-    sim.saveImage('images/model_seed_{}.gif'.format(seed))
-    with open('data/model_seed_{}.txt'.format(seed), 'w') as f:
-        f.write("actions:\n")
-        f.write(pprint.pformat(sim._actionLog))
-        f.write("\n\npositions:\n")
-        f.write(pprint.pformat(sim._carPositions))
-        f.write("\n\norientations:\n")
-        f.write(pprint.pformat(sim._carOrientations))
 
-    return
+def modelAction(model, state):
+    """ the action with the largest q value of model (NumpyModel.NumpyModel or Keras model) for state """
+    if isinstance(model, NumpyModel.NumpyModel):
+        return model.getAction(state)
+    # curve_tracking_model.h5 loaded with Keras 3 declares the input shape (None, None, 9)
+    q_values = model(state.reshape((1,) * (len(model.input_shape) - 1) + (-1,)))
+    return np.argmax(q_values.numpy().reshape(-1))
+
+
+if __name__ == '__main__':
+    import Heuristic
+    seed = 5
+    if (len(sys.argv) > 1):
+        seed = int(sys.argv[1])
+    car = Car.CarModel(logLevel=logging.DEBUG)
+    canvas = Canvas.CanvasModel(seed=seed, logLevel=logging.DEBUG)
+    sim = SimulatorControl(
+        canvas, car, createGif=True, logLevel=logging.DEBUG, paletteFrames=True)
+    heuristic = Heuristic.HeuristicLineTracker(sim, logLevel=logging.DEBUG)
+    heuristic.run()
+    sim.saveImage('images/heuristic_seed_{}.gif'.format(seed))
+    sim.saveTrajectory('data/heuristic_seed_{}.traj'.format(seed))
+    exit(0)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+"""
+module that runs a policy on many seeds in parallel and writes one summary file
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python Runner.py --seeds 0-999 --policy heuristic --workers 8 --summary data/heuristic.csv
+       python Runner.py --seeds 2-21 --policy curve_tracking_model.h5 --artifacts data --gif
+       python Runner.py --seeds 0-999 --policy curve_tracking_model.h5 --lockstep 250
+"""
+
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import time
+import numpy as np
+import BatchSimulator
+import Car
+import Canvas
+import Heuristic
+import NumpyModel
+import RobotCarSimulator
+from TrackLibrary import TrackLibrary, parseSeeds
+
+POLICY_HEURISTIC = 'heuristic'
+DEFAULT_MAX_DURATION = 20.0
+SUMMARY_FIELDS = ('seed', 'steps', 'duration', 'maxX', 'followsLine', 'terminated', 'totalReward',
+                  'seconds')
+
+# state of a worker process, set by _initWorker
+_policy = None
+_model = None
+_library = None
+
+
+def runEpisode(seed, policy=POLICY_HEURISTIC, model=None, maxDuration=DEFAULT_MAX_DURATION, artifacts=None,
+               createGif=False, canvas=None, logLevel=logging.WARNING, heuristicParameters=None):
+    """ run one episode of the policy on the curve of seed and return its summary as dict.
+    policy: POLICY_HEURISTIC or the file name of a DQN model (the NumpyModel of the file passed as model)
+    artifacts: directory for the trajectory (and with createGif the animated gif) of the episode,
+    the gif is rendered from the trajectory after the episode (see Renderer.renderTrajectory)
+    canvas: CanvasModel to use (default: generated for seed)
+    heuristicParameters: dict of tuning parameters of the heuristic (see Heuristic.PARAMETERS)
+    """
+    start = time.perf_counter()
+    if canvas is None:
+        canvas = Canvas.CanvasModel(seed=seed, logLevel=logLevel)
+    sim = RobotCarSimulator.SimulatorControl(
+        canvas, Car.CarModel(logLevel=logLevel), createGif=False, logLevel=logLevel)
+    if policy == POLICY_HEURISTIC:
+        Heuristic.HeuristicLineTracker(sim, maxDuration, logLevel, **(heuristicParameters or {})).run()
+        name = 'heuristic'
+    else:
+        RobotCarSimulator.runModel(sim, model, maxDuration)
+        name = 'model'
+    if artifacts is not None:
+        sim.saveTrajectory(os.path.join(
+            artifacts, '{}_seed_{}.traj'.format(name, seed)))
+        if createGif:
+            # PIL is only imported when a gif is rendered
+            import Renderer
+            Renderer.renderTrajectory(sim.getTrajectory().getArrays(), canvas, os.path.join(
+                artifacts, '{}_seed_{}.gif'.format(name, seed)), palette=True)
+    flags = sim.getTrajectory().getArrays()['flags']
+    return {'seed': seed, 'steps': len(flags) - 1, 'duration': round(sim.getDuration(), 3),
+            'maxX': round(float(sim.getMaxX()), 2),
+            'followsLine': round(float((flags & 1).mean()), 4),
+            'terminated': sim.isTerminated(), 'totalReward': round(sim.getTotalReward(), 2),
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+def runModelLockstep(seeds, model, maxDuration=DEFAULT_MAX_DURATION, canvases=None, logLevel=logging.WARNING):
+    """ run the model (NumpyModel.NumpyModel) on all seeds at once with BatchSimulator.BatchSimulatorControl.
+    Every tick the states of all running episodes are evaluated with one batched inference,
+    an episode stops when it is terminated or reaches maxDuration seconds of simulated time.
+    canvases: CanvasModel per seed (default: generated)
+    returns a list of result dicts like runEpisode, seconds is the share of the total wall time
+    """
+    start = time.perf_counter()
+    if canvases is None:
+        canvases = [Canvas.CanvasModel(seed=seed, logLevel=logLevel)
+                    for seed in seeds]
+    batch = BatchSimulator.BatchSimulatorControl(canvases, logLevel=logLevel)
+    count = len(batch)
+    states = batch.getStates()
+    steps = np.zeros(count, dtype=np.int64)
+    onLine = batch.carFollowsLine().astype(np.int64)
+    totalRewards = batch.getRewards().copy()
+    actions = np.zeros(count, dtype=np.int64)
+    active = ~batch.isTerminated() & (batch.getDurations() < maxDuration)
+    while active.any():
+        actions[active] = model.getActions(states[active])
+        states, rewards, dones = batch.step(actions, active=active)
+        steps += active
+        onLine += batch.carFollowsLine() & active
+        totalRewards[active] += rewards[active]
+        active &= ~dones & (batch.getDurations() < maxDuration)
+    seconds = round((time.perf_counter() - start) / count, 3)
+    return [{'seed': seed, 'steps': int(steps[i]), 'duration': round(float(batch.getDurations()[i]), 3),
+             'maxX': round(float(batch.getMaxX()[i]), 2), 'followsLine': round(float(onLine[i] / (steps[i] + 1)), 4),
+             'terminated': bool(batch.isTerminated()[i]), 'totalReward': round(float(totalRewards[i]), 2),
+             'seconds': seconds} for i, seed in enumerate(seeds)]
+
+
+def _initWorker(policy, libraryPath):
+    global _policy, _model, _library
+    _policy = policy
+    if policy != POLICY_HEURISTIC:
+        _model = NumpyModel.loadModel(policy)
+    if libraryPath is not None:
+        _library = TrackLibrary(libraryPath, logLevel=logging.WARNING)
+    return
+
+
+def _runWorkerEpisode(parameters):
+    seed, maxDuration, artifacts, createGif = parameters
+    canvas = _library.getCanvas(seed) if _library is not None else None
+    return runEpisode(seed, _policy, _model, maxDuration, artifacts, createGif, canvas)
+
+
+def _runWorkerLockstep(parameters):
+    seeds, maxDuration = parameters
+    canvases = [_library.getCanvas(seed)
+                for seed in seeds] if _library is not None else None
+    return runModelLockstep(seeds, _model, maxDuration, canvases)
+
+
+def runEpisodes(seeds, summary, policy=POLICY_HEURISTIC, workers=None, maxDuration=DEFAULT_MAX_DURATION,
+                artifacts=None, createGif=False, libraryPath=None, lockstep=None, logLevel=logging.INFO):
+    """ run the policy on all seeds in a pool of spawned worker processes (default: one per cpu).
+    Each result is appended to the csv file summary as soon as it is available,
+    the rows are in order of completion. Returns the list of result dicts.
+    libraryPath: optional TrackLibrary file with pre-generated curves
+    lockstep: for a model policy run groups of this many seeds in lockstep (see runModelLockstep),
+    artifacts are not written in this mode
+    """
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logLevel)
+    if artifacts is not None:
+        os.makedirs(artifacts, exist_ok=True)
+    workers = workers or os.cpu_count()
+    if lockstep and policy != POLICY_HEURISTIC:
+        function = _runWorkerLockstep
+        tasks = [(seeds[i:i+lockstep], maxDuration)
+                 for i in range(0, len(seeds), lockstep)]
+        chunksize = 1
+    else:
+        function = _runWorkerEpisode
+        tasks = [(seed, maxDuration, artifacts, createGif) for seed in seeds]
+        chunksize = max(1, len(tasks) // (workers * 8))
+    results = []
+    start = time.perf_counter()
+    # spawned workers do not inherit the state of the parent (e.g. threads of a loaded Keras model)
+    # and behave the same on all platforms
+    context = multiprocessing.get_context('spawn')
+    with open(summary, 'w', newline='') as f, context.Pool(workers, _initWorker, (policy, libraryPath)) as pool:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for taskResults in pool.imap_unordered(function, tasks, chunksize):
+            if function is _runWorkerEpisode:
+                taskResults = [taskResults]
+            for result in taskResults:
+                writer.writerow(result)
+                results.append(result)
+                logger.debug('Runner: %s', result)
+                if len(results) % 100 == 0:
+                    logger.info('Runner: %d of %d episodes after %.1f s',
+                                len(results), len(seeds), time.perf_counter() - start)
+            f.flush()
+    logger.info('Runner: %d episodes in %.1f s, summary in %s',
+                len(results), time.perf_counter() - start, summary)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='run a policy on many seeds in parallel')
+    parser.add_argument('--seeds', type=parseSeeds, default=parseSeeds('0-99'),
+                        help="seeds, e.g. '2,5,9' or '0-999' (default 0-99)")
+    parser.add_argument('--policy', default=POLICY_HEURISTIC,
+                        help="'heuristic' or the file name of a DQN model, e.g. curve_tracking_model.h5")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: number of cpus)')
+    parser.add_argument('--summary', default='data/summary.csv',
+                        help='csv file with one row per episode (default data/summary.csv)')
+    parser.add_argument('--max-duration', type=float, default=DEFAULT_MAX_DURATION,
+                        help='stop an episode after this many seconds of simulated time (default 20)')
+    parser.add_argument('--artifacts', default=None,
+                        help='directory for the trajectory of every episode')
+    parser.add_argument('--gif', action='store_true',
+                        help='also save an animated gif of every episode in the artifacts directory')
+    parser.add_argument('--library', default=None,
+                        help='track library file with pre-generated curves (see TrackLibrary.py)')
+    parser.add_argument('--lockstep', type=int, default=None,
+                        help='for a model policy: run groups of this many seeds in lockstep with batched inference')
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(asctime)s - (%(name)s %(threadName)-9s) - %(levelname)s: %(message)s')
+    runEpisodes(args.seeds, args.summary, args.policy, args.workers, args.max_duration, args.artifacts,
+                args.gif, args.library, args.lockstep)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+
+"""
+module that serves simulator sessions over a local socket with asyncio
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python SimulatorServer.py --port 8765 --seed 5
+       python SimulatorServer.py --unix /tmp/robotcar.sock --stats-interval 10
+
+Every connection gets its own SimulatorControl on the canvas of the server's seed, the canvases
+are shared by all sessions. The protocol uses frames of fixed size:
+request  REQUEST  command (uint8), speed (uint16), value (uint32): duration in ms or the seed of RESET
+response RESPONSE status (uint8), sensor values L/M/R (3 doubles), isTerminated (bool), duration (double, s)
+Every response carries the state after the command, so SimulatorClient answers
+getLineTrackingSensorValues, isTerminated and getDuration without a round trip.
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import socket
+import struct
+import time
+import Canvas
+import Car
+import RobotCarSimulator
+from CoverageMap import SENSOR_MODE_EXACT, SENSOR_MODES
+from Instrumentation import Instrumentation
+from TrackLibrary import TrackLibrary
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_SEED = 5
+CANVAS_CACHE_SIZE = 64
+
+REQUEST = struct.Struct('<BHI')
+RESPONSE = struct.Struct('<B3d?d')
+
+DRIVE_FORWARD = 1
+TURN_LEFT = 2
+TURN_RIGHT = 3
+GET_SENSORS = 4
+IS_TERMINATED = 5
+RESET = 6
+COMMAND_NAMES = {DRIVE_FORWARD: 'driveForward', TURN_LEFT: 'turnLeft', TURN_RIGHT: 'turnRight',
+                 GET_SENSORS: 'getLineTrackingSensorValues', IS_TERMINATED: 'isTerminated', RESET: 'reset'}
+
+STATUS_OK = 0
+STATUS_UNKNOWN_COMMAND = 1
+STATUS_ERROR = 2
+
+
+class SimulatorServer():
+
+    def __init__(self, seed=DEFAULT_SEED, sensorMode=SENSOR_MODE_EXACT, libraryPath=None,
+                 logLevel=logging.INFO) -> None:
+        """ Serve one SimulatorControl (without gif) per connection, see start().
+        seed: curve of new sessions, RESET switches a session to another seed
+        sensorMode: see RobotCarSimulator.SimulatorControl
+        libraryPath: optional TrackLibrary file with pre-generated curves
+        The latency of every command (from the decoded request to the queued response)
+        is recorded per command name, see getStats().
+        """
+        if sensorMode not in SENSOR_MODES:
+            raise ValueError(
+                f'sensorMode must be one of {SENSOR_MODES}, not {sensorMode!r}')
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logLevel)
+        self._seed = seed
+        self._sensorMode = sensorMode
+        self._library = TrackLibrary(libraryPath, logLevel=logLevel) if libraryPath is not None else None
+        self._canvas = functools.lru_cache(maxsize=CANVAS_CACHE_SIZE)(self._createCanvas)
+        self._instrumentation = Instrumentation()
+        self._timers = {command: self._instrumentation.timer(name) for command, name in COMMAND_NAMES.items()}
+        self._server = None
+        self._path = None
+        self._sessions = 0
+        self._totalSessions = 0
+        return
+
+    def _createCanvas(self, seed):
+        if self._library is not None:
+            return self._library.getCanvas(seed)
+        return Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING)
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """ listen on host:port (port 0: any free port) or on the Unix socket path, returns getAddress() """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._serveSession, path=path)
+            self._path = path
+        else:
+            self._server = await asyncio.start_server(self._serveSession, host, port)
+        self._logger.info('SimulatorServer: listening on %s', self.getAddress())
+        return self.getAddress()
+
+    def getAddress(self):
+        """ the path of the Unix socket or (host, port) """
+        if self._path is not None:
+            return self._path
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serveForever(self):
+        await self._server.serve_forever()
+        return
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        return
+
+    def getSessions(self):
+        """ (open sessions, sessions served since start) """
+        return self._sessions, self._totalSessions
+
+    def getStats(self):
+        """ dict command name -> dict with count, total (s), mean, max, p50, p90 and p99 (us) """
+        return self._instrumentation.getStats()
+
+    def formatStats(self):
+        return self._instrumentation.format()
+
+    async def _serveSession(self, reader, writer):
+        sim = RobotCarSimulator.SimulatorControl(self._canvas(self._seed), Car.CarModel(logLevel=logging.WARNING),
+                                                 createGif=False, logLevel=logging.WARNING,
+                                                 sensorMode=self._sensorMode)
+        self._sessions += 1
+        self._totalSessions += 1
+        clock = time.perf_counter_ns
+        try:
+            while True:
+                try:
+                    request = await reader.readexactly(REQUEST.size)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                start = clock()
+                command, speed, value = REQUEST.unpack(request)
+                status = self._execute(sim, command, speed, value)
+                sensorValues = sim.getLineTrackingSensorValues()
+                # a client may reset the connection before it reads the response
+                try:
+                    writer.write(RESPONSE.pack(status, sensorValues[0], sensorValues[1], sensorValues[2],
+                                               sim.isTerminated(), sim.getDuration()))
+                    timer = self._timers.get(command)
+                    if timer is not None:
+                        timer.add(clock() - start)
+                    await writer.drain()
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+        finally:
+            self._sessions -= 1
+            writer.close()
+        return
+
+    def _execute(self, sim, command, speed, value):
+        """ run the command on the simulator of the session, returns the status """
+        try:
+            if command == DRIVE_FORWARD:
+                sim.driveForward(speed, value)
+            elif command == TURN_LEFT:
+                sim.turnLeft(speed, value)
+            elif command == TURN_RIGHT:
+                sim.turnRight(speed, value)
+            elif command == RESET:
+                sim.reset(self._canvas(value))
+            elif command not in (GET_SENSORS, IS_TERMINATED):
+                return STATUS_UNKNOWN_COMMAND
+        except Exception as e:
+            self._logger.warning('SimulatorServer: %s failed: %s', COMMAND_NAMES[command], e)
+            return STATUS_ERROR
+        return STATUS_OK
+
+
+def _decode(response):
+    """ (sensor values, isTerminated, duration) of a response, raises RuntimeError if the command failed """
+    status, left, middle, right, isTerminated, duration = RESPONSE.unpack(response)
+    if status != STATUS_OK:
+        raise RuntimeError(f'simulator server returned status {status}')
+    return [left, middle, right], isTerminated, duration
+
+
+class SimulatorClient():
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, timeout=None) -> None:
+        """ Blocking client of a SimulatorServer session with the command surface of SimulatorControl,
+        e.g. to run Heuristic.HeuristicLineTracker against the server.
+        path: connect to this Unix socket instead of host:port
+        """
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port), timeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._response = bytearray(RESPONSE.size)
+        self._call(GET_SENSORS)
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+    def close(self):
+        self._socket.close()
+        return
+
+    def _call(self, command, speed=0, value=0):
+        self._socket.sendall(REQUEST.pack(command, speed, value))
+        view = memoryview(self._response)
+        received = 0
+        while received < RESPONSE.size:
+            count = self._socket.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError('simulator server closed the connection')
+            received += count
+        self._sensorValues, self._isTerminated, self._duration = _decode(self._response)
+        return
+
+    def driveForward(self, speed=100, duration=1000):
+        self._call(DRIVE_FORWARD, speed, duration)
+        return
+
+    def turnLeft(self, speed=100, duration=400):
+        self._call(TURN_LEFT, speed, duration)
+        return
+
+    def turnRight(self, speed=160, duration=400):
+        self._call(TURN_RIGHT, speed, duration)
+        return
+
+    def reset(self, seed):
+        """ start a new episode on the curve of seed """
+        self._call(RESET, 0, seed)
+        return
+
+    def getLineTrackingSensorValues(self):
+        return self._sensorValues
+
+    def isTerminated(self):
+        return self._isTerminated
+
+    def getDuration(self):
+        return self._duration
+
+
+class AsyncSimulatorClient():
+
+    def __init__(self, reader, writer) -> None:
+        """ asyncio client of a SimulatorServer session, create it with connect() """
+        self._reader = reader
+        self._writer = writer
+        return
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        await client._call(GET_SENSORS)
+        return client
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        return
+
+    async def _call(self, command, speed=0, value=0):
+        self._writer.write(REQUEST.pack(command, speed, value))
+        self._sensorValues, self._isTerminated, self._duration = _decode(
+            await self._reader.readexactly(RESPONSE.size))
+        return
+
+    async def driveForward(self, speed=100, duration=1000):
+        await self._call(DRIVE_FORWARD, speed, duration)
+        return
+
+    async def turnLeft(self, speed=100, duration=400):
+        await self._call(TURN_LEFT, speed, duration)
+        return
+
+    async def turnRight(self, speed=160, duration=400):
+        await self._call(TURN_RIGHT, speed, duration)
+        return
+
+    async def reset(self, seed):
+        await self._call(RESET, 0, seed)
+        return
+
+    def getLineTrackingSensorValues(self):
+        return self._sensorValues
+
+    def isTerminated(self):
+        return self._isTerminated
+
+    def getDuration(self):
+        return self._duration
+
+
+async def _serve(args):
+    server = SimulatorServer(args.seed, args.sensor_mode, args.library)
+    await server.start(args.host, args.port, args.unix)
+
+    async def reportStats():
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            logging.getLogger(__name__).info('SimulatorServer: %d open sessions, %d served\n%s',
+                                             *server.getSessions(), server.formatStats())
+    if args.stats_interval:
+        asyncio.get_running_loop().create_task(reportStats())
+    try:
+        await server.serveForever()
+    finally:
+        print(server.formatStats())
+    return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='serve robot car simulator sessions over a local socket')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='address to listen on (default %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='TCP port (default %(default)s)')
+    parser.add_argument('--unix', default=None,
+                        help='listen on this Unix socket path instead of TCP')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help='curve of new sessions (default %(default)s)')
+    parser.add_argument('--sensor-mode', choices=SENSOR_MODES, default=SENSOR_MODE_EXACT,
+                        help='sensor computation of the simulators (default %(default)s)')
+    parser.add_argument('--library', default=None,
+                        help='track library file with pre-generated curves (see TrackLibrary.py)')
+    parser.add_argument('--stats-interval', type=float, default=None,
+                        help='log the command latencies every this many seconds')
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(asctime)s - (%(name)s %(threadName)-9s) - %(levelname)s: %(message)s')
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
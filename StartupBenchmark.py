@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+"""
+module that measures the startup cost of a simulator worker process
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python StartupBenchmark.py [--repeat 5] [--json data/startup.json]
+
+Every measurement runs in a fresh interpreter:
+    process     wall time to start python, import RobotCarSimulator and run the first step
+    import      time to import RobotCarSimulator
+    firstStep   time from the end of the import to the end of the first driveForward
+                (CanvasModel, CarModel and SimulatorControl with createGif=False)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = '''
+import time
+start = time.perf_counter()
+import logging
+import RobotCarSimulator, Canvas, Car
+imported = time.perf_counter()
+sim = RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(seed=5, logLevel=logging.WARNING),
+                                         Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                         logLevel=logging.WARNING)
+sim.driveForward(100, 150)
+stepped = time.perf_counter()
+import sys
+print(imported - start, stepped - imported, ' '.join(sorted(name for name in ('tensorflow', 'PIL', 'h5py')
+                                                          if name in sys.modules)))
+'''
+
+
+def measure(repeat=5):
+    """ returns dict measurement -> median seconds over repeat fresh interpreters,
+    'modules' lists the heavy optional modules that were imported
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {'process': [], 'import': [], 'firstStep': []}
+    modules = ''
+    for i in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', CHILD], cwd=directory, check=True,
+                                capture_output=True, text=True).stdout.split(None, 2)
+        results['process'].append(time.perf_counter() - start)
+        results['import'].append(float(output[0]))
+        results['firstStep'].append(float(output[1]))
+        modules = output[2].strip() if len(output) > 2 else ''
+    summary = {name: statistics.median(values)
+               for name, values in results.items()}
+    summary['modules'] = modules
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='measure import time and time to first step of RobotCarSimulator')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of fresh interpreters, the median is reported (default 5)')
+    parser.add_argument('--json', default=None,
+                        help='also write the results to this JSON file')
+    args = parser.parse_args()
+    summary = measure(args.repeat)
+    for name in ('process', 'import', 'firstStep'):
+        print('{:<10} {:8.1f} ms'.format(name, summary[name] * 1000))
+    print('{:<10} {}'.format('modules', summary['modules'] or '-'))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
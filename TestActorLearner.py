@@ -0,0 +1,110 @@
+import unittest
+import os
+import pickle
+import tempfile
+import ActorLearner
+import NumpyModel
+import numpy as np
+from ReplayBuffer import ReplayBuffer
+
+
+class TestActorLearner(unittest.TestCase):
+    def testSharedRing(self):
+        ring = ActorLearner.SharedRing(4, 2)
+        memory = ReplayBuffer(10, 2, seed=1)
+        try:
+            for i in range(3):
+                self.assertTrue(ring.push([i, i], i, float(i), [i+1, i+1], False))
+            self.assertEqual(ring.drain(memory), 3)
+            for i in range(3, 7):
+                self.assertTrue(ring.push([i, i], i, float(i), [i+1, i+1], i == 6))
+            # full: backpressure until stopped
+            self.assertFalse(ring.push([7, 7], 7, 7.0, [8, 8], False, lambda: True))
+            self.assertEqual(ring.header[ActorLearner.STALLS], 1)
+            self.assertEqual(len(ring), 4)
+            self.assertEqual(ring.drain(memory), 4)
+            self.assertEqual(len(memory), 7)
+            states, actions, rewards, nextStates, dones = memory.sample(100)
+            self.assertEqual(set(actions.tolist()), set(range(7)))
+            np.testing.assert_array_equal(states[:, 0], rewards)
+            np.testing.assert_array_equal(nextStates[:, 1], rewards + 1)
+            np.testing.assert_array_equal(dones, rewards == 6.0)
+        finally:
+            ring.close()
+
+    def testPickle(self):
+        """ a pickled ring or board (the actors of the start method spawn) share the memory """
+        ring = ActorLearner.SharedRing(4, 2)
+        board = ActorLearner.WeightBoard([((2, 3), (3,))])
+        try:
+            copy = pickle.loads(pickle.dumps(ring))
+            self.assertTrue(copy.push([1, 1], 1, 1.0, [2, 2], False))
+            copy.header[ActorLearner.EPISODES] = 3
+            self.assertEqual((len(ring), ring.header[ActorLearner.EPISODES]), (1, 3))
+            copy.close()
+            boardCopy = pickle.loads(pickle.dumps(board))
+            board.publish([(np.ones((2, 3)), np.full(3, 2.0))])
+            model = NumpyModel.NumpyModel([(np.zeros((2, 3)), np.zeros(3), 'sigmoid')])
+            self.assertEqual(boardCopy.readInto(pickle.loads(pickle.dumps(model))), 2)
+            boardCopy.close()
+            # the copies do not remove the shared memory
+            self.assertEqual(ring.drain(ReplayBuffer(4, 2)), 1)
+        finally:
+            ring.close()
+            board.close()
+
+    def testWeightBoard(self):
+        learner = ActorLearner.DQNLearner(9, 3, seed=1)
+        model = NumpyModel.NumpyModel([(np.zeros((9, 64)), np.zeros(64), 'relu'), (np.zeros((64, 64)), np.zeros(64), 'relu'),
+                                       (np.zeros((64, 3)), np.zeros(3), 'linear')])
+        board = ActorLearner.WeightBoard([(kernel.shape, bias.shape)
+                                          for kernel, bias in learner.getWeights()])
+        try:
+            board.publish(learner.getWeights())
+            self.assertEqual(board.readInto(model), 2)
+            states = np.random.default_rng(1).uniform(30.0, 900.0, (20, 9))
+            np.testing.assert_array_equal(model.predict(states), learner.getModel().predict(states))
+            self.assertFalse(board.isStopped())
+            board.stop()
+            self.assertTrue(board.isStopped())
+        finally:
+            board.close()
+
+    def testLearn(self):
+        rng = np.random.default_rng(2)
+        batch = (rng.uniform(0.0, 1.0, (64, 9)).astype(np.float32), rng.integers(0, 3, 64).astype(np.int32),
+                 rng.uniform(-1.0, 1.0, 64).astype(np.float32), rng.uniform(0.0, 1.0, (64, 9)).astype(np.float32),
+                 np.zeros(64, dtype=np.float32))
+        learner = ActorLearner.DQNLearner(9, 3, gamma=0.0, learningRate=1e-3, seed=3)
+        first = learner.learn(batch)
+        for i in range(300):
+            loss = learner.learn(batch)
+        self.assertLess(loss, first / 10)
+        self.assertEqual(learner.getUpdates(), 301)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.npz')
+            learner.getModel().save(path)
+            model = NumpyModel.loadModel(path)
+        self.assertEqual(model.activations, ['relu', 'relu', 'linear'])
+        np.testing.assert_array_equal(model.predict(batch[0]), learner.getModel().predict(batch[0]))
+
+    def testRun(self):
+        for startMethod in (None, 'spawn'):
+            pipeline = ActorLearner.ActorLearner(actors=2, seeds=(2, 5), seed=4, startMethod=startMethod)
+            stats = pipeline.run(steps=2000)
+            self.assertGreaterEqual(stats['steps'], 2000)
+            self.assertLessEqual(stats['updates'], stats['steps'] // ActorLearner.NUM_STEPS_FOR_UPDATE)
+            self.assertGreater(stats['updates'], 2000 // ActorLearner.NUM_STEPS_FOR_UPDATE - 50)
+            self.assertGreater(stats['broadcasts'], 0)
+            self.assertGreater(stats['stepsPerSecond'], 0.0)
+            self.assertEqual(pipeline.getLearner().getUpdates(), stats['updates'])
+
+    def testDeadline(self):
+        pipeline = ActorLearner.ActorLearner(actors=2, seeds=(2, 5), seed=4, ringCapacity=8192)
+        stats = pipeline.run(seconds=1.0)
+        self.assertLess(stats['seconds'], 1.2)
+        self.assertGreater(stats['steps'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
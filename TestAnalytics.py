@@ -0,0 +1,93 @@
+import unittest
+import logging
+import os
+import tempfile
+import Analytics
+import ArrayStore
+import Car
+import Canvas
+import Heuristic
+import RobotCarSimulator
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+
+
+def simulator(seed):
+    return RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING),
+                                              Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                              logLevel=logging.WARNING)
+
+
+class TestAnalytics(unittest.TestCase):
+    def testMetrics(self):
+        heuristic = simulator(5)
+        Heuristic.HeuristicLineTracker(heuristic, 20.0, logging.WARNING).run()
+        random = simulator(9)
+        rng = np.random.default_rng(1)
+        while not random.isTerminated() and random.getDuration() < 8.0:
+            [random.driveForward, random.turnLeft, random.turnRight][rng.integers(3)](100, 100)
+        sims = [random, heuristic, random]
+        runs = [('run{}'.format(i), sim.getTrajectory().getArrays(), {'seed': sim._canvas.getSeed()})
+                for i, sim in enumerate(sims)]
+        table = Analytics.analyzeRuns(runs)
+        self.assertEqual(tuple(table), Analytics.COLUMNS)
+        self.assertEqual(table['run'].tolist(), ['run0', 'run1', 'run2'])
+        np.testing.assert_array_equal(table['seed'], [9, 5, 9])
+        for i, sim in enumerate(sims):
+            arrays = sim.getTrajectory().getArrays()
+            self.assertEqual(table['steps'][i], len(arrays['actions']) - 1)
+            self.assertAlmostEqual(table['duration'][i], sim.getDuration())
+            self.assertAlmostEqual(table['totalReward'][i], sim.getTotalReward())
+            self.assertEqual(table['terminated'][i], sim.isTerminated())
+            followsLine = (arrays['flags'] & 1).astype(bool)
+            self.assertAlmostEqual(table['followsLine'][i], followsLine.mean())
+            self.assertEqual(table['lineLosses'][i], int((followsLine[:-1] & ~followsLine[1:]).sum()))
+            turns = [action for action in arrays['actions'].tolist() if action in (1, 2)]
+            self.assertEqual(table['oscillations'][i], sum(a != b for a, b in zip(turns, turns[1:])))
+            # the track metrics of the middle sensor
+            line = LineString(sim._canvas.getCenterLine())
+            angles = np.radians(arrays['angles'])
+            sensors = shapely.points(arrays['x'] + 97.5 * np.cos(angles), arrays['y'] + 97.5 * np.sin(angles))
+            distances = shapely.distance(line, sensors)
+            self.assertAlmostEqual(table['crossTrackMax'][i], distances.max(), places=9)
+            self.assertAlmostEqual(table['crossTrackMean'][i], distances.mean(), places=9)
+            self.assertAlmostEqual(table['completion'][i],
+                                   100 * shapely.line_locate_point(line, sensors).max() / line.length, places=9)
+        self.assertAlmostEqual(table['completion'][1], 100.0)
+        self.assertGreater(table['timeToFinish'][1], 0.0)
+        self.assertLessEqual(table['timeToFinish'][1], table['duration'][1])
+        self.assertTrue(np.isnan(table['timeToFinish'][0]))
+        self.assertGreater(table['oscillations'][0], table['oscillations'][1])
+
+    def testFiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sim = simulator(5)
+            Heuristic.HeuristicLineTracker(sim, 20.0, logging.WARNING).run()
+            path = os.path.join(directory, 'heuristic_seed_5.traj')
+            sim.saveTrajectory(path)
+            table = Analytics.analyzeFiles([path, 'data/heuristic_seed_5.txt'])
+            self.assertEqual(table['run'].tolist(), ['heuristic_seed_5', 'heuristic_seed_5'])
+            # text logs have no rewards and flags
+            self.assertTrue(np.isnan(table['totalReward'][1]))
+            self.assertEqual(table['followsLine'][1], 1.0)
+            self.assertTrue(table['terminated'][1])
+            self.assertAlmostEqual(table['completion'][1], 100.0)
+            Analytics.saveTable(os.path.join(directory, 'table.csv'), table)
+            with open(os.path.join(directory, 'table.csv')) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0], ','.join(Analytics.COLUMNS))
+            self.assertEqual(len(lines), 3)
+            Analytics.saveTable(os.path.join(directory, 'table.arrays'), table)
+            arrays, metadata = ArrayStore.loadArrays(os.path.join(directory, 'table.arrays'), mmap=False)
+            self.assertEqual(metadata['columns'], list(Analytics.COLUMNS))
+            np.testing.assert_array_equal(arrays['crossTrackRms'], table['crossTrackRms'])
+            np.testing.assert_array_equal(arrays['run'], table['run'])
+            # neither metadata nor file name contain the seed
+            sim.getTrajectory().save(os.path.join(directory, 'run.traj'))
+            with self.assertRaises(ValueError):
+                Analytics.loadRun(os.path.join(directory, 'run.traj'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import logging
+import Car
+import Canvas
+import RobotCarSimulator
+import BatchSimulator
+import numpy as np
+
+
+class TestBatchSimulator(unittest.TestCase):
+    def testInitialState(self):
+        canvases = [Canvas.CanvasModel(seed=seed) for seed in (5, 9)]
+        batch = BatchSimulator.BatchSimulatorControl(canvases)
+        self.assertEqual(len(batch), 2)
+        for i, canvas in enumerate(canvases):
+            sim = RobotCarSimulator.SimulatorControl(
+                canvas, Car.CarModel(), createGif=False)
+            np.testing.assert_array_equal(batch.getStates()[i], list(
+                sim.getPreviousLineTrackingSensorValues()) + sim.getLineTrackingSensorValues())
+            self.assertEqual(batch.getDurations()[i], sim.getDuration())
+            self.assertEqual(batch.getRewards()[i], sim.getReward())
+
+    def testStepMatchesSimulatorControl(self):
+        canvases = [Canvas.CanvasModel(seed=seed) for seed in (2, 5, 5, 9)]
+        batch = BatchSimulator.BatchSimulatorControl(canvases)
+        sims = [RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(), createGif=False)
+                for canvas in canvases]
+        rng = np.random.default_rng(7)
+        for step in range(80):
+            actions = rng.integers(0, 3, len(canvases))
+            states, rewards, dones = batch.step(actions)
+            for i, sim in enumerate(sims):
+                if actions[i] == BatchSimulator.DRIVE_FORWARD:
+                    sim.driveForward(100, 150)
+                elif actions[i] == BatchSimulator.TURN_LEFT:
+                    sim.turnLeft(100, 50)
+                else:
+                    sim.turnRight(100, 50)
+                np.testing.assert_array_equal(states[i], list(
+                    sim.getPreviousLineTrackingSensorValues()) + sim.getLineTrackingSensorValues())
+                self.assertEqual(rewards[i], sim.getReward())
+                self.assertEqual(dones[i], sim.isTerminated())
+                self.assertEqual(
+                    batch.carFollowsLine()[i], sim.carFollowsLine())
+                self.assertEqual(batch.getDurations()[i], sim.getDuration())
+                np.testing.assert_array_equal(
+                    batch.getPositions()[i], sim._car._position)
+
+    def testLeavingTheCanvasTerminates(self):
+        batch = BatchSimulator.BatchSimulatorControl(
+            [Canvas.CanvasModel(seed=5)], logLevel=logging.DEBUG)
+        batch.step([BatchSimulator.TURN_LEFT], durations=[1305])
+        dones = batch.isTerminated()
+        while not dones[0]:
+            _, _, dones = batch.step([BatchSimulator.DRIVE_FORWARD])
+        self.assertTrue(batch.isTerminated()[0])
+        batch.reset()
+        self.assertFalse(batch.isTerminated()[0])
+        np.testing.assert_array_equal(batch.getPositions()[
+                                      0], Canvas.CanvasModel(seed=5).getCurveStartingPoint())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+import Benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def testRunAndCompare(self):
+        results = Benchmark.run(['isAtLeastOneCarSensorWithinBounds', 'CanvasModel', 'step'], seeds=(2,))
+        self.assertEqual(list(results['benchmarks']), [
+                         'isAtLeastOneCarSensorWithinBounds', 'CanvasModel', 'step'])
+        step = results['benchmarks']['step']
+        self.assertGreater(step['operations'], 10)
+        self.assertGreater(step['operationsPerSecond'], 0.0)
+        self.assertGreater(step['peakMemory'], 0)
+        self.assertLessEqual(step['p50'], step['p99'])
+        self.assertEqual(results['benchmarks']['CanvasModel']['operations'], 1)
+        self.assertEqual(Benchmark.compare(results, results), [])
+        baseline = {'benchmarks': {'step': dict(step, operationsPerSecond=step['operationsPerSecond'] * 1.5),
+                                   'removed': dict(step)}}
+        self.assertEqual([name for name, before, after, change in Benchmark.compare(results, baseline)],
+                         ['step'])
+        self.assertEqual(Benchmark.compare(results, baseline, thresholds={'step': 0.5}), [])
+        self.assertIn('step', Benchmark.formatResults(results, baseline))
+
+
+if __name__ == '__main__':
+    unittest.main()
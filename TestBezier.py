@@ -0,0 +1,67 @@
+import unittest
+import logging
+import Bezier
+import Canvas
+import numpy as np
+from shapely.geometry import LineString
+
+CONTROL_POINTS = [(100, 700), (400, 150), (900, 1200), (1600, 400)]
+
+
+class TestBezier(unittest.TestCase):
+    def testEvaluate(self):
+        ts = Bezier.parameters(21)
+        self.assertEqual(ts.tolist(), [t/20.0 for t in range(21)])
+        self.assertEqual(Bezier.binomials(6).tolist(), [1, 6, 15, 20, 15, 6, 1])
+        points = Bezier.evaluate(CONTROL_POINTS, ts)
+        self.assertEqual(points.shape, (21, 2))
+        np.testing.assert_array_equal(points[0], CONTROL_POINTS[0])
+        np.testing.assert_array_equal(points[-1], CONTROL_POINTS[-1])
+        # de Casteljau
+        t = ts[7]
+        xys = np.array(CONTROL_POINTS, dtype=np.float64)
+        while len(xys) > 1:
+            xys = (1 - t) * xys[:-1] + t * xys[1:]
+        np.testing.assert_allclose(points[7], xys[0], rtol=1e-12)
+        np.testing.assert_allclose(Canvas.make_bezier(CONTROL_POINTS)([t]), [points[7]], rtol=1e-12)
+        h = 1e-6
+        np.testing.assert_allclose(Bezier.derivative(CONTROL_POINTS, [0.3]),
+                                   (Bezier.evaluate(CONTROL_POINTS, [0.3 + h]) -
+                                    Bezier.evaluate(CONTROL_POINTS, [0.3 - h])) / (2 * h), rtol=1e-6)
+
+    def testArcLengthTable(self):
+        line = Bezier.ArcLengthTable([(0, 0), (30, 0), (100, 0)], 101)
+        self.assertAlmostEqual(line.getLength(), 100.0)
+        point, tangent = line.pointAndTangentAt(25.0)
+        np.testing.assert_allclose(point, (25.0, 0.0))
+        np.testing.assert_allclose(tangent, (1.0, 0.0))
+        points = line.pointAt([-5.0, 0.0, 50.0, 100.0, 120.0])
+        np.testing.assert_allclose(points[:, 0], [0.0, 0.0, 50.0, 100.0, 100.0])
+        self.assertEqual(line.tangentAt(np.zeros(3)).shape, (3, 2))
+        # the length converges to the length of the curve
+        coarse = Bezier.ArcLengthTable(CONTROL_POINTS, 21).getLength()
+        fine = Bezier.ArcLengthTable(CONTROL_POINTS, 4096).getLength()
+        finer = Bezier.ArcLengthTable(CONTROL_POINTS, 16384).getLength()
+        self.assertLess(coarse, fine)
+        self.assertAlmostEqual(fine, finer, places=2)
+        table = Bezier.ArcLengthTable(CONTROL_POINTS, 4096)
+        t = table.parameterAt(1000.0)
+        np.testing.assert_allclose(table.pointAt(1000.0), Bezier.evaluate(CONTROL_POINTS, [t])[0], atol=1e-3)
+
+    def testCanvas(self):
+        canvas = Canvas.CanvasModel(seed=5, logLevel=logging.WARNING)
+        table = canvas.getArcLengthTable()
+        self.assertIs(table, canvas.getArcLengthTable())
+        np.testing.assert_array_equal(table.pointAt(0.0), canvas.getCurveStartingPoint())
+        center = LineString(Bezier.evaluate(canvas.getBezierPoints(), Bezier.parameters(21)))
+        sensor = center.interpolate(100)
+        start = canvas.getCurveStartingPoint()
+        self.assertAlmostEqual(canvas.getCurveStartingOrientation(),
+                               np.degrees(np.arctan((sensor.y - start[1]) / (sensor.x - start[0]))), places=9)
+        fine = Canvas.CanvasModel(seed=5, logLevel=logging.WARNING, curveSamples=201)
+        self.assertGreater(len(fine.getCurveBoundingPoints()), len(canvas.getCurveBoundingPoints()))
+        self.assertAlmostEqual(fine.getCurveStartingOrientation(), canvas.getCurveStartingOrientation(), delta=5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
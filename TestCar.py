@@ -1,6 +1,7 @@
 import unittest
 import logging
 import Car
+import Canvas
 import numpy as np
 
 
@@ -58,6 +59,53 @@ class TestCar(unittest.TestCase):
         np.testing.assert_almost_equal(car._rotation, 90.0)
         np.testing.assert_almost_equal(car._position, (10.0, 20.0))
 
+    def testCachedCanvasGeometry(self):
+        canvas = Canvas.CanvasModel(seed=9)
+        self.assertIs(canvas.getCurvePolygon(), canvas.getCurvePolygon())
+        car = Car.CarModel()
+        rng = np.random.default_rng(9)
+        for i in range(200):
+            car.setPosition((rng.uniform(0, 1700), rng.uniform(0, 1400)))
+            car.setOrientation(rng.uniform(-180, 180))
+            self.assertEqual(car.computeSensorValues(canvas.getCurvePolygon()),
+                             car.computeSensorValues(canvas.getCurveBoundingPoints()))
+            self.assertEqual(car.followsLine(canvas.getCurvePolygon()),
+                             car.followsLine(canvas.getCurveBoundingPoints()))
+            self.assertEqual(car.isAtLeastOneCarSensorWithinBounds(canvas.getCanvasRectangle()),
+                             car.isAtLeastOneCarSensorWithinBounds(canvas.getCanvasBoundingPoints()))
+
+    def testCachedVertices(self):
+        car = Car.CarModel()
+        rng = np.random.default_rng(19)
+        changes = (lambda: car.setPosition((rng.uniform(0, 1700), rng.uniform(0, 1400))),
+                   lambda: car.setOrientation(rng.uniform(-180, 180)), lambda: car.setScale(rng.uniform(0.5, 2.0)),
+                   lambda: car.moveForward(rng.uniform(0, 30)), lambda: car.rotate(rng.uniform(-30, 30)))
+        for i in range(100):
+            changes[i % len(changes)]()
+            for shape in Car.SHAPES:
+                # the cached vertices are bit identical to the transform of the single points
+                self.assertEqual(car.rotateAndTranslateAndScalePoints(shape),
+                                 tuple(car.scalePoint(car.translatePoint(car.rotatePoint(p))) for p in shape))
+                self.assertEqual(car._transformPoints(shape), car.rotateAndTranslateAndScalePoints(shape))
+        np.testing.assert_array_equal(car.getSensorVertices(),
+                                      [car.rotateAndTranslateAndScalePoints(s) for s in car.sensors])
+        # other points are transformed one by one
+        self.assertEqual(car.rotateAndTranslateAndScalePoints(((0, 0),)), (car.scalePoint(car._position),))
+
+    def testPolygonOverlapsRectangle(self):
+        rectangle = (0, 0, 10, 10)
+        inside = ((2, 2), (4, 2), (4, 4), (2, 4), (2, 2))
+        touching = ((10, 2), (12, 2), (12, 4), (10, 4), (10, 2))
+        # the bounding box overlaps the rectangle's corner but the diamond does not
+        corner = ((11, 9), (13, 11), (11, 13), (9, 11), (11, 9))
+        crossing = ((9, 9), (11, 11), (9, 13), (7, 11), (9, 9))
+        expected = (True, False, False, True)
+        for polygon, overlaps in zip((inside, touching, corner, crossing), expected):
+            self.assertEqual(Car.polygonOverlapsRectangle(
+                polygon, rectangle), overlaps)
+        np.testing.assert_array_equal(Car.polygonsOverlapRectangles(np.array((inside, touching, corner, crossing), dtype=np.float64),
+                                                                    np.array(rectangle, dtype=np.float64)), expected)
+
 
 if __name__ == '__main__':
     unittest.main()
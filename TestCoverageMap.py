@@ -0,0 +1,66 @@
+import unittest
+import Car
+import Canvas
+import RobotCarSimulator
+import CoverageMap
+import numpy as np
+from shapely.geometry import Polygon
+
+
+class TestCoverageMap(unittest.TestCase):
+    def testRectangleAreas(self):
+        square = ((10, 10), (30, 10), (30, 20), (10, 20), (10, 10))
+        coverage = CoverageMap.CoverageMap(square, resolution=0.5)
+        areas = coverage.rectangleAreas(np.array([0.0, 10.0, 20.0, 25.25]), np.array([0.0, 10.0, 15.0, 12.5]),
+                                        np.array([40.0, 30.0, 35.0, 29.75]), np.array([40.0, 20.0, 25.0, 18.0]))
+        np.testing.assert_almost_equal(areas, (200.0, 200.0, 50.0, 4.5*5.5))
+
+    def testPolygonAreas(self):
+        square = ((10, 10), (30, 10), (30, 20), (10, 20), (10, 10))
+        coverage = CoverageMap.CoverageMap(square, resolution=0.5)
+        inside = ((15, 12), (20, 12), (20, 17), (15, 17), (15, 12))
+        outside = ((35, 12), (40, 12), (40, 17), (35, 17), (35, 12))
+        diamond = ((30, 12), (33, 15), (30, 18), (27, 15), (30, 12))
+        np.testing.assert_almost_equal(coverage.polygonAreas(
+            np.array([inside, outside, diamond])), (25.0, 0.0, 9.0))
+
+    def testSensorErrorBound(self):
+        """ sensors straddling the curve border stay within the documented error bound """
+        car = Car.CarModel()
+        for resolution in (0.25, 0.5, 1.0):
+            for seed in (2, 5, 9, 11, 13, 15, 17, 19, 21):
+                canvas = Canvas.CanvasModel(seed=seed)
+                coverage = canvas.getCoverageMap(resolution)
+                curve = Polygon(canvas.getCurveBoundingPoints())
+                rng = np.random.default_rng(seed)
+                for i in range(100):
+                    border = curve.exterior.interpolate(
+                        rng.uniform(0, curve.exterior.length))
+                    car.setOrientation(rng.uniform(-180, 180))
+                    offset = car.rotatePoint((97.5, 0))
+                    car.setPosition((border.x - offset[0] + rng.uniform(-4, 4),
+                                     border.y - offset[1] + rng.uniform(-4, 4)))
+                    exact = car.computeSensorValues(
+                        canvas.getCurveBoundingPoints())
+                    raster = car.computeSensorValuesRaster(coverage)
+                    np.testing.assert_allclose(
+                        raster, exact, rtol=0, atol=40*resolution)
+
+    def testSimulatorSensorMode(self):
+        canvas = Canvas.CanvasModel(seed=5)
+        exact = RobotCarSimulator.SimulatorControl(
+            canvas, Car.CarModel(), createGif=False)
+        raster = RobotCarSimulator.SimulatorControl(
+            canvas, Car.CarModel(), createGif=False, sensorMode=CoverageMap.SENSOR_MODE_RASTER)
+        for i in range(10):
+            exact.driveForward(100, 150)
+            raster.driveForward(100, 150)
+            np.testing.assert_allclose(raster.getLineTrackingSensorValues(
+            ), exact.getLineTrackingSensorValues(), atol=20)
+        with self.assertRaises(ValueError):
+            RobotCarSimulator.SimulatorControl(
+                canvas, Car.CarModel(), createGif=False, sensorMode='fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import logging
+import BatchSimulator
+import Car
+import Canvas
+import DistanceField
+import RobotCarSimulator
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+from rewardFunctions import simpleReward, trackReward, CROSS_TRACK_PENALTY
+
+
+class TestDistanceField(unittest.TestCase):
+    def testStraightLine(self):
+        field = DistanceField.DistanceField([(0, 0), (50, 0), (100, 0)], (-50, -50, 150, 50), 5.0)
+        self.assertEqual(field.getLength(), 100.0)
+        # y points down on the image, so the left side has smaller y
+        self.assertEqual(field.trackPosition(60.0, -10.0), (10.0, 60.0))
+        self.assertEqual(field.trackPosition(20.0, 3.0), (-3.0, 20.0))
+        self.assertEqual(field.trackPosition(130.0, 0.0), (30.0, 100.0))
+        crossTrack, progress = field.trackPositions([60.0, 20.0, -20.0], [-10.0, 3.0, 0.0])
+        np.testing.assert_array_equal(crossTrack, [10.0, -3.0, 20.0])
+        np.testing.assert_array_equal(progress, [60.0, 20.0, 0.0])
+
+    def testCanvas(self):
+        canvas = Canvas.CanvasModel(seed=5, logLevel=logging.WARNING)
+        field = canvas.getDistanceField()
+        self.assertIs(field, canvas.getDistanceField())
+        self.assertEqual(field.trackPosition(*canvas.getCurveStartingPoint()), (0.0, 0.0))
+        line = LineString(canvas.getCenterLine())
+        self.assertAlmostEqual(field.getLength(), line.length, places=9)
+        rng = np.random.default_rng(4)
+        s = rng.uniform(0.0, line.length, 2000)
+        points = shapely.line_interpolate_point(line, s)
+        x = shapely.get_x(points) + rng.normal(0.0, 30.0, len(s))
+        y = shapely.get_y(points) + rng.normal(0.0, 30.0, len(s))
+        crossTrack, progress = field.trackPositions(x, y)
+        queries = shapely.points(x, y)
+        np.testing.assert_allclose(np.abs(crossTrack), shapely.distance(line, queries), atol=1e-9)
+        np.testing.assert_allclose(progress, shapely.line_locate_point(line, queries), atol=1e-9)
+        for i in range(0, 2000, 50):
+            np.testing.assert_allclose(field.trackPosition(x[i], y[i]), (crossTrack[i], progress[i]), atol=1e-12)
+        # far away from the line the distance is at most resolution * sqrt(2) too large
+        x = rng.uniform(0.0, 1700.0, 5000)
+        y = rng.uniform(0.0, 1400.0, 5000)
+        error = np.abs(field.trackPositions(x, y)[0]) - shapely.distance(line, shapely.points(x, y))
+        self.assertGreaterEqual(error.min(), -1e-9)
+        self.assertLessEqual(error.max(), field.getResolution() * np.sqrt(2))
+        # projecting onto all segments is exact everywhere
+        crossTrack, progress = field.exactTrackPositions(x, y)
+        queries = shapely.points(x, y)
+        np.testing.assert_allclose(np.abs(crossTrack), shapely.distance(line, queries), atol=1e-9)
+        np.testing.assert_allclose(progress, shapely.line_locate_point(line, queries), atol=1e-9)
+
+    def testTrackReward(self):
+        canvases = [Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING) for seed in (2, 9)]
+        batch = BatchSimulator.BatchSimulatorControl(canvases, rewardFunction=trackReward, sensorMode='raster',
+                                                     logLevel=logging.WARNING)
+        sims = [RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                   rewardFunction=trackReward, sensorMode='raster',
+                                                   logLevel=logging.WARNING) for canvas in canvases]
+        rng = np.random.default_rng(3)
+        for step in range(60):
+            actions = rng.integers(0, 3, len(canvases))
+            batch.step(actions)
+            crossTrack, progress = batch.getTrackPositions()
+            for i, sim in enumerate(sims):
+                (sim.driveForward, sim.turnLeft, sim.turnRight)[actions[i]](
+                    100, BatchSimulator.ACTION_DURATIONS[actions[i]])
+                self.assertEqual(batch.carFollowsLine()[i], sim.carFollowsLine())
+                np.testing.assert_allclose(sim.getTrackPosition(), (crossTrack[i], progress[i]), atol=1e-9)
+                self.assertAlmostEqual(batch.getRewards()[i], sim.getReward(), places=6)
+                if sim.getReward() != 0.0 and not sim.isTerminated():
+                    expected = simpleReward(sim.getLineTrackingSensorValues(), sim._car._position,
+                                            sim._car._rotation, sim.carFollowsLine(), False)
+                    self.assertAlmostEqual(sim.getReward(), expected - CROSS_TRACK_PENALTY *
+                                           min(abs(sim.getTrackPosition()[0]), 100.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import logging
+import random
+import Car
+import Canvas
+import Environment
+import RobotCarSimulator
+import numpy as np
+
+
+class TestEnvironment(unittest.TestCase):
+    def testSameAsNewSimulator(self):
+        env = Environment.CarEnvironment()
+        rng = random.Random(3)
+        for seed in (5, 9, 5):
+            observation = env.reset(seed)
+            sim = RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(
+                seed=seed), Car.CarModel(), createGif=False)
+            actions = (lambda: sim.driveForward(100, 150),
+                       lambda: sim.turnLeft(100, 50), lambda: sim.turnRight(100, 50))
+            self.assertEqual(observation.tolist(), list(
+                sim.getPreviousLineTrackingSensorValues()) + sim.getLineTrackingSensorValues())
+            for i in range(60):
+                action = rng.randrange(3)
+                actions[action]()
+                state, reward, done, duration = env.step(action)
+                self.assertIs(state, observation)
+                self.assertEqual(state.tolist(), list(
+                    sim.getPreviousLineTrackingSensorValues()) + sim.getLineTrackingSensorValues())
+                self.assertEqual((reward, done, duration),
+                                 (sim.getReward(), sim.isTerminated(), sim.getDuration()))
+                if done:
+                    break
+            self.assertEqual(env.getSimulator()._actionLog, sim._actionLog)
+        self.assertEqual(env.getStateSize(), 9)
+
+    def testSnapshotRestoreFork(self):
+        sim = RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(seed=9, logLevel=logging.WARNING),
+                                                 Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                 logLevel=logging.WARNING, instrumentation=True)
+
+        def drive(sim, actions):
+            steps = (sim.driveForward, sim.turnLeft, sim.turnRight)
+            durations = (150, 50, 50)
+            result = []
+            for action in actions:
+                steps[action](100, durations[action])
+                result.append((sim.getObservation().tolist(), sim.getReward(), sim.getTotalReward(),
+                               sim.isTerminated(), sim.getDuration(), sim._car._position, sim._car._rotation))
+            return result
+        drive(sim, [0, 0, 1, 0, 2, 0])
+        state = sim.snapshot()
+        rng = random.Random(5)
+        actions = [rng.randrange(3) for i in range(40)]
+        expected = drive(sim, actions)
+        for i in range(3):
+            observation = sim.restore(state)
+            self.assertEqual(len(sim.getTrajectory()), 7)
+            self.assertEqual(observation.tolist(), state.observation.tolist())
+            self.assertEqual(drive(sim, actions), expected)
+        sim.restore(state)
+        fork = sim.fork()
+        self.assertEqual(drive(fork, actions), expected)
+        # the fork has its own car and visited poses, the original continues unchanged
+        self.assertEqual(drive(sim, actions), expected)
+        self.assertEqual(len(fork.getTrajectory()), len(actions))
+        self.assertEqual(sim.getStats()['logCar']['count'], 7 + 6 * len(actions))
+
+    def testLoggerConfiguredOnce(self):
+        for i in range(3):
+            Car.CarModel(logLevel=logging.WARNING)
+        handlers = logging.getLogger('Car').handlers
+        self.assertEqual(len(handlers), 1)
+        handler = handlers[0]
+        Car.CarModel(logLevel=logging.WARNING)
+        self.assertIs(logging.getLogger('Car').handlers[0], handler)
+        Car.CarModel(logLevel=logging.INFO)
+        self.assertEqual(logging.getLogger('Car').handlers[0].level, logging.INFO)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import os
+import tempfile
+import Car
+import Canvas
+import FrameRecorder
+import numpy as np
+from PIL import Image, ImageFont, ImageSequence
+
+
+class TestFrameRecorder(unittest.TestCase):
+    def testFramesMatchFullRedraw(self):
+        canvas = Canvas.CanvasModel(seed=5)
+        font = ImageFont.load_default()
+        car = Car.CarModel()
+        car.setPosition(canvas.getCurveStartingPoint())
+        recorder = FrameRecorder.FrameRecorder(canvas, palette=False)
+        expected = []
+        for i in range(4):
+            car.rotate(10.0)
+            car.moveForward(40.0)
+            text = 'Step: {}'.format(i)
+            recorder.addFrame(car, text, font, 150)
+            (img, draw) = canvas.createImageAndDraw()
+            car.draw(draw)
+            draw.text(FrameRecorder.TEXT_POSITION, text,
+                      font=font, fill=FrameRecorder.TEXT_COLOR)
+            expected.append(np.array(img))
+        self.assertEqual(len(recorder), 4)
+        self.assertEqual(recorder.getDurations(), [150]*4)
+        for i, frame in enumerate(recorder.frames()):
+            np.testing.assert_array_equal(np.array(frame), expected[i])
+
+    def testPaletteFrames(self):
+        canvas = Canvas.CanvasModel(seed=9)
+        car = Car.CarModel()
+        car.setPosition(canvas.getCurveStartingPoint())
+        recorder = FrameRecorder.FrameRecorder(canvas, palette=True)
+        for i in range(3):
+            car.moveForward(30.0)
+            recorder.addFrame(car, 'Step: {}'.format(
+                i), ImageFont.load_default(), 100)
+        frame = recorder.getFrame(2)
+        self.assertEqual(frame.mode, 'P')
+        self.assertEqual(frame.size, canvas.getBackgroundImage().size)
+        # the car and the text patches are a small fraction of a full RGB frame
+        self.assertLess(recorder.nbytes() / len(recorder),
+                        frame.width * frame.height * 3 / 20)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'frames.gif')
+            recorder.save(path)
+            with Image.open(path) as gif:
+                self.assertEqual(gif.n_frames, 3)
+                for i, saved in enumerate(ImageSequence.Iterator(gif)):
+                    np.testing.assert_array_equal(np.array(saved.convert('RGB')),
+                                                  np.array(recorder.getFrame(i).convert('RGB')))
+
+
+if __name__ == '__main__':
+    unittest.main()
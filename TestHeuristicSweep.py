@@ -0,0 +1,55 @@
+import unittest
+import os
+import tempfile
+import Heuristic
+import HeuristicSweep
+import Runner
+
+
+class TestHeuristicSweep(unittest.TestCase):
+    def testConfigurations(self):
+        grid = HeuristicSweep.gridConfigurations({'thresholdFactor': [0.5, 0.75], 'turnDuration': [30, 50, 70]})
+        self.assertEqual(len(grid), 6)
+        self.assertIn({'thresholdFactor': 0.75, 'turnDuration': 70}, grid)
+        configurations = HeuristicSweep.randomConfigurations(20, seed=3)
+        self.assertEqual(configurations, HeuristicSweep.randomConfigurations(20, seed=3))
+        for configuration in configurations:
+            self.assertEqual(set(configuration), set(Heuristic.PARAMETERS))
+            for name, (low, high) in HeuristicSweep.SPACE.items():
+                self.assertTrue(low <= configuration[name] <= high)
+            self.assertIsInstance(configuration['turnDuration'], int)
+        with self.assertRaises(ValueError):
+            Heuristic.HeuristicLineTracker(None, turnSpeed=100)
+
+    def testSweep(self):
+        # the last two are duplicates of the first two
+        configurations = [{}, {'thresholdFactor': 0.25}, {'thresholdFactor': 1.25, 'forwardDuration': 200},
+                          dict(Heuristic.PARAMETERS), {'thresholdFactor': 0.25}]
+        seeds = [2, 5, 9]
+        with tempfile.TemporaryDirectory() as directory:
+            cache = os.path.join(directory, 'sweep.jsonl')
+            ranking = HeuristicSweep.sweep(configurations, seeds, cache, workers=2, eta=3, minSeeds=1,
+                                           maxDuration=8.0)
+            with open(cache) as f:
+                lines = f.readlines()
+            # 3 configurations on seed 2, the best on seeds 5 and 9
+            self.assertEqual(len(lines), 5)
+            self.assertEqual([entry['seeds'] for entry in ranking], [3, 1, 1])
+            self.assertGreaterEqual(ranking[1]['score'], ranking[2]['score'])
+            again = HeuristicSweep.sweep(configurations, seeds, cache, workers=2, eta=3, minSeeds=1,
+                                         maxDuration=8.0)
+            with open(cache) as f:
+                self.assertEqual(len(f.readlines()), 5)
+            self.assertEqual(again, ranking)
+            results = HeuristicSweep.ResultCache(cache)
+        self.assertEqual(len(results), 5)
+        # the defaults are the parameters of the unchanged heuristic
+        expected = Runner.runEpisode(2, maxDuration=8.0)
+        for arguments in ({'seeds': []}, {'seeds': seeds, 'minSeeds': 0}, {'seeds': seeds, 'eta': 1}):
+            with self.assertRaises(ValueError):
+                HeuristicSweep.sweep(configurations, **arguments)
+        self.assertEqual(dict(results.get(dict(Heuristic.PARAMETERS), 2, 8.0), seconds=0), dict(expected, seconds=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
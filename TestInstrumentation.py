@@ -0,0 +1,61 @@
+import unittest
+import json
+import os
+import tempfile
+import Car
+import Canvas
+import Instrumentation
+import RobotCarSimulator
+
+
+class TestInstrumentation(unittest.TestCase):
+    def testSimulatorStats(self):
+        canvas = Canvas.CanvasModel(seed=5)
+        sim = RobotCarSimulator.SimulatorControl(
+            canvas, Car.CarModel(), createGif=False)
+        self.assertEqual(sim.getStats(), {})
+        self.assertIsNone(sim.getInstrumentation())
+        instrumentation = Instrumentation.Instrumentation()
+        for i in range(2):
+            sim = RobotCarSimulator.SimulatorControl(
+                canvas, Car.CarModel(), createGif=False, instrumentation=instrumentation)
+            for j in range(10):
+                sim.driveForward(100, 150)
+        stats = sim.getStats()
+        # the init step and 10 actions per simulator
+        for phase in ('logCar', 'sensors', 'followsLine', 'bounds'):
+            self.assertEqual(stats[phase]['count'], 22)
+        self.assertLessEqual(stats['reward']['count'], 22)
+        self.assertNotIn('gif', stats)
+        logCar = stats['logCar']
+        self.assertGreater(logCar['total'], 0.0)
+        self.assertLessEqual(logCar['p50'], logCar['p99'])
+        self.assertLessEqual(logCar['p99'], logCar['max'])
+        self.assertGreaterEqual(logCar['mean'], stats['sensors']['mean'])
+
+    def testPhaseTimer(self):
+        timer = Instrumentation.PhaseTimer(samples=4)
+        for nanoseconds in (1000, 9000, 3000, 4000, 5000, 6000):
+            timer.add(nanoseconds)
+        stats = timer.getStats()
+        self.assertEqual(stats['count'], 6)
+        self.assertAlmostEqual(stats['total'], 28e-6)
+        self.assertAlmostEqual(stats['mean'], 28 / 6)
+        # only the last 4 latencies are kept for the percentiles, the maximum is the one of all calls
+        self.assertAlmostEqual(stats['p50'], 4.5)
+        self.assertEqual(stats['max'], 9.0)
+
+    def testDump(self):
+        instrumentation = Instrumentation.Instrumentation()
+        square = instrumentation.wrap('square', lambda x: x*x)
+        self.assertEqual(square(3), 9)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stats.json')
+            instrumentation._dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['square']['count'], 1)
+        self.assertIn('square', instrumentation.format())
+
+
+if __name__ == '__main__':
+    unittest.main()
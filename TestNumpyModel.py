@@ -0,0 +1,48 @@
+import unittest
+import importlib.util
+import Car
+import Canvas
+import NumpyModel
+import RobotCarSimulator
+import numpy as np
+
+MODEL_FILE = 'curve_tracking_model.h5'
+
+
+class TestNumpyModel(unittest.TestCase):
+    def setUp(self):
+        self._model = NumpyModel.loadModel(MODEL_FILE)
+        self._states = np.random.default_rng(3).uniform(30.0, 900.0, (500, 9))
+
+    def testPredict(self):
+        self.assertEqual(self._model.input_shape, (None, 9))
+        self.assertEqual(self._model.output_shape, (None, 3))
+        q = self._model.predict(self._states)
+        self.assertEqual(q.shape, (500, 3))
+        np.testing.assert_allclose(self._model.predict(
+            self._states[7]), q[7], rtol=1e-5)
+        self.assertEqual(self._model.getActions(self._states).tolist(),
+                         [self._model.getAction(state) for state in self._states])
+
+    @unittest.skipUnless(importlib.util.find_spec('tensorflow'), 'tensorflow is not installed')
+    def testSameAsKeras(self):
+        import tensorflow as tf
+        keras = tf.keras.models.load_model(MODEL_FILE, compile=False)
+        states = self._states.reshape(
+            (-1,) + (1,) * (len(keras.input_shape) - 2) + (9,))
+        q = keras(states).numpy().reshape(-1, 3)
+        np.testing.assert_allclose(
+            self._model.predict(self._states), q, rtol=1e-5, atol=1e-3)
+        self.assertEqual(self._model.getActions(
+            self._states).tolist(), q.argmax(axis=1).tolist())
+
+    def testRunModel(self):
+        sim = RobotCarSimulator.SimulatorControl(
+            Canvas.CanvasModel(seed=5), Car.CarModel(), createGif=False)
+        RobotCarSimulator.runModel(sim, self._model, maxDuration=5.0)
+        self.assertTrue(sim.isTerminated() or sim.getDuration() >= 5.0)
+        self.assertGreater(sim.getMaxX(), 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
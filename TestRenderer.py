@@ -0,0 +1,45 @@
+import unittest
+import io
+import logging
+import os
+import tempfile
+import Car
+import Canvas
+import Renderer
+import RobotCarSimulator
+import Trajectory
+import numpy as np
+from PIL import Image, ImageSequence
+
+
+class TestRenderer(unittest.TestCase):
+    def testSameFramesAsSimulator(self):
+        canvas = Canvas.CanvasModel(seed=5, logLevel=logging.WARNING)
+        sim = RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=True,
+                                                 logLevel=logging.WARNING, paletteFrames=True)
+        for i in range(30):
+            if i % 3 == 2:
+                sim.turnLeft(100, 50)
+            else:
+                sim.driveForward(100, 150)
+        frames = sim._frames
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sim.traj')
+            sim.saveTrajectory(path)
+            arrays, metadata = Trajectory.loadTrajectory(path)
+            for workers in (1, 2):
+                gif = io.BytesIO()
+                count = Renderer.renderTrajectory(arrays, Canvas.CanvasModel(seed=metadata['seed'], logLevel=logging.WARNING),
+                                                  gif, workers=workers, framesPerTask=7)
+                self.assertEqual(count, 31)
+                gif.seek(0)
+                with Image.open(gif) as image:
+                    self.assertEqual(image.n_frames, len(frames))
+                    for i, frame in enumerate(ImageSequence.Iterator(image)):
+                        self.assertEqual(frame.info['duration'], frames.getDurations()[i])
+                        np.testing.assert_array_equal(np.array(frame.convert('RGB')),
+                                                      np.array(frames.getFrame(i).convert('RGB')))
+
+
+if __name__ == '__main__':
+    unittest.main()
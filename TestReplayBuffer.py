@@ -0,0 +1,75 @@
+import unittest
+import ReplayBuffer
+import numpy as np
+
+
+class TestReplayBuffer(unittest.TestCase):
+    def testAddAndSample(self):
+        memory = ReplayBuffer.ReplayBuffer(5, 3, seed=1)
+        with self.assertRaises(ValueError):
+            memory.sample(8)
+        for i in range(7):
+            memory.add(np.full(3, i), i % 3, float(i), np.full(3, i + 1), i == 6)
+        self.assertEqual(len(memory), 5)
+        states, actions, rewards, nextStates, dones = memory.sample(200)
+        self.assertEqual(states.shape, (200, 3))
+        self.assertEqual((states.dtype, actions.dtype, dones.dtype),
+                         (np.float32, np.int32, np.float32))
+        # 0 and 1 were overwritten
+        self.assertEqual(set(rewards.tolist()), {2.0, 3.0, 4.0, 5.0, 6.0})
+        np.testing.assert_array_equal(states[:, 0], rewards)
+        np.testing.assert_array_equal(nextStates[:, 0], rewards + 1)
+        np.testing.assert_array_equal(actions, rewards.astype(np.int32) % 3)
+        np.testing.assert_array_equal(dones, rewards == 6.0)
+        # the next sample reuses the arrays
+        self.assertIs(memory.sample(200)[0], states)
+        with self.assertRaises(ValueError):
+            memory.updatePriorities(memory.getSampleIndices(), np.ones(200))
+
+    def testAddBatch(self):
+        memory = ReplayBuffer.ReplayBuffer(4, 2, seed=1)
+        memory.add(np.zeros(2), 0, 0.0, np.zeros(2), False)
+        memory.addBatch(np.ones((2, 2)), [1, 2], [1.0, 2.0], np.ones((2, 2)), [False, True])
+        memory.addBatch(np.ones((2, 2)), [1, 2], [3.0, 4.0], np.ones((2, 2)), [False, True])
+        self.assertEqual(len(memory), 4)
+        rewards = memory.sample(100)[2]
+        self.assertEqual(set(rewards.tolist()), {1.0, 2.0, 3.0, 4.0})
+
+    def testSumTree(self):
+        tree = ReplayBuffer.SumTree(5)
+        tree.update([0, 1, 2, 3, 4], [1.0, 0.0, 2.0, 3.0, 4.0])
+        self.assertEqual(tree.total(), 10.0)
+        self.assertEqual(tree.find([0.0, 0.99, 1.0, 2.5, 3.0, 5.9, 6.0, 9.99]).tolist(),
+                         [0, 0, 2, 2, 3, 3, 4, 4])
+        tree.set(1, 5.0)
+        self.assertEqual(tree.total(), 15.0)
+        self.assertEqual(tree.get([1, 4]).tolist(), [5.0, 4.0])
+        self.assertEqual(tree.find([1.0, 6.0]).tolist(), [1, 2])
+
+    def testPrioritized(self):
+        memory = ReplayBuffer.ReplayBuffer(4, 1, prioritized=True, alpha=1.0, seed=2)
+        with self.assertRaises(ValueError):
+            memory.sample(8)
+        for i in range(4):
+            memory.add([i], 0, float(i), [i], False)
+        memory.updatePriorities(np.arange(4), np.array([1.0, 2.0, 3.0, 4.0]))
+        counts = np.zeros(4)
+        for i in range(500):
+            memory.sample(10)
+            counts += np.bincount(memory.getSampleIndices(), minlength=4)
+        np.testing.assert_allclose(counts / counts.sum(), [0.1, 0.2, 0.3, 0.4], atol=0.02)
+        rewards = memory.sample(8)[2]
+        np.testing.assert_array_equal(rewards, memory.getSampleIndices())
+        weights = memory.getSampleWeights()
+        self.assertEqual(weights.max(), 1.0)
+        # low priorities get the large weights
+        self.assertTrue(np.all(np.diff(weights[np.argsort(rewards)]) <= 0))
+        # new experiences get the largest priority
+        memory.add([9], 0, 9.0, [9], False)
+        memory.sample(1000)
+        # stratified sampling: 1000 * 4 / (4 + 2 + 3 + 4)
+        self.assertAlmostEqual(np.count_nonzero(memory.getSampleIndices() == 0), 308, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
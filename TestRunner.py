@@ -0,0 +1,58 @@
+import unittest
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import NumpyModel
+import Runner
+import Trajectory
+
+
+class TestRunner(unittest.TestCase):
+    def testRunEpisodes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            summary = os.path.join(directory, 'summary.csv')
+            results = Runner.runEpisodes(
+                [2, 5, 9], summary, workers=2, artifacts=directory)
+            with open(summary, newline='') as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(sorted(int(row['seed']) for row in rows), [2, 5, 9])
+            self.assertEqual(len(results), 3)
+            arrays, metadata = Trajectory.loadTrajectory(
+                os.path.join(directory, 'heuristic_seed_5.traj'))
+            self.assertEqual(metadata, {'seed': 5})
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = Runner.runEpisode(5)
+        self.assertEqual(result['steps'], len(arrays['actions']) - 1)
+        self.assertEqual(result['totalReward'], round(
+            float(arrays['rewards'].sum()), 2))
+        self.assertIn(result, [dict(r, seconds=result['seconds'])
+                      for r in results])
+
+    def testMaxDuration(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = Runner.runEpisode(5, maxDuration=2.0)
+        self.assertGreaterEqual(result['duration'], 2.0)
+        self.assertLess(result['duration'], 2.5)
+
+    def testLockstep(self):
+        model = NumpyModel.loadModel('curve_tracking_model.h5')
+        seeds = [2, 5, 9, 84]
+        results = Runner.runModelLockstep(seeds, model, maxDuration=8.0)
+        self.assertEqual([result['seed'] for result in results], seeds)
+        for result in results:
+            expected = Runner.runEpisode(
+                result['seed'], 'model', model, maxDuration=8.0)
+            self.assertEqual(dict(result, seconds=0), dict(expected, seconds=0))
+        with tempfile.TemporaryDirectory() as directory:
+            summary = os.path.join(directory, 'summary.csv')
+            Runner.runEpisodes(seeds, summary, 'curve_tracking_model.h5', workers=2,
+                               maxDuration=8.0, lockstep=3)
+            with open(summary, newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(sorted(int(row['seed']) for row in rows), seeds)
+
+
+if __name__ == '__main__':
+    unittest.main()
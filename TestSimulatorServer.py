@@ -0,0 +1,108 @@
+import unittest
+import asyncio
+import logging
+import os
+import random
+import socket
+import struct
+import tempfile
+import Car
+import Canvas
+import Heuristic
+import RobotCarSimulator
+import SimulatorServer
+
+
+def localSimulator(seed):
+    return RobotCarSimulator.SimulatorControl(Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING),
+                                              Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                              logLevel=logging.WARNING)
+
+
+class TestSimulatorServer(unittest.TestCase):
+    def testClientReset(self):
+        """ a client that resets the connection before reading the responses ends its session quietly """
+        async def run():
+            errors = []
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            server = SimulatorServer.SimulatorServer(seed=9, logLevel=logging.WARNING)
+            address = await server.start(port=0)
+            request = SimulatorServer.REQUEST.pack(SimulatorServer.DRIVE_FORWARD, 100, 150)
+            for i in range(3):
+                client = socket.create_connection(address)
+                client.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                client.sendall(request * 2000)
+                client.close()
+                await asyncio.sleep(0.2)
+            await server.close()
+            return errors
+        self.assertEqual(asyncio.run(run()), [])
+
+    def testConcurrentSessions(self):
+        async def drive(address, index):
+            client = await SimulatorServer.AsyncSimulatorClient.connect(*address)
+            sim = localSimulator(9)
+            rng = random.Random(index)
+            self.assertEqual(client.getLineTrackingSensorValues(), sim.getLineTrackingSensorValues())
+            while not sim.isTerminated() and sim.getDuration() < 10.0:
+                action = rng.randrange(3)
+                if action == 0:
+                    await client.driveForward(100, 150)
+                    sim.driveForward(100, 150)
+                elif action == 1:
+                    await client.turnLeft(100, 50)
+                    sim.turnLeft(100, 50)
+                else:
+                    await client.turnRight(100, 50)
+                    sim.turnRight(100, 50)
+                self.assertEqual(client.getLineTrackingSensorValues(), sim.getLineTrackingSensorValues())
+                self.assertEqual((client.isTerminated(), client.getDuration()), (sim.isTerminated(), sim.getDuration()))
+            await client.close()
+            return sim.getDuration()
+
+        async def run():
+            server = SimulatorServer.SimulatorServer(seed=9, logLevel=logging.WARNING)
+            address = await server.start(port=0)
+            durations = await asyncio.gather(*(drive(address, i) for i in range(16)))
+            # the blocking client drives the heuristic in a thread
+            heuristic = await asyncio.get_running_loop().run_in_executor(None, runHeuristic, address)
+            await server.close()
+            return server, durations, heuristic
+
+        def runHeuristic(address):
+            with SimulatorServer.SimulatorClient(*address) as client:
+                Heuristic.HeuristicLineTracker(client, 8.0, logging.WARNING).run()
+                return client.getLineTrackingSensorValues(), client.isTerminated(), client.getDuration()
+        server, durations, heuristic = asyncio.run(run())
+        sim = localSimulator(9)
+        Heuristic.HeuristicLineTracker(sim, 8.0, logging.WARNING).run()
+        self.assertEqual(heuristic, (sim.getLineTrackingSensorValues(), sim.isTerminated(), sim.getDuration()))
+        stats = server.getStats()
+        steps = sum(stats[name]['count'] for name in ('driveForward', 'turnLeft', 'turnRight'))
+        self.assertGreater(steps, 16 * 10)
+        self.assertEqual(stats['getLineTrackingSensorValues']['count'], 17)
+        self.assertGreater(stats['driveForward']['p50'], 0.0)
+        self.assertEqual(server.getSessions(), (0, 17))
+
+    def testUnixSocket(self):
+        async def run(path):
+            server = SimulatorServer.SimulatorServer(seed=5, logLevel=logging.WARNING)
+            await server.start(path=path)
+            client = await SimulatorServer.AsyncSimulatorClient.connect(path=path)
+            await client.driveForward(100, 150)
+            await client.reset(2)
+            initial = client.getLineTrackingSensorValues(), client.getDuration()
+            with self.assertRaises(RuntimeError):
+                await client._call(99)
+            await client.close()
+            await server.close()
+            return initial
+        with tempfile.TemporaryDirectory() as directory:
+            initial = asyncio.run(run(os.path.join(directory, 'robotcar.sock')))
+        self.assertEqual(initial, (localSimulator(2).getLineTrackingSensorValues(), 0.1))
+        self.assertEqual(SimulatorServer.REQUEST.size, 7)
+        self.assertEqual(SimulatorServer.RESPONSE.size, 34)
+
+
+if __name__ == '__main__':
+    unittest.main()
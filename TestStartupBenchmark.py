@@ -0,0 +1,15 @@
+import unittest
+import StartupBenchmark
+
+
+class TestStartupBenchmark(unittest.TestCase):
+    def testNoHeavyImports(self):
+        summary = StartupBenchmark.measure(repeat=1)
+        # a simulator without gif must not load tensorflow, PIL or h5py
+        self.assertEqual(summary['modules'], '')
+        self.assertGreater(summary['firstStep'], 0.0)
+        self.assertGreater(summary['process'], summary['import'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import logging
+import BatchSimulator
+import Car
+import RobotCarSimulator
+import CoverageMap
+import TrackCanvas
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+from rewardFunctions import trackReward
+
+
+class TestTrackCanvas(unittest.TestCase):
+    def testOpenTrack(self):
+        canvas = TrackCanvas.TrackCanvas(12, seed=4, logLevel=logging.WARNING)
+        curve = canvas.getCurvePolygon()
+        self.assertTrue(curve.is_valid)
+        self.assertEqual(len(curve.interiors), 0)
+        self.assertEqual(canvas.getBezierSegments().shape, (12, 4, 2))
+        self.assertEqual(len(canvas.getBezierPoints()), 12*3 + 1)
+        self.assertEqual(canvas.getCurveStartingPoint()[0], canvas.getBorder())
+        self.assertAlmostEqual(canvas.getBezierPoints()[-1][0], canvas.getSize()[0] + canvas.getBorder(), delta=1)
+        # the segments share their end points and tangents
+        segments = canvas.getBezierSegments()
+        np.testing.assert_allclose(segments[1:, 0], segments[:-1, 3])
+        np.testing.assert_allclose(segments[1:, 1] - segments[1:, 0], segments[:-1, 3] - segments[:-1, 2])
+        sim = RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                 logLevel=logging.WARNING)
+        self.assertTrue(sim.carFollowsLine())
+        self.assertGreater(sim.getLineTrackingSensorValues()[1], 800)
+        table = canvas.getArcLengthTable()
+        self.assertIs(table, canvas.getArcLengthTable())
+        np.testing.assert_array_equal(canvas.getArcLengthTable(21).getPoints(), canvas.getCenterLine())
+        self.assertAlmostEqual(table.getLength(), LineString(table.getPoints()).length, places=6)
+        np.testing.assert_array_equal(table.pointAt(table.getLength()), segments[-1, 3])
+        # the tangents are continuous at the ends of the segments
+        s = table.getLength() * np.arange(1, 12) / 12
+        np.testing.assert_allclose(table.tangentAt(s - 1e-3), table.tangentAt(s + 1e-3), atol=1e-4)
+        self.assertEqual(table.parameterAt(table.getLength()), 12.0)
+
+    def testLoop(self):
+        canvas = TrackCanvas.TrackCanvas(4, loop=True, segmentLength=400, seed=3, logLevel=logging.WARNING)
+        curve = canvas.getCurvePolygon()
+        self.assertTrue(canvas.isLoop())
+        self.assertTrue(curve.is_valid)
+        self.assertEqual(len(curve.interiors), 1)
+        self.assertAlmostEqual(canvas.getCoverageMap(0.5).rectangleArea(
+            0, 0, *canvas.getSize()) / curve.area, 1.0, places=3)
+        centre = np.array(curve.centroid.coords[0])
+        # the hole is not part of the curve in the background image
+        image = canvas.getBackgroundImage()
+        self.assertEqual(image.getpixel(tuple(centre.astype(int))), (255, 255, 255))
+        self.assertEqual(image.getpixel(tuple(int(value) for value in canvas.getCenterLine()[5])), (0, 0, 0))
+        with self.assertRaises(ValueError):
+            TrackCanvas.TrackCanvas(2, loop=True)
+
+    def testLargeCanvas(self):
+        """ track positions and visited poses of a circuit of more than 10 m """
+        canvas = TrackCanvas.TrackCanvas(40, loop=True, seed=8, logLevel=logging.WARNING)
+        field = canvas.getDistanceField()
+        self.assertFalse(field.usesGrid())
+        self.assertEqual(field.nbytes(), 0)
+        line = LineString(canvas.getCenterLine())
+        rng = np.random.default_rng(5)
+        points = shapely.line_interpolate_point(line, rng.uniform(0.0, line.length, 500))
+        x = shapely.get_x(points) + rng.normal(0.0, 50.0, 500)
+        y = shapely.get_y(points) + rng.normal(0.0, 50.0, 500)
+        crossTrack, progress = field.trackPositions(x, y)
+        np.testing.assert_allclose(np.abs(crossTrack), shapely.distance(line, shapely.points(x, y)), atol=1e-9)
+        np.testing.assert_allclose(field.trackPosition(x[7], y[7]), (crossTrack[7], progress[7]), atol=1e-9)
+        self.assertGreater(canvas.getCurveStartingPoint()[0], 10000)
+        sim = RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                 logLevel=logging.WARNING, sensorMode=CoverageMap.SENSOR_MODE_TILED,
+                                                 rewardFunction=trackReward)
+        batch = BatchSimulator.BatchSimulatorControl([canvas], logLevel=logging.WARNING,
+                                                     sensorMode=CoverageMap.SENSOR_MODE_TILED,
+                                                     rewardFunction=trackReward)
+        for step in range(40):
+            action = step % 3 if step % 4 else BatchSimulator.DRIVE_FORWARD
+            batch.step(np.array([action]))
+            (sim.driveForward, sim.turnLeft, sim.turnRight)[action](100, BatchSimulator.ACTION_DURATIONS[action])
+            self.assertAlmostEqual(batch.getRewards()[0], sim.getReward(), places=6)
+            np.testing.assert_allclose(batch.getTrackPositions(), [[value] for value in sim.getTrackPosition()],
+                                       atol=1e-9)
+
+    def testTileSizeIndependentOfLength(self):
+        """ the tiles of a long track are not larger than those of a short one """
+        counts = []
+        for segments in (4, 400):
+            for loop in (False, True):
+                canvas = TrackCanvas.TrackCanvas(segments, loop=loop, seed=6, logLevel=logging.WARNING)
+                tiles = canvas.getTrackTiles()
+                centerLine = canvas.getCenterLine()
+                counts.append(shapely.get_num_coordinates(tiles.polygonsAt(centerLine[:, 0], centerLine[:, 1])).max())
+        self.assertLess(max(counts[2:]), 2 * max(counts[:2]))
+        sim = RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                 logLevel=logging.WARNING, sensorMode=CoverageMap.SENSOR_MODE_TILED)
+        exact = RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                   logLevel=logging.WARNING)
+        for i in range(20):
+            sim.driveForward(100, 150)
+            exact.driveForward(100, 150)
+            np.testing.assert_allclose(sim.getLineTrackingSensorValues(), exact.getLineTrackingSensorValues(),
+                                       atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
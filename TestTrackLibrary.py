@@ -0,0 +1,60 @@
+import unittest
+import os
+import pickle
+import tempfile
+import Canvas
+import TrackLibrary
+import numpy as np
+
+
+class TestTrackLibrary(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'tracks.lib')
+        TrackLibrary.buildLibrary(self._path, (5, 9), sizes=(
+            (1500, 1200), (800, 600)), rasterResolution=1.0)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def testCanvasFromLibrary(self):
+        library = TrackLibrary.TrackLibrary(self._path)
+        self.assertEqual(len(library), 4)
+        self.assertIn((9, (800, 600)), library)
+        for seed in (5, 9):
+            for size in ((1500, 1200), (800, 600)):
+                canvas = library.getCanvas(seed, size)
+                original = Canvas.CanvasModel(size=size, seed=seed)
+                self.assertEqual(canvas.getCurveBoundingPoints(),
+                                 original.getCurveBoundingPoints())
+                self.assertEqual(canvas.getBezierPoints(),
+                                 original.getBezierPoints())
+                self.assertEqual(canvas.getCurveStartingPoint(),
+                                 original.getCurveStartingPoint())
+                self.assertEqual(canvas.getCurveStartingOrientation(),
+                                 original.getCurveStartingOrientation())
+                self.assertEqual(canvas.getCanvasBoundingPoints(),
+                                 original.getCanvasBoundingPoints())
+                np.testing.assert_array_equal(canvas.getCoverageMap(1.0).getSummedAreaTable(),
+                                              original.getCoverageMap(1.0).getSummedAreaTable())
+
+    def testCache(self):
+        library = TrackLibrary.TrackLibrary(self._path, cacheSize=2)
+        self.assertIs(library.getCanvas(5), library.getCanvas(5))
+        # seeds that are not in the library are generated
+        self.assertEqual(library.getCanvas(7).getCurveBoundingPoints(),
+                         Canvas.CanvasModel(seed=7).getCurveBoundingPoints())
+
+    def testPickle(self):
+        library = pickle.loads(pickle.dumps(
+            TrackLibrary.TrackLibrary(self._path)))
+        self.assertEqual(library.getCanvas(9).getCurveBoundingPoints(),
+                         Canvas.CanvasModel(seed=9).getCurveBoundingPoints())
+
+    def testParseSeeds(self):
+        self.assertEqual(TrackLibrary.parseSeeds(
+            '2,5,10-12'), [2, 5, 10, 11, 12])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import logging
+import Car
+import Canvas
+import RobotCarSimulator
+import BatchSimulator
+import CoverageMap
+import TrackTiles
+import numpy as np
+
+
+class TestTrackTiles(unittest.TestCase):
+    def testTilesMatchCurvePolygon(self):
+        """ sensor values and followsLine of the tile under the car equal those of the whole curve """
+        car = Car.CarModel(logLevel=logging.WARNING)
+        for tileSize in (100, TrackTiles.DEFAULT_TILE_SIZE):
+            for seed in (2, 5, 9):
+                canvas = Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING)
+                curve = canvas.getCurvePolygon()
+                tiles = canvas.getTrackTiles(tileSize)
+                self.assertIs(tiles, canvas.getTrackTiles(tileSize))
+                rng = np.random.default_rng(seed)
+                centerLine = canvas.getCenterLine()
+                for i in range(200):
+                    x, y = centerLine[rng.integers(len(centerLine))] + rng.uniform(-110, 110, 2)
+                    car.setPosition((x, y))
+                    car.setOrientation(rng.uniform(-180, 180))
+                    np.testing.assert_allclose(car.computeSensorValues(tiles.polygonAt(x, y)),
+                                               car.computeSensorValues(curve), rtol=0, atol=1e-6)
+                    self.assertEqual(car.followsLine(tiles.polygonAt(x, y)), car.followsLine(curve))
+        self.assertTrue(tiles.polygonAt(-1000, -1000).is_empty)
+        self.assertEqual(len(tiles.polygonsAt(np.array([0.0, 500.0]), np.array([0.0, 500.0]))), 2)
+
+    def testSimulatorSensorMode(self):
+        canvases = [Canvas.CanvasModel(seed=seed, logLevel=logging.WARNING) for seed in (2, 5, 9)]
+        sims = [RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(logLevel=logging.WARNING), createGif=False,
+                                                   logLevel=logging.WARNING, sensorMode=CoverageMap.SENSOR_MODE_TILED)
+                for canvas in canvases]
+        batch = BatchSimulator.BatchSimulatorControl(canvases, logLevel=logging.WARNING,
+                                                     sensorMode=CoverageMap.SENSOR_MODE_TILED)
+        exact = BatchSimulator.BatchSimulatorControl(canvases, logLevel=logging.WARNING)
+        rng = np.random.default_rng(3)
+        for step in range(60):
+            actions = rng.integers(0, 3, len(canvases))
+            states, rewards, dones = batch.step(actions)
+            exact.step(actions)
+            for i, sim in enumerate(sims):
+                if actions[i] == BatchSimulator.DRIVE_FORWARD:
+                    sim.driveForward(100, 150)
+                elif actions[i] == BatchSimulator.TURN_LEFT:
+                    sim.turnLeft(100, 50)
+                else:
+                    sim.turnRight(100, 50)
+                np.testing.assert_allclose(states[i], list(
+                    sim.getPreviousLineTrackingSensorValues()) + sim.getLineTrackingSensorValues(), atol=1e-6)
+                self.assertEqual(batch.carFollowsLine()[i], sim.carFollowsLine())
+                self.assertEqual(dones[i], sim.isTerminated())
+            np.testing.assert_allclose(states, exact.getStates(), atol=1e-6)
+            np.testing.assert_array_equal(batch.carFollowsLine(), exact.carFollowsLine())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import os
+import pprint
+import tempfile
+import Car
+import Canvas
+import RobotCarSimulator
+import Trajectory
+import numpy as np
+
+
+class TestTrajectory(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _drive(self):
+        sim = RobotCarSimulator.SimulatorControl(
+            Canvas.CanvasModel(seed=5), Car.CarModel(), createGif=False)
+        rewards = [sim.getReward()]
+        for i in range(300):
+            if i % 3 == 0:
+                sim.turnLeft(100, 50)
+            else:
+                sim.driveForward(100, 150)
+            rewards.append(sim.getReward())
+        return (sim, rewards)
+
+    def testRecordAndLoad(self):
+        sim, rewards = self._drive()
+        self.assertEqual(len(sim.getTrajectory()), 301)
+        path = os.path.join(self._directory.name, 'seed_5.traj')
+        sim.saveTrajectory(path)
+        arrays, metadata = Trajectory.loadTrajectory(path)
+        self.assertEqual(metadata, {'seed': 5})
+        self.assertIsInstance(arrays['x'], np.memmap)
+        self.assertEqual(Trajectory.actionLog(arrays)[:3], [
+            ('init', None, 100), ('turnLeft', 100, 50), ('driveForward', 100, 150)])
+        self.assertEqual(arrays['rewards'].tolist(), rewards)
+        self.assertEqual(Trajectory.positions(arrays)[-1], sim._car._position)
+        self.assertEqual(arrays['angles'][-1], sim._car._rotation)
+        self.assertEqual(arrays['sensors'][-1].tolist(),
+                         sim.getLineTrackingSensorValues())
+        self.assertEqual(bool(arrays['flags'][-1] & Trajectory.TERMINATED),
+                         sim.isTerminated())
+
+    def testConvertTextLog(self):
+        sim, rewards = self._drive()
+        textPath = os.path.join(self._directory.name, 'model_seed_5.txt')
+        with open(textPath, 'w') as f:
+            f.write("actions:\n")
+            f.write(pprint.pformat(sim._actionLog))
+            f.write("\n\npositions:\n")
+            f.write(pprint.pformat(sim._carPositions))
+            f.write("\n\norientations:\n")
+            f.write(pprint.pformat(sim._carOrientations))
+        path = os.path.join(self._directory.name, 'model_seed_5.traj')
+        Trajectory.convertTextLog(textPath, path)
+        arrays, metadata = Trajectory.loadTrajectory(path)
+        self.assertFalse(metadata['hasSensorValues'])
+        self.assertEqual(Trajectory.actionLog(arrays), sim._actionLog)
+        self.assertEqual(Trajectory.positions(arrays), sim._carPositions)
+        self.assertEqual(arrays['angles'].tolist(), sim._carOrientations)
+
+    def testCachedLists(self):
+        sim, rewards = self._drive()
+        state = sim.snapshot()
+        actions = sim._actionLog
+        self.assertIs(sim._actionLog, actions)
+        self.assertIs(sim._carPositions, sim._carPositions)
+        sim.driveForward(100, 150)
+        self.assertEqual(len(sim._actionLog), 302)
+        self.assertEqual(len(sim._carOrientations), 302)
+        sim.restore(state)
+        sim.turnRight(100, 50)
+        arrays = sim.getTrajectory().getArrays()
+        self.assertIs(sim._actionLog, actions)
+        self.assertEqual(sim._actionLog, Trajectory.actionLog(arrays))
+        self.assertEqual(sim._carPositions, Trajectory.positions(arrays))
+        self.assertEqual(sim._carOrientations, arrays['angles'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
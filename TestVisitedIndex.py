@@ -0,0 +1,67 @@
+import unittest
+import VisitedIndex
+import numpy as np
+
+
+class TestVisitedIndex(unittest.TestCase):
+    def testKeys(self):
+        index = VisitedIndex.VisitedIndex()
+        rng = np.random.default_rng(7)
+        x = rng.uniform(-100.0, 1600.0, 1000)
+        y = rng.uniform(-100.0, 1300.0, 1000)
+        angle = rng.uniform(-720.0, 720.0, 1000)
+        followsLine = rng.random(1000) < 0.5
+        isTerminated = rng.random(1000) < 0.1
+        keys = index.keys(x, y, angle, followsLine, isTerminated)
+        self.assertEqual(keys, [index.key(*pose) for pose in zip(
+            x.tolist(), y.tolist(), angle.tolist(), followsLine.tolist(), isTerminated.tolist())])
+        self.assertEqual(len(set(keys)), 1000)
+        # same cell
+        self.assertEqual(index.key(100.001, 50.0, 10.0, True, False),
+                         index.key(100.0, 50.002, 370.0, True, False))
+        self.assertNotEqual(index.key(100.0, 50.0, 10.0, True, False),
+                            index.key(100.0, 50.0, 10.0, False, False))
+        # no overflow or aliasing far from the origin
+        x = np.array([6000.0, 1e6, 1e6, 1e6])
+        y = np.array([0.0, 30000.0, -30000.0, 30000.01])
+        keys = index.keys(x, y, np.zeros(4), np.ones(4, dtype=bool), np.zeros(4, dtype=bool))
+        self.assertEqual(keys, [index.key(*pose) for pose in zip(x.tolist(), y.tolist(), [0.0]*4, [True]*4, [False]*4)])
+        self.assertEqual(len(set(keys)), 4)
+        coarse = VisitedIndex.VisitedIndex(positionCellSize=5.0, angleCellSize=2.0)
+        self.assertEqual(coarse.key(100.0, 50.0, 10.0, True, False),
+                         coarse.key(102.0, 48.0, 10.9, True, False))
+
+    def testMemoryCap(self):
+        index = VisitedIndex.VisitedIndex(maxEntries=10)
+        for key in range(25):
+            index.add(key)
+        self.assertEqual(len(index), 10)
+        self.assertNotIn(14, index)
+        self.assertIn(15, index)
+        index.clear()
+        self.assertEqual(len(index), 0)
+
+    def testFork(self):
+        index = VisitedIndex.VisitedIndex(maxEntries=10)
+        index.add(1)
+        fork = index.fork()
+        self.assertIs(fork._cells, index._cells)
+        fork.add(2)
+        index.add(3)
+        self.assertEqual((list(index._cells), list(fork._cells)), ([1, 3], [1, 2]))
+        second = fork.fork()
+        second.clear()
+        self.assertEqual((len(second), len(fork)), (0, 2))
+
+    def testAddNew(self):
+        indexes = [VisitedIndex.VisitedIndex() for i in range(3)]
+        keys = [(1, 0, 0, True, False), (2, 0, 0, True, False), (3, 0, 0, True, False)]
+        added = VisitedIndex.addNew(
+            indexes, keys, np.array([True, True, False]))
+        self.assertEqual(added.tolist(), [True, True, False])
+        added = VisitedIndex.addNew(indexes, keys, np.ones(3, dtype=bool))
+        self.assertEqual(added.tolist(), [False, False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+"""
+module that generates long tracks of many Bezier segments and closed circuits
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: canvas = TrackCanvas(segments=1000, seed=5)
+       sim = RobotCarSimulator.SimulatorControl(canvas, Car.CarModel(), createGif=False, sensorMode='tiled')
+
+The canvas grows with the track, so its background image, coverage map and distance field
+cover the whole track. For tracks of many metres use sensorMode 'tiled' and no gif.
+Their distance field has no grid, the track positions (e.g. of rewardFunctions.trackReward)
+are looked up in a search tree of the centre line segments (see DistanceField.MAX_GRID_CELLS).
+"""
+
+import logging
+import math
+import random
+import time
+from itertools import chain
+import numpy as np
+import shapely
+from shapely.geometry import LinearRing, LineString
+import Bezier
+from Canvas import CanvasModel
+from CoverageMap import CoverageMap, DEFAULT_RESOLUTION
+
+DEFAULT_SEGMENTS = 8
+DEFAULT_SEGMENT_LENGTH = 1000  # mm between the ends of a segment
+# largest angle (degrees) of the chords and tangents of an open track against the x axis
+MAX_HEADING = 45
+# the distance of the points of a circuit from its centre varies by this fraction of the segment length
+LOOP_JITTER = 0.4
+# space (mm) between the control points and the upper, lower (and for circuits left and right) canvas edges
+MARGIN = 200
+
+
+def openTrack(segments, length, rng):
+    """ control points of shape (segments, 4, 2) of a chain of cubic Bezier curves from (0, 0) to the right.
+    Neighbouring segments share the end point and the tangent (C1).
+    All chords and tangents are at most MAX_HEADING degrees off the x axis, so the control points
+    of every segment and the track are monotonic in x and the track does not cross itself.
+    """
+    def heading():
+        angle = math.radians(rng.uniform(-MAX_HEADING, MAX_HEADING))
+        return np.array([math.cos(angle), math.sin(angle)])
+    points = np.empty((segments, 4, 2))
+    start = np.zeros(2)
+    tangent = heading()
+    for i in range(segments):
+        end = start + length * heading()
+        endTangent = heading()
+        points[i] = (start, start + tangent * length / 3, end - endTangent * length / 3, end)
+        start, tangent = end, endTangent
+    return points
+
+
+def loopTrack(segments, length, rng):
+    """ control points of shape (segments, 4, 2) of a closed circuit of cubic Bezier curves
+    through segments points around a circle of circumference segments*length (Catmull-Rom tangents)
+    """
+    radius = segments * length / (2 * math.pi)
+    angles = 2 * math.pi * np.arange(segments) / segments
+    radii = radius + length * np.array([rng.uniform(-LOOP_JITTER, LOOP_JITTER) for i in range(segments)])
+    starts = np.stack((radii * np.cos(angles), radii * np.sin(angles)), axis=-1)
+    ends = np.roll(starts, -1, axis=0)
+    tangents = (ends - np.roll(starts, 1, axis=0)) / 2
+    return np.stack((starts, starts + tangents / 3, ends - np.roll(tangents, -1, axis=0) / 3, ends), axis=1)
+
+
+class TrackCanvas(CanvasModel):
+
+    def __init__(self, segments=DEFAULT_SEGMENTS, loop=False, segmentLength=DEFAULT_SEGMENT_LENGTH,
+                 border=CanvasModel.CANVAS_BORDER, curveWidth=CanvasModel.CURVE_WIDTH, seed=time.time(),
+                 logLevel=logging.INFO, curveSamples=Bezier.DEFAULT_SAMPLES) -> None:
+        """
+        Create a canvas with a random track of segments cubic Bezier curves.
+        The canvas is as large as the track needs.
+        loop: a closed circuit instead of a track from the left to the right edge of the canvas
+        segmentLength: distance (mm) between the ends of a segment
+        curveSamples: number of points per segment the curve polygon is built from
+
+        Note that SimulatorControl only rewards moving to the right, half of a circuit
+        is not rewarded.
+        """
+        if segments < (3 if loop else 1):
+            raise ValueError(f'a {"circuit" if loop else "track"} needs more segments than {segments}')
+        self._segmentCount = segments
+        self._loop = loop
+        self._segmentLength = segmentLength
+        # the size is known after the track is generated in initCurve
+        super().__init__((0, 0), border, curveWidth, seed, logLevel, curveSamples)
+        return
+
+    def initCurve(self):
+        """ generate the track and the size of the canvas from the seed """
+        rng = random.Random(self._seed)
+        if self._loop:
+            segments = loopTrack(self._segmentCount, self._segmentLength, rng)
+            margin = np.array([MARGIN, MARGIN])
+        else:
+            segments = openTrack(self._segmentCount, self._segmentLength, rng)
+            # the track starts at the left and ends at the right edge of the canvas like the curves of CanvasModel
+            margin = np.array([0, MARGIN])
+        low = segments.reshape(-1, 2).min(axis=0) - margin
+        high = segments.reshape(-1, 2).max(axis=0) + margin
+        segments += self._border - low
+        self._size = tuple(int(math.ceil(value)) for value in high - low)
+        self._imgsize = (self._size[0]+self._border*2, self._size[1]+self._border*2)
+        self._segments = segments
+
+        # the center line through curveSamples points of every segment, the segments share their ends
+        table = Bezier.ArcLengthTable(segments, self._curveSamples)
+        self._centerLine = table.getPoints()
+        if self._loop:
+            self._polygon = LinearRing(self._centerLine[:-1]).buffer(self._curveWidth / 2, join_style=1)
+        else:
+            self._polygon = LineString(self._centerLine).buffer(self._curveWidth / 2, cap_style=3, join_style=1)
+        self._curvePoints = list(self._polygon.exterior.coords)
+
+        # the car starts at the start of the track with the middle sensor 100 mm further on the center line
+        sensorpos = table.pointAt(100)
+        start = self._centerLine[0]
+        self._angle = math.degrees(math.atan2(sensorpos[1]-start[1], sensorpos[0]-start[0]))
+        self._bezierPoints = [tuple(point) for point in
+                              np.concatenate((segments[:, :3].reshape(-1, 2), segments[-1:, 3])).tolist()]
+        self._logger.debug(
+            'Canvas: new Track: %s segments, loop %s, length %.0f mm, orientation %s, startpoint %s, size %s',
+            self._segmentCount, self._loop, table.getLength(), self._angle, self._bezierPoints[0], self._size)
+        return
+
+    def isLoop(self):
+        return self._loop
+
+    def getBezierSegments(self):
+        """ the control points of the cubic segments, array of shape (segments, 4, 2)
+        (getBezierPoints() lists them without the repeated ends of the segments)
+        """
+        return self._segments
+
+    def getCurveBoundingPoints(self):
+        """ the outer boundary of the curve polygon, the inner boundary of a circuit is
+        in getCurvePolygon().interiors
+        """
+        return self._curvePoints
+
+    def getCurvePolygon(self):
+        """ the curve as prepared shapely Polygon (with a hole for a circuit) """
+        if self._curvePolygon is None:
+            self._curvePolygon = self._polygon
+            shapely.prepare(self._curvePolygon)
+        return self._curvePolygon
+
+    def getCoverageMap(self, resolution=DEFAULT_RESOLUTION):
+        """ the curve rasterized with the given resolution (mm per cell), see CanvasModel.getCoverageMap.
+        The inner boundary of a circuit is joined to the outer one by an edge that is passed
+        in both directions, its crossings cancel out in the even-odd rule of the CoverageMap.
+        """
+        if resolution not in self._coverageMaps:
+            rings = [self._curvePoints] + [list(interior.coords) for interior in self._polygon.interiors]
+            self._coverageMaps[resolution] = CoverageMap(
+                list(chain.from_iterable(rings)) + [self._curvePoints[0]], resolution)
+        return self._coverageMaps[resolution]
+
+    def getArcLengthTable(self, samples=Bezier.ARC_LENGTH_SAMPLES):
+        """ the Bezier.ArcLengthTable of the chain of segments with samples points per segment,
+        computed once per number of samples and canvas
+        """
+        if samples not in self._arcLengthTables:
+            self._arcLengthTables[samples] = Bezier.ArcLengthTable(self._segments, samples)
+        return self._arcLengthTables[samples]
+
+    def _drawCurve(self, imageDraw):
+        imageDraw.polygon(self._curvePoints, outline='black', fill='black')
+        for interior in self._polygon.interiors:
+            imageDraw.polygon(list(interior.coords), outline='black', fill=(255, 255, 255))
+        return
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+"""
+module that pre-generates curves for many seeds into one memory-mapped track library file
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+usage: python TrackLibrary.py tracks.lib --seeds 0-999 [--sizes 1500x1200,3000x2400] [--raster 0.5]
+"""
+
+import argparse
+import functools
+import logging
+import numpy as np
+import ArrayStore
+import Canvas
+from CoverageMap import CoverageMap
+
+DEFAULT_CACHE_SIZE = 64
+
+
+class TrackLibrary():
+
+    def __init__(self, path, cacheSize=DEFAULT_CACHE_SIZE, logLevel=logging.INFO) -> None:
+        """ Open a track library written by buildLibrary.
+        The file is memory-mapped, all processes that open the same file share its pages.
+        cacheSize: number of CanvasModel objects kept in the in-process LRU cache
+        """
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logLevel)
+        self._path = path
+        self._cacheSize = cacheSize
+        self._arrays, self._metadata = ArrayStore.loadArrays(path)
+        self._border = self._metadata['border']
+        self._curveWidth = self._metadata['curveWidth']
+        self._resolution = self._metadata['rasterResolution']
+        self._index = {(seed, (width, height)): i for i, (seed, width, height) in enumerate(
+            zip(self._arrays['seeds'].tolist(), *self._arrays['sizes'].T.tolist()))}
+        self._cachedCanvas = functools.lru_cache(
+            maxsize=cacheSize)(self._createCanvas)
+        return
+
+    def __getstate__(self):
+        # worker processes re-open (memory-map) the file instead of receiving a copy
+        return {'path': self._path, 'cacheSize': self._cacheSize}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['cacheSize'])
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def getSeeds(self):
+        return self._arrays['seeds']
+
+    def getCanvas(self, seed, size=Canvas.CanvasModel.CANVAS_SIZE):
+        """ the CanvasModel for the seed and size, from the library if present, otherwise generated.
+        Canvases are cached (LRU), the same object is returned for repeated calls.
+        """
+        return self._cachedCanvas(seed, tuple(size))
+
+    def _createCanvas(self, seed, size):
+        key = (seed, size)
+        if key not in self._index:
+            self._logger.debug('TrackLibrary: seed %s size %s not in %s, generating it',
+                               seed, size, self._path)
+            return Canvas.CanvasModel(size=size, border=self._border, curveWidth=self._curveWidth, seed=seed,
+                                      logLevel=self._logger.level)
+        i = self._index[key]
+        arrays = self._arrays
+        coverageMaps = {}
+        if self._resolution is not None:
+            coverageMaps[self._resolution] = CoverageMap.fromArrays(
+                arrays['rasterOrigins'][i], self._resolution, arrays[f'sat{i}'])
+        bezier = arrays['bezierPoints'][arrays['bezierOffsets']
+                                        [i]:arrays['bezierOffsets'][i+1]]
+        curve = arrays['curvePoints'][arrays['curveOffsets']
+                                      [i]:arrays['curveOffsets'][i+1]]
+        return Canvas.CanvasModel.fromCurve(size, self._border, self._curveWidth, seed, bezier.tolist(),
+                                            curve.tolist(), float(arrays['angles'][i]), coverageMaps)
+
+
+def buildLibrary(path, seeds, sizes=(Canvas.CanvasModel.CANVAS_SIZE,), border=Canvas.CanvasModel.CANVAS_BORDER,
+                 curveWidth=Canvas.CanvasModel.CURVE_WIDTH, rasterResolution=None):
+    """ generate the curves for all seeds and sizes and write them into one library file at path.
+    rasterResolution: if given the summed-area table of the CoverageMap with this resolution
+    is stored for every curve as well
+    """
+    keys = [(seed, tuple(size)) for size in sizes for seed in seeds]
+    bezierPoints = []
+    curvePoints = []
+    angles = []
+    rasterOrigins = []
+    arrays = {}
+    for i, (seed, size) in enumerate(keys):
+        canvas = Canvas.CanvasModel(
+            size=size, border=border, curveWidth=curveWidth, seed=seed)
+        bezierPoints.append(np.array(canvas.getBezierPoints(), dtype=np.int64))
+        curvePoints.append(np.array(
+            canvas.getCurveBoundingPoints(), dtype=np.float64))
+        angles.append(canvas.getCurveStartingOrientation())
+        if rasterResolution is not None:
+            coverageMap = canvas.getCoverageMap(rasterResolution)
+            rasterOrigins.append(coverageMap.getOrigin())
+            arrays[f'sat{i}'] = coverageMap.getSummedAreaTable()
+    arrays['seeds'] = np.array([seed for seed, size in keys], dtype=np.int64)
+    arrays['sizes'] = np.array([size for seed, size in keys], dtype=np.int64)
+    arrays['angles'] = np.array(angles, dtype=np.float64)
+    arrays['bezierOffsets'] = np.cumsum(
+        [0] + [len(points) for points in bezierPoints])
+    arrays['bezierPoints'] = np.concatenate(bezierPoints)
+    arrays['curveOffsets'] = np.cumsum(
+        [0] + [len(points) for points in curvePoints])
+    arrays['curvePoints'] = np.concatenate(curvePoints)
+    if rasterResolution is not None:
+        arrays['rasterOrigins'] = np.array(rasterOrigins, dtype=np.float64)
+    ArrayStore.saveArrays(path, arrays, {'border': border, 'curveWidth': curveWidth,
+                                         'rasterResolution': rasterResolution})
+    return
+
+
+def parseSeeds(text):
+    """ '2,5,9' or '0-999' or a mix like '2,5,10-19' -> list of seeds """
+    seeds = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            seeds.extend(range(int(first), int(last)+1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def parseSizes(text):
+    """ '1500x1200,3000x2400' -> [(1500, 1200), (3000, 2400)] """
+    return [tuple(int(v) for v in size.split('x')) for size in text.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='pre-generate the curves of many seeds into a track library file')
+    parser.add_argument('path', help='library file to write')
+    parser.add_argument('--seeds', type=parseSeeds, default=parseSeeds('0-99'),
+                        help="seeds, e.g. '2,5,9' or '0-999' (default 0-99)")
+    parser.add_argument('--sizes', type=parseSizes, default=[Canvas.CanvasModel.CANVAS_SIZE],
+                        help="canvas sizes, e.g. '1500x1200,3000x2400' (default 1500x1200)")
+    parser.add_argument('--raster', type=float, default=None,
+                        help='also store the coverage map with this resolution in mm')
+    args = parser.parse_args()
+    buildLibrary(args.path, args.seeds, args.sizes,
+                 rasterResolution=args.raster)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+module that splits the curve polygon into square tiles for queries near a point
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import math
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+import Car
+
+DEFAULT_TILE_SIZE = 512  # mm
+# every sensor point and the corners of the followsLine box are at most this far (mm) from the car position
+QUERY_RADIUS = math.ceil(max(math.hypot(x, y) for sensor in Car.CarModel.sensors for x, y in sensor)) + 1
+# the curve polygon of a tile without any part of the curve
+EMPTY = Polygon()
+
+
+class TrackTiles():
+    """ The curve polygon cut into square tiles of tileSize mm on a grid starting at (0, 0).
+
+    Every tile keeps the part of the polygon within the tile grown by margin on all four
+    sides, prepared for shapely queries. A query geometry that is within margin of a point
+    of the tile has the same intersection with this part as with the whole polygon, so
+    polygonAt(car position) answers computeSensorValues and followsLine exactly with a
+    polygon of bounded size, no matter how long the track is.
+
+    The tiles are built by splitting the bounding box of the polygon in halves recursively,
+    so every vertex is clipped O(log tiles) times. Tiles without any part of the curve are not stored.
+    """
+
+    def __init__(self, polygon, tileSize=DEFAULT_TILE_SIZE, margin=QUERY_RADIUS) -> None:
+        """
+        polygon: the curve as shapely Polygon, e.g. CanvasModel.getCurvePolygon()
+        tileSize: edge length of a tile in mm
+        margin: distance (mm) of the queries from the point passed to polygonAt, at least QUERY_RADIUS for the car
+        """
+        self._tileSize = tileSize
+        self._margin = margin
+        self._tiles = {}
+        xmin, ymin, xmax, ymax = polygon.bounds
+        # tiles whose grown box touches the polygon
+        self._split(polygon, math.floor((xmin - margin) / tileSize), math.floor((ymin - margin) / tileSize),
+                    math.floor((xmax + margin) / tileSize) + 1, math.floor((ymax + margin) / tileSize) + 1)
+        return
+
+    def _split(self, geometry, column0, row0, column1, row1):
+        """ store the parts of geometry in the tiles of the columns column0 to column1-1 and rows row0 to row1-1 """
+        size = self._tileSize
+        part = shapely.intersection(geometry, shapely.box(
+            column0 * size - self._margin, row0 * size - self._margin,
+            column1 * size + self._margin, row1 * size + self._margin))
+        if part.geom_type == 'GeometryCollection':
+            # lines and points where the polygon touches the box have no area
+            parts = shapely.get_parts(part)
+            part = shapely.multipolygons(parts[shapely.get_type_id(parts) == 3])
+        if part.is_empty:
+            return
+        if column1 - column0 == 1 and row1 - row0 == 1:
+            shapely.prepare(part)
+            self._tiles[(column0, row0)] = part
+        elif column1 - column0 >= row1 - row0:
+            middle = (column0 + column1) // 2
+            self._split(part, column0, row0, middle, row1)
+            self._split(part, middle, row0, column1, row1)
+        else:
+            middle = (row0 + row1) // 2
+            self._split(part, column0, row0, column1, middle)
+            self._split(part, column0, middle, column1, row1)
+        return
+
+    def __len__(self):
+        """ the number of tiles with a part of the curve """
+        return len(self._tiles)
+
+    def getTileSize(self):
+        return self._tileSize
+
+    def getMargin(self):
+        return self._margin
+
+    def polygonAt(self, x, y):
+        """ the prepared part of the curve near the point (x, y), EMPTY far away from the curve """
+        return self._tiles.get((math.floor(x / self._tileSize), math.floor(y / self._tileSize)), EMPTY)
+
+    def polygonsAt(self, x, y):
+        """ object array with polygonAt of each point of the arrays x and y """
+        columns = np.floor(np.asarray(x) / self._tileSize).astype(np.int64).tolist()
+        rows = np.floor(np.asarray(y) / self._tileSize).astype(np.int64).tolist()
+        polygons = np.empty(len(columns), dtype=object)
+        polygons[:] = [self._tiles.get(key, EMPTY) for key in zip(columns, rows)]
+        return polygons
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+"""
+module that records the trajectory of a simulated car in typed NumPy arrays
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+
+Trajectories are written as ArrayStore files (one column per array) and
+loaded zero-copy as memory-mapped arrays.
+
+usage: python Trajectory.py data/*_seed_*.txt
+converts text logs written with pprint by older versions into .traj files next to them
+"""
+
+import ast
+import sys
+import numpy as np
+import ArrayStore
+
+# action ids, the same as the ids of the DQN in LearnModel.ipynb and BatchSimulator
+INIT = -1
+DRIVE_FORWARD = 0
+TURN_LEFT = 1
+TURN_RIGHT = 2
+ACTION_IDS = {'init': INIT, 'driveForward': DRIVE_FORWARD,
+              'turnLeft': TURN_LEFT, 'turnRight': TURN_RIGHT}
+ACTION_NAMES = {actionId: name for name, actionId in ACTION_IDS.items()}
+# bits of the flags column
+FOLLOWS_LINE = 1
+TERMINATED = 2
+# speed stored for actions without speed parameter (init)
+NO_SPEED = -1
+INITIAL_CAPACITY = 256
+COLUMNS = {'actions': (np.int8, ()), 'speeds': (np.int16, ()), 'durations': (np.int32, ()),
+           'x': (np.float64, ()), 'y': (np.float64, ()), 'angles': (np.float64, ()),
+           'sensors': (np.float64, (3,)), 'rewards': (np.float64, ()), 'flags': (np.uint8, ())}
+
+
+class TrajectoryRecorder():
+
+    def __init__(self, capacity=INITIAL_CAPACITY) -> None:
+        """ Record one entry per simulator step.
+        The columns are preallocated for capacity steps and doubled when full.
+        """
+        self._length = 0
+        self._arrays = {name: np.zeros((capacity,) + shape, dtype=dtype)
+                        for name, (dtype, shape) in COLUMNS.items()}
+        # the lists of getActionLog, getPositions and getOrientations, extended by the steps since the last call
+        self._lists = {}
+        return
+
+    def __len__(self):
+        return self._length
+
+    def append(self, actionname, speed, duration, position, angle, sensorValues, reward, followsLine, isTerminated):
+        """ record one step, the parameters are the values SimulatorControl.logCar has after the step """
+        i = self._length
+        if i == len(self._arrays['actions']):
+            self._grow()
+        arrays = self._arrays
+        arrays['actions'][i] = ACTION_IDS[actionname]
+        arrays['speeds'][i] = NO_SPEED if speed is None else speed
+        arrays['durations'][i] = duration
+        arrays['x'][i] = position[0]
+        arrays['y'][i] = position[1]
+        arrays['angles'][i] = angle
+        arrays['sensors'][i] = sensorValues
+        arrays['rewards'][i] = reward
+        arrays['flags'][i] = (FOLLOWS_LINE if followsLine else 0) | (
+            TERMINATED if isTerminated else 0)
+        self._length = i + 1
+        return
+
+    def truncate(self, length):
+        """ forget the steps after the first length steps, e.g. when a simulator is restored """
+        self._length = min(self._length, length)
+        for values in self._lists.values():
+            del values[self._length:]
+        return
+
+    def getArrays(self):
+        """ dict of column name -> array (views of the recorded steps, no copy) """
+        return {name: array[:self._length] for name, array in self._arrays.items()}
+
+    def getActionLog(self):
+        """ [(actionname, speed, duration)] as in the text logs of older versions.
+        Like getPositions and getOrientations the same list is returned on every call,
+        it is extended by the steps recorded since the last call and must not be modified.
+        """
+        return self._list('actions', actionLog)
+
+    def getPositions(self):
+        return self._list('positions', positions)
+
+    def getOrientations(self):
+        return self._list('angles', lambda arrays: arrays['angles'].tolist())
+
+    def save(self, path, metadata=None):
+        """ write the trajectory to path, metadata: JSON serializable dict, e.g. {'seed': 5} """
+        ArrayStore.saveArrays(path, self.getArrays(), metadata)
+        return
+
+    def _list(self, name, convert):
+        values = self._lists.setdefault(name, [])
+        if len(values) < self._length:
+            values.extend(convert({column: array[len(values):self._length]
+                                   for column, array in self._arrays.items()}))
+        return values
+
+    def _grow(self):
+        for name, array in self._arrays.items():
+            grown = np.zeros((max(2*len(array), 1),) + array.shape[1:],
+                             dtype=array.dtype)
+            grown[:len(array)] = array
+            self._arrays[name] = grown
+        return
+
+
+def loadTrajectory(path, mmap=True):
+    """ returns (arrays, metadata) of a trajectory written by TrajectoryRecorder.save,
+    the arrays are read-only views into a memory map of the file (see ArrayStore.loadArrays)
+    """
+    return ArrayStore.loadArrays(path, mmap)
+
+
+def actionLog(arrays):
+    """ [(actionname, speed, duration)] of the trajectory arrays """
+    return [(ACTION_NAMES[action], None if speed == NO_SPEED else speed, duration)
+            for action, speed, duration in zip(arrays['actions'].tolist(), arrays['speeds'].tolist(),
+                                               arrays['durations'].tolist())]
+
+
+def positions(arrays):
+    """ [(x, y)] of the trajectory arrays """
+    return list(zip(arrays['x'].tolist(), arrays['y'].tolist()))
+
+
+def parseTextLog(textPath):
+    """ returns (arrays, metadata) of a log written with pprint (sections actions:, positions:, orientations:).
+    The text logs do not contain sensor values, rewards and flags, these are NaN and 0
+    and the metadata contains 'hasSensorValues': False.
+    """
+    with open(textPath) as f:
+        text = f.read()
+    sections = {}
+    for section in text.split('\n\n'):
+        name, _, value = section.partition(':\n')
+        sections[name.strip()] = ast.literal_eval(value)
+    recorder = TrajectoryRecorder(len(sections['actions']))
+    for (actionname, speed, duration), position, angle in zip(sections['actions'], sections['positions'],
+                                                              sections['orientations']):
+        recorder.append(actionname, speed, duration, position, angle,
+                        (np.nan, np.nan, np.nan), np.nan, False, False)
+    return recorder.getArrays(), {'source': textPath, 'hasSensorValues': False}
+
+
+def convertTextLog(textPath, path):
+    """ convert a text log (see parseTextLog) to a trajectory file """
+    arrays, metadata = parseTextLog(textPath)
+    ArrayStore.saveArrays(path, arrays, metadata)
+    return
+
+
+if __name__ == '__main__':
+    for textPath in sys.argv[1:]:
+        path = textPath.rsplit('.', 1)[0] + '.traj'
+        convertTextLog(textPath, path)
+        print(f'{textPath} -> {path}')
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+module that remembers the poses a car has already been rewarded for
+
+@author Peter Bendel
+Copyright 2021 Peter Bendel, see LICENSE file
+"""
+
+import numpy as np
+
+# the default cells reproduce the former rounding of position and angle to 2 decimals
+DEFAULT_POSITION_CELL = 0.01
+DEFAULT_ANGLE_CELL = 0.01
+DEFAULT_MAX_ENTRIES = 16384
+# a key is the tuple (xcell, ycell, anglecell, followsLine, isTerminated) of python ints and bools,
+# so the cell numbers are not limited to a range (tracks of TrackCanvas are several hundred metres long)
+
+
+class VisitedIndex():
+
+    def __init__(self, positionCellSize=DEFAULT_POSITION_CELL, angleCellSize=DEFAULT_ANGLE_CELL,
+                 maxEntries=DEFAULT_MAX_ENTRIES) -> None:
+        """ Spatial hash of visited poses.
+
+        A pose (x, y, angle, followsLine, isTerminated) is mapped to the grid cell
+        of size positionCellSize (mm) and angleCellSize (degrees, the angle is taken modulo 360).
+        At most maxEntries cells are kept, when full the oldest cell is forgotten,
+        so the memory stays bounded on long episodes.
+        """
+        self._positionCellSize = positionCellSize
+        self._angleCellSize = angleCellSize
+        self._maxEntries = maxEntries
+        # dicts keep insertion order, the first key is the oldest entry
+        self._cells = {}
+        # True while the cells are shared with a fork, they are copied before the next change
+        self._shared = False
+        return
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __contains__(self, key):
+        return key in self._cells
+
+    def key(self, x, y, angle, followsLine, isTerminated):
+        """ the key of the cell containing the pose """
+        return (round(x / self._positionCellSize), round(y / self._positionCellSize),
+                round((angle % 360.0) / self._angleCellSize), bool(followsLine), bool(isTerminated))
+
+    def keys(self, x, y, angle, followsLine, isTerminated):
+        """ the keys of many poses given as arrays, list with the same result as key() for each pose """
+        return list(zip(np.rint(x / self._positionCellSize).astype(np.int64).tolist(),
+                        np.rint(y / self._positionCellSize).astype(np.int64).tolist(),
+                        np.rint(np.mod(angle, 360.0) / self._angleCellSize).astype(np.int64).tolist(),
+                        np.asarray(followsLine, dtype=bool).tolist(), np.asarray(isTerminated, dtype=bool).tolist()))
+
+    def add(self, key):
+        if self._shared:
+            self._cells = dict(self._cells)
+            self._shared = False
+        self._cells[key] = None
+        if len(self._cells) > self._maxEntries:
+            del self._cells[next(iter(self._cells))]
+        return
+
+    def clear(self):
+        if self._shared:
+            self._cells = {}
+            self._shared = False
+        else:
+            self._cells.clear()
+        return
+
+    def fork(self):
+        """ a copy of the index in O(1): both share the cells until one of them changes (copy-on-write) """
+        index = VisitedIndex(self._positionCellSize, self._angleCellSize, self._maxEntries)
+        index._cells = self._cells
+        index._shared = self._shared = True
+        return index
+
+
+def addNew(indexes, keys, eligible):
+    """ batched query for many cars: keys[i] (see VisitedIndex.keys) is added to indexes[i]
+    if eligible[i] is True and indexes[i] does not contain it yet.
+    returns a bool array, True for the cars whose key has been added
+    """
+    added = np.zeros(len(keys), dtype=bool)
+    for i, (index, key, isEligible) in enumerate(zip(indexes, keys, eligible.tolist())):
+        if isEligible and key not in index:
+            index.add(key)
+            added[i] = True
+    return added
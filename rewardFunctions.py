@@ -1,3 +1,5 @@
+import inspect
+
 
 
 # line threshold is a sensor value above 656.6436087300251
@@ -7,6 +9,9 @@ SENSOR_SIDE_REWARD = 20.0
 ON_LINE_BUT_NO_SENSOR = 10.0
 LOST_LINE = -300.0
 MAX_STEPS = 150
+# trackReward: reward points per mm distance of the car center to the centre line, up to MAX_CROSS_TRACK mm
+CROSS_TRACK_PENALTY = 1.0
+MAX_CROSS_TRACK = 100.0
 
 
 def simpleReward(sensors, position, orientation, carFollowsLine, isTerminated):
@@ -38,3 +43,24 @@ def simpleReward(sensors, position, orientation, carFollowsLine, isTerminated):
         if ((sensors[0] > SENSOR_LINE_THRESHOLD) or (sensors[2] > SENSOR_LINE_THRESHOLD)):
             return SENSOR_SIDE_REWARD / 2.0
         return LOST_LINE
+
+
+def trackReward(sensors, position, orientation, carFollowsLine, isTerminated, trackPosition=None):
+    """
+    simpleReward minus CROSS_TRACK_PENALTY per mm the car center is away from the centre line of the curve.
+    trackPosition: (crossTrack, progress) in mm, see RobotCarSimulator.SimulatorControl.getTrackPosition().
+    The simulators pass it to every reward function with a parameter trackPosition.
+    """
+    reward = simpleReward(sensors, position, orientation,
+                          carFollowsLine, isTerminated)
+    if isTerminated or trackPosition is None:
+        return reward
+    return reward - CROSS_TRACK_PENALTY * min(abs(trackPosition[0]), MAX_CROSS_TRACK)
+
+
+def acceptsTrackPosition(rewardFunction):
+    """ True if the reward function has a parameter trackPosition """
+    try:
+        return 'trackPosition' in inspect.signature(rewardFunction).parameters
+    except (TypeError, ValueError):
+        return False